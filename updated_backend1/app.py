@@ -381,6 +381,46 @@ def uploaded_file(filename):
 # Initialize Socket.IO
 socketio = init_socketio(app)
 
+# Configure search result cache
+from services.search_cache import search_cache
+search_cache.configure(app.config)
+
+# Configure trending snapshot refresh
+from services.trending_snapshot import trending_snapshot_service
+trending_snapshot_service.configure(app.config)
+
+# Configure saved-search alerts
+from services.search_alerts import search_alert_service
+search_alert_service.configure(app.config)
+
+# Configure message fan-out
+from services.message_dispatcher import message_dispatcher
+message_dispatcher.configure(app.config)
+
+# Configure notification preference cache
+from services.preference_cache import preference_cache
+preference_cache.configure(app.config)
+
+# Configure notification dispatch
+from services.notification_dispatch import notification_dispatcher
+notification_dispatcher.configure(app.config)
+
+# Configure audience notification fan-out
+from services.audience_fanout import audience_fanout
+audience_fanout.configure(app.config)
+
+# Configure notification aggregation
+from services.notification_aggregation import notification_aggregator
+notification_aggregator.configure(app.config)
+
+# Configure unread notification counters
+from services.notification_counter import notification_counter
+notification_counter.configure(app.config)
+
+# Configure messaging delta sync
+from services.sync_service import sync_service
+sync_service.configure(app.config)
+
 # Register error handlers
 register_error_handlers(app)
 
@@ -0,0 +1,43 @@
+"""
+Benchmarks
+Repeatable workload measurements against a synthetic corpus.
+
+app.py pins DATABASE_URL to the development database at import time, so the
+benchmarks build their own minimal Flask app with only the blueprints under
+test, bound to whichever database URL the run asks for.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_DATABASE_URL = 'sqlite:///:memory:'
+
+
+def create_app(database_url=None, blueprints=('search',), overrides=None):
+    """Minimal app with the given blueprint groups registered; overrides apply before the database binds"""
+    from flask import Flask
+    from config import config
+    from models import db
+
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = (
+        database_url or os.environ.get('BENCHMARK_DATABASE_URL') or DEFAULT_DATABASE_URL
+    )
+    app.config['TESTING'] = False
+    app.config.update(overrides or {})
+    db.init_app(app)
+
+    if 'search' in blueprints:
+        from routes.search import search_bp
+        from routes.search_routes import search_routes
+        from routes.advanced_search_routes import advanced_search_bp
+
+        # Same prefixes and order as app.py
+        app.register_blueprint(search_bp, url_prefix='/api/search')
+        app.register_blueprint(search_routes, url_prefix='/api')
+        app.register_blueprint(advanced_search_bp, url_prefix='/api')
+
+    return app
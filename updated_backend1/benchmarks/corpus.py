@@ -0,0 +1,319 @@
+"""
+Synthetic Search Corpus
+Deterministic users, profiles, pages, matches, posts and jobs for benchmarks.
+
+The same seed and sizes always produce the same rows (ids included), so runs
+before and after a search change measure identical data. Rows are written
+with Core bulk inserts, which keeps a 100k-row corpus to a few seconds.
+
+On PostgreSQL, point the benchmark at a database migrated to head
+(``flask db upgrade``) so the trigram, earthdistance and search_vector
+indexes the search paths rely on exist; create_all() only adds missing
+tables. SQLite needs nothing beyond create_all().
+"""
+
+import logging
+import random
+import uuid
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import insert, inspect
+
+from models import db, User, UserProfile, ProfilePage, Match, Post, Job
+from models.enums import MatchStatus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {
+    'users': 2000,
+    'pages': 400,
+    'matches': 1500,
+    'posts': 5000,
+    'jobs': 300,
+}
+
+PAGE_TYPES = ('Academy', 'Club', 'Community', 'Pitch')
+
+FIRST_NAMES = (
+    'Aarav', 'Vihaan', 'Arjun', 'Rohit', 'Virat', 'Shubman', 'Ishan', 'Rishabh', 'Hardik', 'Jasprit',
+    'Priya', 'Ananya', 'Smriti', 'Harmanpreet', 'Jemimah', 'Shafali', 'Deepti', 'Renuka', 'Sneha', 'Pooja',
+)
+LAST_NAMES = (
+    'Sharma', 'Kohli', 'Gill', 'Kishan', 'Pant', 'Pandya', 'Bumrah', 'Mandhana', 'Kaur', 'Rodrigues',
+    'Verma', 'Sharma', 'Singh', 'Rana', 'Patel', 'Iyer', 'Rahul', 'Jadeja', 'Ashwin', 'Yadav',
+)
+CITIES = (
+    ('Mumbai', 'Maharashtra', 19.0760, 72.8777), ('Delhi', 'Delhi', 28.7041, 77.1025),
+    ('Bengaluru', 'Karnataka', 12.9716, 77.5946), ('Chennai', 'Tamil Nadu', 13.0827, 80.2707),
+    ('Kolkata', 'West Bengal', 22.5726, 88.3639), ('Hyderabad', 'Telangana', 17.3850, 78.4867),
+    ('Pune', 'Maharashtra', 18.5204, 73.8567), ('Ahmedabad', 'Gujarat', 23.0225, 72.5714),
+    ('Jaipur', 'Rajasthan', 26.9124, 75.7873), ('Lucknow', 'Uttar Pradesh', 26.8467, 80.9462),
+)
+PAGE_WORDS = {
+    'Academy': ('Cricket Academy', 'Coaching Centre', 'School of Cricket', 'Batting Academy'),
+    'Club': ('Cricket Club', 'Gymkhana', 'Sports Club', 'Cricketers XI'),
+    'Community': ('Cricket Community', 'Weekend Cricketers', 'Tennis Ball League', 'Fans Circle'),
+    'Pitch': ('Cricket Ground', 'Turf', 'Stadium', 'Nets'),
+}
+PAGE_PREFIXES = ('Royal', 'Elite', 'Champions', 'Victory', 'Golden', 'Rising', 'United', 'Premier', 'Star', 'Heritage')
+MATCH_TYPES = ('T20', 'ODI', 'Test', 'T10', 'Box Cricket')
+SKILL_LEVELS = ('beginner', 'intermediate', 'advanced', 'professional')
+HASHTAGS = (
+    'cricket', 'ipl', 'worldcup', 't20', 'batting', 'bowling', 'fielding', 'coaching',
+    'weekendcricket', 'boxcricket', 'nets', 'sixes', 'wicket', 'century', 'teamindia',
+)
+POST_TEMPLATES = (
+    'Great session at {place} today, working on my {skill}',
+    'Looking for players for a {match_type} match in {city} this weekend',
+    'What a finish! {name} smashed it at {place}',
+    'Nets practice at {place}, focusing on {skill} drills',
+    'Our {match_type} team is recruiting in {city}, DM for details',
+)
+JOB_TITLES = (
+    'Head Coach', 'Batting Coach', 'Bowling Coach', 'Fitness Trainer', 'Groundsman',
+    'Video Analyst', 'Physiotherapist', 'Academy Manager', 'Scorer', 'Umpire',
+)
+JOB_TYPES = ('full_time', 'part_time', 'contract', 'internship')
+SKILLS = ('batting', 'bowling', 'fielding', 'wicket keeping', 'spin bowling', 'fast bowling')
+
+
+class CorpusGenerator:
+    """Builds a deterministic corpus from a seed and per-entity sizes"""
+
+    def __init__(self, seed=42, sizes=None, batch_size=1000):
+        self.seed = seed
+        self.sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.epoch = datetime(2024, 1, 1)
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _timestamp(self, days=365):
+        return self.epoch + timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def _city(self):
+        return self.rng.choice(CITIES)
+
+    def _jitter(self, value, spread=0.15):
+        return round(value + self.rng.uniform(-spread, spread), 6)
+
+    # ------------------------------------------------------------------
+    # Row builders
+    # ------------------------------------------------------------------
+
+    def _users(self):
+        users, profiles = [], []
+        for i in range(self.sizes['users']):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            city = self._city()
+            created = self._timestamp()
+            user_id = self._uuid()
+            users.append({
+                'id': user_id,
+                'email': f'{first.lower()}.{last.lower()}{i}@bench.example',
+                'username': f'{first.lower()}{last.lower()}{i}',
+                'is_verified': self.rng.random() < 0.2,
+                'is_active': True,
+                'auth_provider': 'firebase',
+                'created_at': created,
+                'updated_at': created,
+            })
+            profiles.append({
+                'id': self._uuid(),
+                'user_id': user_id,
+                'full_name': f'{first} {last}',
+                'bio': f'{self.rng.choice(SKILL_LEVELS).title()} cricketer from {city[0]} who loves {self.rng.choice(SKILLS)}',
+                'location': city[0],
+                'organization': f'{self.rng.choice(PAGE_PREFIXES)} {self.rng.choice(PAGE_WORDS["Club"])}',
+                'batting_skill': self.rng.randint(0, 100),
+                'bowling_skill': self.rng.randint(0, 100),
+                'fielding_skill': self.rng.randint(0, 100),
+                'created_at': created,
+                'updated_at': created,
+            })
+        return users, profiles
+
+    def _pages(self, user_ids):
+        pages = []
+        for i in range(self.sizes['pages']):
+            page_type = PAGE_TYPES[i % len(PAGE_TYPES)]
+            city, state, lat, lng = self._city()
+            name = f'{self.rng.choice(PAGE_PREFIXES)} {city} {self.rng.choice(PAGE_WORDS[page_type])}'
+            created = self._timestamp()
+            pages.append({
+                'page_id': self._uuid(),
+                'user_id': self.rng.choice(user_ids),
+                'academy_name': name,
+                'tagline': f'{page_type} for {self.rng.choice(SKILLS)} in {city}',
+                'description': f'{name} offers {self.rng.choice(SKILLS)} and {self.rng.choice(SKILLS)} '
+                               f'for {self.rng.choice(SKILL_LEVELS)} players',
+                'address': f'{self.rng.randint(1, 200)} Stadium Road, {city}',
+                'city': city,
+                'state': state,
+                'country': 'India',
+                'latitude': self._jitter(lat),
+                'longitude': self._jitter(lng),
+                'page_type': page_type,
+                'academy_type': 'Private' if page_type == 'Academy' else None,
+                'venue_type': 'Outdoor' if page_type == 'Pitch' else None,
+                'community_type': 'Local' if page_type == 'Community' else None,
+                'total_students': self.rng.randint(0, 500),
+                'is_public': True,
+                'is_verified': self.rng.random() < 0.3,
+                'created_at': created,
+                'updated_at': created,
+            })
+        return pages
+
+    def _matches(self, user_ids):
+        matches = []
+        for _ in range(self.sizes['matches']):
+            city, _, lat, lng = self._city()
+            match_type = self.rng.choice(MATCH_TYPES)
+            created = self._timestamp()
+            matches.append({
+                'id': self._uuid(),
+                'creator_id': self.rng.choice(user_ids),
+                'title': f'{self.rng.choice(PAGE_PREFIXES)} {match_type} {self.rng.choice(("Cup", "League", "Friendly", "Trophy"))}',
+                'description': f'{match_type} match in {city} for {self.rng.choice(SKILL_LEVELS)} players',
+                'match_type': match_type,
+                'location': city,
+                'venue': f'{self.rng.choice(PAGE_PREFIXES)} {city} {self.rng.choice(PAGE_WORDS["Pitch"])}',
+                'latitude': self._jitter(lat),
+                'longitude': self._jitter(lng),
+                'match_date': (created + timedelta(days=self.rng.randint(1, 60))).date(),
+                'match_time': time(self.rng.randint(6, 20), self.rng.choice((0, 30))),
+                'players_needed': self.rng.randint(2, 22),
+                'skill_level': self.rng.choice(SKILL_LEVELS),
+                'status': MatchStatus.UPCOMING,
+                'is_public': True,
+                'created_at': created,
+                'updated_at': created,
+            })
+        return matches
+
+    def _posts(self, user_ids, profiles_by_user):
+        posts = []
+        for _ in range(self.sizes['posts']):
+            user_id = self.rng.choice(user_ids)
+            city = self._city()[0]
+            tags = self.rng.sample(HASHTAGS, self.rng.randint(1, 4))
+            content = self.rng.choice(POST_TEMPLATES).format(
+                place=f'{self.rng.choice(PAGE_PREFIXES)} {self.rng.choice(PAGE_WORDS["Pitch"])}',
+                skill=self.rng.choice(SKILLS),
+                match_type=self.rng.choice(MATCH_TYPES),
+                city=city,
+                name=profiles_by_user[user_id].split()[0],
+            )
+            created = self._timestamp()
+            likes = int(self.rng.paretovariate(1.5)) - 1
+            posts.append({
+                'id': self._uuid(),
+                'user_id': user_id,
+                'content': f"{content} {' '.join('#' + tag for tag in tags)}",
+                'hashtags': ','.join(tags),
+                'location': city,
+                'post_type': 'general',
+                'visibility': 'public',
+                'likes_count': likes,
+                'comments_count': likes // 3,
+                'shares_count': likes // 10,
+                'views_count': likes * 20,
+                'schedule_time': created,
+                'created_at': created,
+                'updated_at': created,
+            })
+        return posts
+
+    def _jobs(self, pages):
+        jobs = []
+        for _ in range(self.sizes['jobs']):
+            page = self.rng.choice(pages)
+            created = self._timestamp()
+            jobs.append({
+                # The model default is a server-side uuid_generate_v4() call
+                'job_id': self._uuid(),
+                'page_id': page['page_id'],
+                'user_id': page['user_id'],
+                'title': self.rng.choice(JOB_TITLES),
+                'description': f"{page['academy_name']} is hiring for {self.rng.choice(SKILLS)} sessions",
+                'location': page['city'],
+                'job_type': self.rng.choice(JOB_TYPES),
+                'skills_required': ', '.join(self.rng.sample(SKILLS, 2)),
+                'is_active': True,
+                'created_at': created,
+                'updated_at': created,
+            })
+        return jobs
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _insert(self, model, rows):
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(insert(model.__table__), rows[start:start + self.batch_size])
+        logger.info(f"Inserted {len(rows)} {model.__tablename__}")
+
+    def generate(self):
+        """Build every row in memory; returns {table_name: rows}"""
+        users, profiles = self._users()
+        user_ids = [user['id'] for user in users]
+        profiles_by_user = {profile['user_id']: profile['full_name'] for profile in profiles}
+        pages = self._pages(user_ids)
+        return {
+            'users': users,
+            'user_profiles': profiles,
+            'page_profiles': pages,
+            'matches': self._matches(user_ids),
+            'posts': self._posts(user_ids, profiles_by_user),
+            'jobs': self._jobs(pages),
+        }
+
+    def load(self, create_schema=True):
+        """Write the corpus to the bound database and return row counts"""
+        if create_schema:
+            db.create_all()
+
+        corpus = self.generate()
+        for model in (User, UserProfile, ProfilePage, Match, Post, Job):
+            self._insert(model, corpus[model.__tablename__])
+        db.session.commit()
+
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+
+        return {table: len(rows) for table, rows in corpus.items()}
+
+
+def check_search_schema():
+    """Warnings for search indexes missing from a PostgreSQL database"""
+    if db.engine.dialect.name != 'postgresql':
+        return []
+
+    warnings = []
+    columns = {column['name'] for column in inspect(db.engine).get_columns('page_profiles')}
+    if 'search_vector' not in columns:
+        warnings.append('page_profiles.search_vector is missing; run `flask db upgrade` before benchmarking')
+
+    extensions = {row[0] for row in db.session.execute(db.text('SELECT extname FROM pg_extension'))}
+    for extension in ('pg_trgm', 'earthdistance'):
+        if extension not in extensions:
+            warnings.append(f'extension {extension} is not installed; run `flask db upgrade` before benchmarking')
+    return warnings
+
+
+def vocabulary_sample(seed=42):
+    """Query terms that are known to occur in a corpus built with this seed"""
+    rng = random.Random(seed)
+    return {
+        'names': [rng.choice(FIRST_NAMES) for _ in range(5)] + [rng.choice(LAST_NAMES) for _ in range(5)],
+        'cities': [city[0] for city in CITIES],
+        'pages': [word.split()[0] for words in PAGE_WORDS.values() for word in words] + list(PAGE_PREFIXES),
+        'hashtags': list(HASHTAGS),
+        'jobs': list(JOB_TITLES),
+        'match_types': list(MATCH_TYPES),
+    }
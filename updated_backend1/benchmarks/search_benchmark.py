@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Search Workload Benchmark
+Replays a deterministic query mix against the search paths and reports
+latency percentiles, SQL queries per request and rows scanned as JSON.
+
+Targets:
+    main_search       GET /api/search/ (routes/search.py)
+    full_text_search  SearchService.full_text_search
+    suggestions       GET /api/search/suggestions
+    profile_search    GET /api/search/profiles (routes/search_routes.py)
+
+Rows scanned come from EXPLAIN (ANALYZE, FORMAT JSON) of every SELECT a
+request issued, summed over the plan's scan nodes, so they are only
+available on PostgreSQL. Other databases report rows returned instead.
+
+Usage:
+    python benchmarks/search_benchmark.py --output before.json
+    python benchmarks/search_benchmark.py --database-url postgresql://... \\
+        --users 20000 --posts 50000 --requests 2000 --output after.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from benchmarks import create_app
+from benchmarks.corpus import CorpusGenerator, DEFAULT_SIZES, check_search_schema, vocabulary_sample
+
+logger = logging.getLogger(__name__)
+
+# Share of the replayed requests sent to each target
+DEFAULT_MIX = {
+    'main_search': 0.35,
+    'full_text_search': 0.25,
+    'suggestions': 0.25,
+    'profile_search': 0.15,
+}
+
+MAIN_SEARCH_CATEGORIES = ('all', 'all', 'all', 'location', 'academy', 'job', 'coach', 'community')
+FULL_TEXT_TYPES = ('Global', 'Global', 'User', 'Match', 'Post')
+PROFILE_TYPES = ('all', 'all', 'academy', 'venue', 'community')
+
+# Plan nodes whose "Actual Rows" count rows read from a relation
+SCAN_NODES = {
+    'Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan',
+    'Tid Scan', 'Sample Scan', 'Parallel Seq Scan',
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _typo(rng, term):
+    """Drop, swap or double one character so fuzzy paths get exercised"""
+    if len(term) < 4:
+        return term
+    i = rng.randrange(1, len(term) - 1)
+    kind = rng.choice(('drop', 'swap', 'double'))
+    if kind == 'drop':
+        return term[:i] + term[i + 1:]
+    if kind == 'swap':
+        return term[:i] + term[i + 1] + term[i] + term[i + 2:]
+    return term[:i] + term[i] + term[i:]
+
+
+def build_query_mix(requests, seed=42, mix=None):
+    """Deterministic list of (target, params) drawn from the corpus vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = vocabulary_sample(seed)
+    terms = [term for group in vocabulary.values() for term in group]
+    mix = mix or DEFAULT_MIX
+    targets = list(mix)
+    weights = [mix[target] for target in targets]
+
+    def query_text():
+        roll = rng.random()
+        term = rng.choice(terms)
+        if roll < 0.6:
+            return term
+        if roll < 0.8:
+            return f'{term} {rng.choice(vocabulary["cities"])}'
+        if roll < 0.95:
+            return _typo(rng, term)
+        return f'zz{rng.randrange(10 ** 6)}'  # guaranteed miss
+
+    workload = []
+    for _ in range(requests):
+        target = rng.choices(targets, weights)[0]
+        if target == 'main_search':
+            params = {'q': query_text(), 'category': rng.choice(MAIN_SEARCH_CATEGORIES), 'per_page': 20}
+        elif target == 'full_text_search':
+            params = {'q': query_text(), 'type': rng.choice(FULL_TEXT_TYPES), 'per_page': 20}
+        elif target == 'suggestions':
+            term = rng.choice(terms)
+            params = {'q': term[:rng.randint(2, max(2, len(term)))]}
+        else:
+            params = {'q': query_text(), 'type': rng.choice(PROFILE_TYPES), 'per_page': 20}
+        workload.append((target, params))
+    return workload
+
+
+class QueryRecorder:
+    """Counts (and optionally captures) the SQL statements issued per request"""
+
+    def __init__(self, engine, capture=False):
+        self.engine = engine
+        self.capture = capture
+        self.paused = False
+        self.statements = []
+        self.count = 0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.paused:
+            return
+        self.count += 1
+        # EXPLAIN ANALYZE executes the statement, so only reads are captured
+        if self.capture and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def reset(self):
+        self.statements = []
+        self.count = 0
+
+
+def _plan_rows_scanned(node):
+    rows = 0
+    if node.get('Node Type') in SCAN_NODES:
+        rows += int(node.get('Actual Rows', 0) * node.get('Actual Loops', 1))
+        # Rows the scan read and then discarded still cost I/O
+        rows += int(node.get('Rows Removed by Filter', 0) * node.get('Actual Loops', 1))
+        rows += int(node.get('Rows Removed by Index Recheck', 0) * node.get('Actual Loops', 1))
+    for child in node.get('Plans', ()):
+        rows += _plan_rows_scanned(child)
+    return rows
+
+
+def explain_rows_scanned(db, statements):
+    """Sum scan-node rows over EXPLAIN ANALYZE plans of the captured SELECTs"""
+    total = 0
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement, parameters in statements:
+            try:
+                cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                total += _plan_rows_scanned(plan[0]['Plan'])
+            except Exception as e:
+                connection.rollback()
+                logger.warning(f"EXPLAIN failed, rows scanned undercounted: {e}")
+        connection.rollback()
+    finally:
+        connection.close()
+    return total
+
+
+def _result_rows(payload):
+    if not isinstance(payload, dict):
+        return 0
+    for key in ('results', 'profiles', 'suggestions'):
+        value = payload.get(key)
+        if isinstance(value, list):
+            return len(value)
+    return 0
+
+
+class SearchBenchmark:
+    """Replays a workload against one app and aggregates per-target metrics"""
+
+    def __init__(self, app, workload, warmup=20, use_cache=False, explain=True):
+        self.app = app
+        self.workload = workload
+        self.warmup = warmup
+        self.use_cache = use_cache
+        self.explain = explain
+
+    def _call(self, client, target, params):
+        """Run one request; returns (ok, rows_returned)"""
+        from models import SearchType
+        from services.search_service import search_service
+
+        if target == 'full_text_search':
+            result = search_service.full_text_search(
+                params['q'], SearchType(params['type']), page=1, per_page=params['per_page']
+            )
+            return 'error' not in result, _result_rows(result)
+
+        path = {
+            'main_search': '/api/search/',
+            'suggestions': '/api/search/suggestions',
+            'profile_search': '/api/search/profiles',
+        }[target]
+        response = client.get(path, query_string=params)
+        return response.status_code == 200, _result_rows(response.get_json(silent=True))
+
+    def run(self):
+        from models import db
+        from services.search_cache import search_cache
+        from services.fuzzy_search import fuzzy_search_service
+
+        explain = self.explain and db.engine.dialect.name == 'postgresql'
+        samples = defaultdict(lambda: {'latency_ms': [], 'queries': [], 'rows_scanned': [],
+                                       'rows_returned': [], 'errors': 0})
+
+        with self.app.test_client() as client:
+            # Build the fuzzy vocabulary and warm connection pools outside the timings
+            fuzzy_search_service.vocabulary()
+            for target, params in self.workload[:self.warmup]:
+                self._call(client, target, params)
+            db.session.remove()
+
+            with QueryRecorder(db.engine, capture=explain) as recorder:
+                for target, params in self.workload:
+                    if not self.use_cache:
+                        search_cache.clear()
+                    recorder.reset()
+
+                    started = time.perf_counter()
+                    try:
+                        ok, rows_returned = self._call(client, target, params)
+                    except Exception as e:
+                        logger.warning(f"{target} failed for {params}: {e}")
+                        ok, rows_returned = False, 0
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    db.session.remove()
+
+                    bucket = samples[target]
+                    bucket['latency_ms'].append(elapsed_ms)
+                    bucket['queries'].append(recorder.count)
+                    bucket['rows_returned'].append(rows_returned)
+                    if not ok:
+                        bucket['errors'] += 1
+                    if explain:
+                        recorder.paused = True
+                        bucket['rows_scanned'].append(explain_rows_scanned(db, recorder.statements))
+                        recorder.paused = False
+
+        return {target: self._summarize(bucket) for target, bucket in samples.items()}
+
+    @staticmethod
+    def _summarize(bucket):
+        latencies = sorted(bucket['latency_ms'])
+        requests = len(latencies)
+
+        def mean(values):
+            return round(sum(values) / len(values), 2) if values else None
+
+        return {
+            'requests': requests,
+            'errors': bucket['errors'],
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(latencies[-1], 3),
+                'mean': mean(latencies),
+            },
+            'queries_per_request': {
+                'mean': mean(bucket['queries']),
+                'max': max(bucket['queries']),
+            },
+            'rows_scanned_per_request': {
+                'mean': mean(bucket['rows_scanned']),
+                'max': max(bucket['rows_scanned']) if bucket['rows_scanned'] else None,
+            },
+            'rows_returned_per_request': {
+                'mean': mean(bucket['rows_returned']),
+            },
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the search endpoints against a synthetic corpus')
+    parser.add_argument('--database-url', help='Target database (default: BENCHMARK_DATABASE_URL or in-memory SQLite)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=500, help='Number of replayed requests')
+    parser.add_argument('--warmup', type=int, default=20)
+    for entity, size in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{entity}', type=int, default=size, help=f'Corpus {entity} (default {size})')
+    parser.add_argument('--skip-load', action='store_true', help='Reuse a corpus already loaded into the database')
+    parser.add_argument('--use-cache', action='store_true', help='Leave the search result cache enabled')
+    parser.add_argument('--no-explain', action='store_true', help='Skip EXPLAIN ANALYZE rows-scanned collection')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    app = create_app(args.database_url)
+    sizes = {entity: getattr(args, entity) for entity in DEFAULT_SIZES}
+
+    with app.app_context():
+        from models import db
+
+        corpus = None
+        if not args.skip_load:
+            print(f"Loading synthetic corpus (seed={args.seed})...", file=sys.stderr)
+            load_started = time.perf_counter()
+            corpus = CorpusGenerator(seed=args.seed, sizes=sizes).load()
+            print(f"✅ Corpus loaded in {time.perf_counter() - load_started:.1f}s: {corpus}", file=sys.stderr)
+
+        for warning in check_search_schema():
+            print(f"⚠️ {warning}", file=sys.stderr)
+
+        workload = build_query_mix(args.requests, seed=args.seed)
+        print(f"Replaying {len(workload)} requests...", file=sys.stderr)
+        results = SearchBenchmark(
+            app, workload, warmup=args.warmup,
+            use_cache=args.use_cache, explain=not args.no_explain
+        ).run()
+
+        report = {
+            'benchmark': 'search',
+            'generated_at': datetime.utcnow().isoformat(),
+            'environment': {
+                'dialect': db.engine.dialect.name,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'parameters': {
+                'seed': args.seed,
+                'requests': args.requests,
+                'warmup': args.warmup,
+                'corpus_sizes': sizes,
+                'corpus_loaded': corpus,
+                'use_cache': args.use_cache,
+                'mix': DEFAULT_MIX,
+            },
+            'results': results,
+        }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Socket.IO Messaging Load Test
+Drives socketio_server.py with simulated python-socketio clients and reports
+delivery latency percentiles, server CPU and memory, and dropped events as JSON.
+
+The harness starts the app in a child process (``--serve``) bound to the
+local:// backplane stand-in (or any SOCKETIO_MESSAGE_QUEUE URL), seeds one
+user and JWT per simulated client, and groups the users into conversations
+of --room-size members. Every client then connects, joins its conversation
+and performs a weighted mix of actions for --duration seconds:
+
+    send_message        new_message broadcast to the room, message_sent ack
+    typing              typing_start / typing_stop (coalesced typing_update)
+    mark_read           mark_as_read, messages_marked_read ack
+    presence_heartbeat  presence_heartbeat
+
+Latencies:
+    delivery_ms   send_message emitted -> new_message received, per recipient
+    send_ack_ms   send_message emitted -> message_sent received by the sender
+    read_ack_ms   mark_as_read emitted -> messages_marked_read received
+    connect_ms    connect + join_conversation confirmed
+
+A new_message is expected by every client that had joined the room when it
+was sent; deliveries still missing after --drain seconds count as dropped.
+Server CPU and RSS are sampled once a second with psutil when installed,
+otherwise from /proc (Linux).
+
+Clients run on asyncio and need python-socketio's async client
+(``pip install "python-socketio[asyncio_client]"``).
+
+Usage:
+    python benchmarks/socketio_load.py --clients 200 --duration 30
+    python benchmarks/socketio_load.py --clients 2000 --room-size 10 --rate 0.5 \\
+        --mix send_message=0.5,typing=0.3,mark_read=0.2 --output load.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import create_app
+from benchmarks.search_benchmark import percentile
+
+logger = logging.getLogger(__name__)
+
+JWT_SECRET = 'socketio-load-test'
+
+# Share of each client's actions
+DEFAULT_MIX = {
+    'send_message': 0.4,
+    'typing': 0.35,
+    'mark_read': 0.2,
+    'presence_heartbeat': 0.05,
+}
+
+
+def parse_mix(value):
+    """'send_message=0.5,typing=0.5' -> {'send_message': 0.5, 'typing': 0.5}"""
+    mix = {}
+    for part in value.split(','):
+        action, _, weight = part.partition('=')
+        action = action.strip()
+        if action not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action {action!r}; choose from {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[action] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {action}: {weight!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('The mix needs at least one positive weight')
+    return mix
+
+
+# ----------------------------------------------------------------------
+# Server process
+# ----------------------------------------------------------------------
+
+def seed(clients, room_size):
+    """One user per client in conversations of room_size; returns the manifest"""
+    from flask_jwt_extended import create_access_token
+    from models import db, User, Conversation, ConversationParticipant
+
+    run = int(time.time())
+    users = [
+        User(username=f'load_{run}_{i}', email=f'load_{run}_{i}@example.com',
+             auth_provider='email', is_verified=True, is_active=True)
+        for i in range(clients)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+
+    conversations = []
+    for start in range(0, clients - 1, room_size):
+        members = list(range(start, min(start + room_size, clients)))
+        if len(members) < 2:
+            break
+        conversation = Conversation(user1_id=users[members[0]].id, user2_id=users[members[1]].id)
+        db.session.add(conversation)
+        db.session.flush()
+        if len(members) > 2:
+            db.session.add_all(ConversationParticipant(conversation_id=conversation.id, user_id=users[i].id)
+                               for i in members)
+        conversations.append({'id': str(conversation.id), 'members': members})
+    db.session.commit()
+
+    return {
+        'users': [{'id': str(user.id), 'token': create_access_token(identity=str(user.id))} for user in users],
+        'conversations': conversations,
+    }
+
+
+def serve(args):
+    """Entry point of the server child process"""
+    from flask_jwt_extended import JWTManager
+
+    # socketio_server turns on INFO logging for every packet; keep the server quiet
+    for name in ('socketio.server', 'engineio.server', 'werkzeug', 'socketio_server'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    app = create_app(args.database_url, blueprints=(), overrides={
+        'JWT_SECRET_KEY': JWT_SECRET,
+        'JWT_ACCESS_TOKEN_EXPIRES': False,
+        'SOCKETIO_MESSAGE_QUEUE': args.message_queue,
+        'SOCKETIO_ASYNC_MODE': args.async_mode,
+        'MESSAGE_DISPATCH_ASYNC': not args.sync_dispatch,
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}}
+        if (args.database_url or '').startswith('sqlite') else {},
+    })
+    JWTManager(app)
+
+    from models import db
+    from socketio_server import init_socketio
+    from services.message_dispatcher import message_dispatcher
+
+    socketio = init_socketio(app)
+    message_dispatcher.configure(app.config)
+
+    with app.app_context():
+        db.create_all()
+        manifest = seed(args.clients, args.room_size)
+    with open(args.manifest + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(args.manifest + '.tmp', args.manifest)
+
+    socketio.run(app, host='127.0.0.1', port=args.port, use_reloader=False,
+                 log_output=False, allow_unsafe_werkzeug=True)
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start_server(args, workdir):
+    """Launch the server child process; returns (process, manifest, log path)"""
+    manifest_path = os.path.join(workdir, 'manifest.json')
+    log_path = os.path.join(workdir, 'server.log')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--serve',
+        '--port', str(args.port), '--manifest', manifest_path,
+        '--clients', str(args.clients), '--room-size', str(args.room_size),
+        '--database-url', args.database_url, '--message-queue', args.message_queue,
+    ]
+    if args.async_mode:
+        command += ['--async-mode', args.async_mode]
+    if args.sync_dispatch:
+        command.append('--sync-dispatch')
+
+    def failed(reason):
+        # The log lives in the temporary directory, so surface its tail now
+        with open(log_path) as f:
+            tail = ''.join(f.readlines()[-20:])
+        return RuntimeError(f"{reason}; server log tail:\n{tail}")
+
+    log = open(log_path, 'w')
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise failed(f"Server exited with {process.returncode}")
+        if os.path.exists(manifest_path):
+            try:
+                with socket.create_connection(('127.0.0.1', args.port), timeout=0.5):
+                    with open(manifest_path) as f:
+                        return process, json.load(f), log_path
+            except OSError:
+                pass
+        time.sleep(0.2)
+    process.kill()
+    raise failed(f"Server did not start within {args.startup_timeout}s")
+
+
+# ----------------------------------------------------------------------
+# Resource sampling
+# ----------------------------------------------------------------------
+
+class ProcessSampler:
+    """CPU percent and RSS of the server process, sampled on an interval"""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_mb = []
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def _read(self):
+        """(cpu seconds, rss bytes) or None when the platform offers neither"""
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system, self._process.memory_info().rss
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{self.pid}/statm') as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            return None
+        return (int(fields[11]) + int(fields[12])) / self._clock_ticks, resident_pages * self._page_size
+
+    async def run(self, stop):
+        previous = self._read()
+        previous_at = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(self.interval)
+            current = self._read()
+            now = time.perf_counter()
+            if current is None or previous is None:
+                return
+            self.cpu_percent.append(100.0 * (current[0] - previous[0]) / (now - previous_at))
+            self.rss_mb.append(current[1] / (1024 * 1024))
+            previous, previous_at = current, now
+
+    def summary(self):
+        def stats(values):
+            if not values:
+                return None
+            return {'mean': round(sum(values) / len(values), 2), 'max': round(max(values), 2)}
+
+        return {'cpu_percent': stats(self.cpu_percent), 'rss_mb': stats(self.rss_mb),
+                'samples': len(self.cpu_percent)}
+
+
+# ----------------------------------------------------------------------
+# Clients
+# ----------------------------------------------------------------------
+
+class LoadStats:
+    """Latencies and counters shared by every simulated client"""
+
+    def __init__(self):
+        self.latency_ms = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.room_members = defaultdict(set)    # conversation_id -> joined client indexes
+        self.sent = {}                          # client message id -> (sent_at, expected deliveries)
+        self.delivered = defaultdict(int)       # client message id -> new_message received
+        self.acked = set()
+        self.closing = False
+
+    def error(self, message):
+        self.counters['errors'] += 1
+        self.errors[str(message)[:200]] += 1
+
+
+class SimulatedClient:
+    """One python-socketio connection acting as one user"""
+
+    def __init__(self, index, user, conversation_id, url, transport, stats, rng):
+        import socketio as socketio_client
+
+        self.index = index
+        self.user = user
+        self.conversation_id = conversation_id
+        self.url = url
+        self.transport = transport
+        self.stats = stats
+        self.rng = rng
+        self.sequence = itertools.count()
+        self.typing = False
+        self.read_requests = deque()
+        self.joined = asyncio.Event()
+        self.sio = socketio_client.AsyncClient(reconnection=False)
+        self._register()
+
+    def _register(self):
+        sio, stats = self.sio, self.stats
+
+        @sio.on('joined_conversation')
+        async def on_joined(data):
+            stats.room_members[self.conversation_id].add(self.index)
+            self.joined.set()
+
+        @sio.on('new_message')
+        async def on_new_message(data):
+            client_id = (data.get('message') or {}).get('client_id')
+            sent = stats.sent.get(client_id)
+            if sent is None:
+                return
+            stats.delivered[client_id] += 1
+            stats.latency_ms['delivery_ms'].append((time.perf_counter() - sent[0]) * 1000)
+
+        @sio.on('message_sent')
+        async def on_message_sent(ack):
+            sent = stats.sent.get(ack.get('client_id'))
+            if sent is not None:
+                stats.acked.add(ack['client_id'])
+                stats.latency_ms['send_ack_ms'].append((time.perf_counter() - sent[0]) * 1000)
+
+        @sio.on('messages_marked_read')
+        async def on_marked_read(data):
+            if self.read_requests:
+                stats.latency_ms['read_ack_ms'].append((time.perf_counter() - self.read_requests.popleft()) * 1000)
+
+        @sio.on('messages_read')
+        async def on_messages_read(data):
+            stats.counters['read_receipts_received'] += 1
+
+        @sio.on('typing_update')
+        async def on_typing_update(data):
+            stats.counters['typing_updates_received'] += 1
+
+        @sio.on('presence_update')
+        async def on_presence_update(data):
+            stats.counters['presence_updates_received'] += 1
+
+        @sio.on('error')
+        async def on_error(data):
+            stats.error(data.get('message') if isinstance(data, dict) else data)
+
+        @sio.on('disconnect')
+        async def on_disconnect(*reason):
+            if not stats.closing:
+                stats.counters['unexpected_disconnects'] += 1
+
+    async def connect(self, timeout):
+        started = time.perf_counter()
+        try:
+            await self.sio.connect(self.url, headers={'Authorization': f"Bearer {self.user['token']}"},
+                                   transports=[self.transport], wait_timeout=timeout)
+            await self.sio.emit('join_conversation', {'conversation_id': self.conversation_id})
+            await asyncio.wait_for(self.joined.wait(), timeout)
+        except Exception as e:
+            self.stats.counters['connect_failures'] += 1
+            self.stats.error(f'connect: {e}')
+            return False
+        self.stats.latency_ms['connect_ms'].append((time.perf_counter() - started) * 1000)
+        return True
+
+    async def act(self, action):
+        stats = self.stats
+        if action == 'send_message':
+            client_id = f'{self.index}-{next(self.sequence)}'
+            expected = len(stats.room_members[self.conversation_id])
+            stats.sent[client_id] = (time.perf_counter(), expected)
+            await self.sio.emit('send_message', {
+                'conversation_id': self.conversation_id,
+                'content': f'load test message {client_id}',
+                'client_id': client_id
+            })
+        elif action == 'typing':
+            self.typing = not self.typing
+            await self.sio.emit('typing_start' if self.typing else 'typing_stop',
+                                {'conversation_id': self.conversation_id})
+        elif action == 'mark_read':
+            self.read_requests.append(time.perf_counter())
+            await self.sio.emit('mark_as_read', {'conversation_id': self.conversation_id})
+        elif action == 'presence_heartbeat':
+            await self.sio.emit('presence_heartbeat', {})
+        stats.counters[f'{action}_emitted'] += 1
+
+    async def run(self, mix, rate, deadline):
+        actions = list(mix)
+        weights = [mix[action] for action in actions]
+        while True:
+            # Poisson arrivals at rate actions per second
+            delay = self.rng.expovariate(rate)
+            if time.perf_counter() + delay >= deadline:
+                return
+            await asyncio.sleep(delay)
+            if not self.sio.connected:
+                return
+            try:
+                await self.act(self.rng.choices(actions, weights)[0])
+            except Exception as e:
+                self.stats.error(f'emit: {e}')
+
+
+async def run_load(args, manifest, server_pid):
+    """Connect every client, run the mix, drain and summarise"""
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    url = f'http://127.0.0.1:{args.port}'
+
+    conversation_of = {}
+    for conversation in manifest['conversations']:
+        for member in conversation['members']:
+            conversation_of[member] = conversation['id']
+    clients = [
+        SimulatedClient(index, user, conversation_of[index], url, args.transport, stats,
+                        random.Random(rng.random()))
+        for index, user in enumerate(manifest['users']) if index in conversation_of
+    ]
+
+    stop_sampling = asyncio.Event()
+    sampler = ProcessSampler(server_pid)
+    sampling = asyncio.ensure_future(sampler.run(stop_sampling))
+
+    # Ramp up with bounded concurrency so the handshake storm does not dominate
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect(client):
+        async with gate:
+            return await client.connect(args.connect_timeout)
+
+    ramp_started = time.perf_counter()
+    connected = await asyncio.gather(*(connect(client) for client in clients))
+    ramp_seconds = time.perf_counter() - ramp_started
+    active = [client for client, ok in zip(clients, connected) if ok]
+    print(f"Connected {len(active)}/{len(clients)} clients in {ramp_seconds:.1f}s", file=sys.stderr)
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(client.run(args.mix, args.rate, deadline) for client in active))
+    elapsed = time.perf_counter() - started
+
+    # Let in-flight broadcasts and acks arrive before counting drops
+    await asyncio.sleep(args.drain)
+    stop_sampling.set()
+    await sampling
+    stats.closing = True
+    await asyncio.gather(*(client.sio.disconnect() for client in active), return_exceptions=True)
+
+    expected = sum(expected for _, expected in stats.sent.values())
+    delivered = sum(min(stats.delivered[client_id], expected_count)
+                    for client_id, (_, expected_count) in stats.sent.items())
+    results = {
+        'clients': {
+            'requested': len(clients),
+            'connected': len(active),
+            'connect_failures': stats.counters['connect_failures'],
+            'ramp_seconds': round(ramp_seconds, 2),
+        },
+        'latency_ms': {name: summarize(values) for name, values in sorted(stats.latency_ms.items())},
+        'messages': {
+            'sent': len(stats.sent),
+            'acked': len(stats.acked),
+            'unacked': len(stats.sent) - len(stats.acked),
+            'expected_deliveries': expected,
+            'delivered': delivered,
+            'dropped': expected - delivered,
+            'drop_rate': round((expected - delivered) / expected, 6) if expected else None,
+            'sent_per_second': round(len(stats.sent) / elapsed, 2) if elapsed else None,
+            'delivered_per_second': round(delivered / elapsed, 2) if elapsed else None,
+        },
+        'events': dict(sorted(stats.counters.items())),
+        'errors': dict(sorted(stats.errors.items(), key=lambda item: -item[1])[:20]),
+        'server': sampler.summary(),
+        'duration_seconds': round(elapsed, 2),
+    }
+    return results
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(values[-1], 3),
+        'mean': round(sum(values) / len(values), 3),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the Socket.IO messaging server')
+    parser.add_argument('--clients', type=int, default=200, help='Simulated clients (one user each)')
+    parser.add_argument('--room-size', type=int, default=2, help='Members per conversation (2 = direct messages)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load after the ramp-up')
+    parser.add_argument('--rate', type=float, default=1.0, help='Actions per second per client')
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX),
+                        help='Action weights, e.g. send_message=0.5,typing=0.3,mark_read=0.2')
+    parser.add_argument('--transport', choices=('websocket', 'polling'), default='websocket')
+    parser.add_argument('--connect-concurrency', type=int, default=100)
+    parser.add_argument('--connect-timeout', type=float, default=10)
+    parser.add_argument('--drain', type=float, default=3, help='Seconds to wait for in-flight events')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='Server database (default: SQLite file in a temporary directory)')
+    parser.add_argument('--message-queue', default='local://', help='SOCKETIO_MESSAGE_QUEUE for the server')
+    parser.add_argument('--async-mode', help='SOCKETIO_ASYNC_MODE for the server (threading, eventlet, gevent)')
+    parser.add_argument('--sync-dispatch', action='store_true', help='Run message fan-out inline with the send')
+    parser.add_argument('--port', type=int, help='Server port (default: a free port)')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--manifest', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.serve:
+        serve(args)
+        return
+
+    try:
+        import socketio as socketio_client
+        socketio_client.AsyncClient
+        import aiohttp  # noqa: F401  the async client's transport
+    except (ImportError, AttributeError):
+        print('❌ The load test needs: pip install "python-socketio[asyncio_client]"', file=sys.stderr)
+        sys.exit(1)
+
+    args.port = args.port or free_port()
+    with tempfile.TemporaryDirectory(prefix='socketio-load-') as workdir:
+        args.database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}"
+        print(f"Starting server with {args.clients} users on port {args.port}...", file=sys.stderr)
+        process, manifest, log_path = start_server(args, workdir)
+        try:
+            results = asyncio.run(run_load(args, manifest, process.pid))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        with open(log_path) as f:
+            server_errors = [line.rstrip() for line in f if 'Error' in line or 'Traceback' in line][:20]
+
+    report = {
+        'benchmark': 'socketio_load',
+        'generated_at': datetime.utcnow().isoformat(),
+        'environment': {
+            'database': args.database_url.split('@')[-1] if not args.database_url.startswith('sqlite') else 'sqlite',
+            'message_queue': args.message_queue.split('@')[-1],
+            'async_mode': args.async_mode or 'auto',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'parameters': {
+            'clients': args.clients,
+            'room_size': args.room_size,
+            'duration': args.duration,
+            'rate_per_client': args.rate,
+            'mix': args.mix,
+            'transport': args.transport,
+            'sync_dispatch': args.sync_dispatch,
+            'seed': args.seed,
+        },
+        'results': results,
+        'server_log_errors': server_errors,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
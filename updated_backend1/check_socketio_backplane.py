@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Check that Socket.IO room emits are delivered across workers by the backplane
+
+    python check_socketio_backplane.py                          # local:// stand-in
+    python check_socketio_backplane.py redis://localhost:6379/0 # real cross-process check
+
+A listening server is started in this process and a real Socket.IO client
+(python-socketio[client]) joins a room on it. With local:// a second server
+and a write-only emitter in the same process emit to that room. With any
+other queue URL a separate Python process emits through a write-only
+emitter, proving cross-process delivery.
+"""
+
+import sys
+import os
+import logging
+import queue
+import socket
+import subprocess
+import threading
+import time
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import socketio as socketio_client
+from flask import Flask, json
+from flask_socketio import SocketIO, join_room
+
+from services.socket_backplane import create_manager
+
+ROOM = 'backplane_check'
+EVENT = 'backplane_check'
+CHANNEL = f'backplane-check-{uuid.uuid4().hex[:8]}'
+
+def build_server(url):
+    """A minimal Socket.IO server attached to the backplane"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'backplane-check'
+    server = SocketIO()
+
+    @server.on('join')
+    def on_join(room):
+        join_room(room)
+        return True
+
+    server.init_app(app, async_mode='threading', client_manager=create_manager(url, CHANNEL))
+    return app, server
+
+def start_listener(url):
+    """Run a backplane-attached server on a free port and connect a real client to the room"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app, server = build_server(url)
+    threading.Thread(target=server.run, args=(app,), daemon=True, kwargs={
+        'host': '127.0.0.1', 'port': port, 'use_reloader': False,
+        'log_output': False, 'allow_unsafe_werkzeug': True
+    }).start()
+
+    received = queue.Queue()
+    client = socketio_client.Client()
+    client.on(EVENT, received.put)
+    for _ in range(50):
+        try:
+            client.connect(f'http://127.0.0.1:{port}', transports=['polling'])
+            break
+        except socketio_client.exceptions.ConnectionError:
+            time.sleep(0.1)
+    client.call('join', ROOM)
+    # Give the pub/sub listener time to subscribe before anything is published
+    time.sleep(0.5)
+    return client, received
+
+def wait_for(received, token, timeout=5.0):
+    """Wait until an event carrying token arrives"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if received.get(timeout=0.1).get('token') == token:
+                return True
+        except queue.Empty:
+            pass
+    return False
+
+def emit_from_another_process(url, token):
+    """Entry point of the child process: publish one event through a write-only emitter"""
+    emitter = create_manager(url, CHANNEL, write_only=True, json=json)
+    emitter.emit(EVENT, {'token': token, 'pid': os.getpid()}, namespace='/', room=ROOM)
+
+def check_backplane(url):
+    """Return True if every emit path reached the listening client"""
+    client, received = start_listener(url)
+
+    checks = []
+    if url.startswith('local://'):
+        _, other_server = build_server(url)
+        token = uuid.uuid4().hex
+        other_server.emit(EVENT, {'token': token}, room=ROOM)
+        checks.append(('emit from a second server', wait_for(received, token)))
+
+        token = uuid.uuid4().hex
+        create_manager(url, CHANNEL, write_only=True, json=json).emit(
+            EVENT, {'token': token}, namespace='/', room=ROOM
+        )
+        checks.append(('emit from a write-only emitter', wait_for(received, token)))
+    else:
+        token = uuid.uuid4().hex
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--emit', url, CHANNEL, token],
+            capture_output=True, text=True, timeout=30
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+        checks.append(('emit from another process', result.returncode == 0 and wait_for(received, token)))
+
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    client.disconnect()
+    return all(ok for _, ok in checks)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == '--emit':
+        CHANNEL = sys.argv[3]
+        emit_from_another_process(sys.argv[2], sys.argv[4])
+        sys.exit(0)
+
+    queue_url = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('SOCKETIO_MESSAGE_QUEUE') or 'local://'
+    print(f"Checking Socket.IO backplane {queue_url.split('@')[-1]}...")
+    sys.exit(0 if check_backplane(queue_url) else 1)
@@ -18,6 +18,68 @@ class Config:
     # Redis Configuration
     REDIS_URL = os.environ.get('REDIS_URL')
     
+    # Search result cache
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL') or 60)
+    SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES') or 2048)
+    
+    # Trending snapshot (seconds before a rebuild is triggered)
+    TRENDING_SNAPSHOT_MAX_AGE = int(os.environ.get('TRENDING_SNAPSHOT_MAX_AGE') or 300)
+    TRENDING_SNAPSHOT_TOP_N = int(os.environ.get('TRENDING_SNAPSHOT_TOP_N') or 50)
+    
+    # Saved-search alerts
+    SEARCH_ALERTS_ENABLED = os.environ.get('SEARCH_ALERTS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    SEARCH_ALERT_BATCH_SIZE = int(os.environ.get('SEARCH_ALERT_BATCH_SIZE') or 200)
+    SEARCH_ALERT_FLUSH_INTERVAL = float(os.environ.get('SEARCH_ALERT_FLUSH_INTERVAL') or 2.0)
+    
+    # Socket.IO backplane (e.g. redis://localhost:6379/0) so emits reach every worker
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'flask-socketio'
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None  # threading, eventlet or gevent
+    
+    # Typing and presence coalescing (seconds)
+    TYPING_FLUSH_INTERVAL = float(os.environ.get('TYPING_FLUSH_INTERVAL') or 0.5)
+    TYPING_TTL = float(os.environ.get('TYPING_TTL') or 6)
+    PRESENCE_FLUSH_INTERVAL = float(os.environ.get('PRESENCE_FLUSH_INTERVAL') or 2)
+    PRESENCE_TTL = float(os.environ.get('PRESENCE_TTL') or 90)
+    PRESENCE_OFFLINE_RETENTION = float(os.environ.get('PRESENCE_OFFLINE_RETENTION') or 600)
+    
+    # Seconds a socket connection's cached conversation ACL is trusted before reloading
+    SOCKET_ACL_TTL = float(os.environ.get('SOCKET_ACL_TTL') or 60)
+    
+    # Message fan-out (broadcast, unread counters, notifications) after the send commits
+    MESSAGE_DISPATCH_ASYNC = os.environ.get('MESSAGE_DISPATCH_ASYNC', 'true').lower() in ['true', 'on', '1']
+    MESSAGE_DISPATCH_BATCH_SIZE = int(os.environ.get('MESSAGE_DISPATCH_BATCH_SIZE') or 100)
+    MESSAGE_DISPATCH_MAX_ATTEMPTS = int(os.environ.get('MESSAGE_DISPATCH_MAX_ATTEMPTS') or 5)
+    MESSAGE_DISPATCH_RETRY_DELAY = float(os.environ.get('MESSAGE_DISPATCH_RETRY_DELAY') or 1.0)
+    
+    # Seconds of recent changes a messaging sync token never moves past (in-flight commits)
+    SYNC_SAFETY_LAG = float(os.environ.get('SYNC_SAFETY_LAG') or 5)
+    
+    # Notification dispatch (preferences, INSERT and channel delivery run off the request path)
+    NOTIFICATION_DISPATCH_ASYNC = os.environ.get('NOTIFICATION_DISPATCH_ASYNC', 'true').lower() in ['true', 'on', '1']
+    NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.environ.get('NOTIFICATION_DISPATCH_BATCH_SIZE') or 200)
+    NOTIFICATION_PUSH_BATCH_SIZE = int(os.environ.get('NOTIFICATION_PUSH_BATCH_SIZE') or 500)  # FCM maximum
+    NOTIFICATION_PUSH_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_PUSH_MAX_ATTEMPTS') or 5)
+    NOTIFICATION_PUSH_RETRY_DELAY = float(os.environ.get('NOTIFICATION_PUSH_RETRY_DELAY') or 1.0)
+    NOTIFICATION_PUSH_TRANSPORT = os.environ.get('NOTIFICATION_PUSH_TRANSPORT') or 'firebase'  # firebase or fake
+    
+    # Page follower / match participant fan-out (receivers streamed per chunk)
+    NOTIFICATION_FANOUT_ASYNC = os.environ.get('NOTIFICATION_FANOUT_ASYNC', 'true').lower() in ['true', 'on', '1']
+    NOTIFICATION_FANOUT_CHUNK_SIZE = int(os.environ.get('NOTIFICATION_FANOUT_CHUNK_SIZE') or 1000)
+    
+    # Compiled notification preferences cached per process (invalidated on write)
+    NOTIFICATION_PREFERENCE_CACHE_SIZE = int(os.environ.get('NOTIFICATION_PREFERENCE_CACHE_SIZE') or 50000)
+    NOTIFICATION_PREFERENCE_CACHE_TTL = int(os.environ.get('NOTIFICATION_PREFERENCE_CACHE_TTL') or 300)
+    
+    # Unread badge counters (reconcile_notification_counters.py recounts this many per UPDATE)
+    NOTIFICATION_COUNTER_RECONCILE_BATCH_SIZE = int(os.environ.get('NOTIFICATION_COUNTER_RECONCILE_BATCH_SIZE') or 1000)
+    
+    # Likes, comments and follows grouped per target (pushed at most once per interval per group)
+    NOTIFICATION_AGGREGATION_ENABLED = os.environ.get('NOTIFICATION_AGGREGATION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    NOTIFICATION_AGGREGATION_WINDOW = int(os.environ.get('NOTIFICATION_AGGREGATION_WINDOW') or 21600)  # seconds
+    NOTIFICATION_AGGREGATION_PUSH_INTERVAL = int(os.environ.get('NOTIFICATION_AGGREGATION_PUSH_INTERVAL') or 900)  # seconds
+    NOTIFICATION_AGGREGATION_SAMPLE_SIZE = int(os.environ.get('NOTIFICATION_AGGREGATION_SAMPLE_SIZE') or 3)
+    
     # Firebase Configuration
     FIREBASE_PROJECT_ID = os.environ.get('FIREBASE_PROJECT_ID')
     FIREBASE_PRIVATE_KEY_ID = os.environ.get('FIREBASE_PRIVATE_KEY_ID')
@@ -48,6 +110,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    SOCKETIO_MESSAGE_QUEUE = 'local://'
+    MESSAGE_DISPATCH_ASYNC = False
+    NOTIFICATION_DISPATCH_ASYNC = False
+    NOTIFICATION_FANOUT_ASYNC = False
+    NOTIFICATION_PUSH_TRANSPORT = 'fake'
 
 config = {
     'development': DevelopmentConfig,
@@ -4,10 +4,20 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable earthdistance for radius search (ll_to_earth / earth_box / earth_distance)
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+-- Enable trigram similarity for search relevance
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Change sequence shared by conversations, messages and read states (messaging delta sync)
+CREATE SEQUENCE IF NOT EXISTS messaging_change_seq;
+
 -- ✅ Enum Definitions (Place these at the TOP of the file, before any table)
 
 CREATE TYPE PAGETYPE AS ENUM ('Academy', 'Club', 'Community', 'Pitch');
-CREATE TYPE SEARCHTYPE AS ENUM ('User', 'Page', 'Post', 'Match', 'Event');
+CREATE TYPE SEARCHTYPE AS ENUM ('User', 'Page', 'Post', 'Match', 'Event', 'Global');
 CREATE TYPE MATCHTYPE AS ENUM ('Friendly', 'Tournament', 'League');
 CREATE TYPE MATCHSTATUS AS ENUM ('Upcoming', 'Live', 'Completed', 'Cancelled');
 CREATE TYPE ACADEMYTYPE AS ENUM ('Private', 'Government', 'Club');
@@ -15,6 +25,7 @@ CREATE TYPE ACADEMYLEVEL AS ENUM ('Beginner', 'Intermediate', 'Advanced', 'Profe
 CREATE TYPE RELATIONSHIPTYPE AS ENUM ('Follow', 'Friend', 'Block', 'Mute');
 CREATE TYPE RELATIONSHIPSTATUS AS ENUM ('Pending', 'Accepted', 'Rejected', 'Blocked');
 CREATE TYPE NOTIFICATIONTYPE AS ENUM ('Like', 'Comment', 'Follow', 'Message', 'Match', 'System');
+CREATE TYPE NOTIFICATIONSTATUS AS ENUM ('PENDING', 'SENT', 'DELIVERED', 'READ', 'FAILED');
 CREATE TYPE MATCHFORMAT AS ENUM ('T20', 'ODI', 'Test', 'T10', 'Other');
 
 CREATE TABLE users (
@@ -36,6 +47,9 @@ CREATE TABLE conversations (
     user2_id UUID NOT NULL REFERENCES users(id),
     last_message_at TIMESTAMP WITHOUT TIME ZONE,
     last_message_content TEXT,
+    last_message_sender_id UUID REFERENCES users(id),
+    change_seq BIGINT DEFAULT nextval('messaging_change_seq'),
+    pair_key VARCHAR(73),
     is_active BOOLEAN DEFAULT true,
     created_by UUID REFERENCES users(id),
     updated_by UUID REFERENCES users(id),
@@ -112,7 +126,13 @@ CREATE TABLE page_profiles (
 	updated_by UUID REFERENCES users(id),
 	deleted_at TIMESTAMP WITHOUT TIME ZONE,
 	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
-	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	search_vector TSVECTOR GENERATED ALWAYS AS (
+		setweight(to_tsvector('english', coalesce(academy_name, '')), 'A') ||
+		setweight(to_tsvector('english', coalesce(tagline, '')), 'B') ||
+		setweight(to_tsvector('english', coalesce(city, '') || ' ' || coalesce(state, '')), 'C') ||
+		setweight(to_tsvector('english', coalesce(description, '')), 'D')
+	) STORED
 );
 
 -- Academy-specific details table
@@ -187,6 +207,8 @@ CREATE TABLE matches (
 	match_format MATCHFORMAT NOT NULL,
 	location VARCHAR(200) NOT NULL, 
 	venue VARCHAR(200), 
+	latitude DOUBLE PRECISION,
+	longitude DOUBLE PRECISION,
 	match_date DATE NOT NULL, 
 	match_time TIME WITHOUT TIME ZONE NOT NULL, 
 	players_needed INTEGER NOT NULL, 
@@ -232,6 +254,25 @@ CREATE TABLE matches (
 );
 
 -- Match Teams Table
+CREATE TABLE device_tokens (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token VARCHAR(255) NOT NULL UNIQUE,
+    platform VARCHAR(20),
+    last_seen_at TIMESTAMP WITHOUT TIME ZONE,
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
+CREATE TABLE notification_counters (
+    user_id UUID NOT NULL UNIQUE REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    reconciled_at TIMESTAMP WITHOUT TIME ZONE,
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+
 CREATE TABLE match_teams (
 	team_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
 	match_id UUID NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
@@ -401,6 +442,7 @@ CREATE TABLE search_filters (
 	is_public BOOLEAN, 
 	usage_count INTEGER, 
 	last_used TIMESTAMP WITHOUT TIME ZONE, 
+	alerts_enabled BOOLEAN DEFAULT true,
 	is_active BOOLEAN DEFAULT true,
 	created_by UUID REFERENCES users(id),
 	updated_by UUID REFERENCES users(id),
@@ -409,6 +451,14 @@ CREATE TABLE search_filters (
 	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
 );
 
+-- Reverse index of saved filters for search alerts (see services/search_alerts.py)
+CREATE TABLE search_filter_terms (
+	filter_id UUID NOT NULL REFERENCES search_filters(id) ON DELETE CASCADE,
+	kind VARCHAR(20) NOT NULL,
+	term VARCHAR(200) NOT NULL,
+	PRIMARY KEY (filter_id, kind, term)
+);
+
 CREATE TABLE search_analytics (
 	date DATE NOT NULL, 
 	total_searches INTEGER, 
@@ -424,6 +474,17 @@ CREATE TABLE search_analytics (
 	CONSTRAINT search_analytics_date_key UNIQUE (date)
 );
 
+CREATE TABLE trending_snapshots (
+	version INTEGER NOT NULL, 
+	built_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, 
+	build_duration DOUBLE PRECISION, 
+	payload JSON NOT NULL, 
+	id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),  
+	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, 
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, 
+	CONSTRAINT trending_snapshots_version_key UNIQUE (version)
+);
+
 CREATE TABLE notification_preferences (
 	user_id UUID NOT NULL REFERENCES users(id), 
 	push_enabled BOOLEAN, 
@@ -948,13 +1009,53 @@ CREATE TABLE messages (
     content TEXT NOT NULL,
     is_read BOOLEAN,
     read_at TIMESTAMP WITHOUT TIME ZONE,
+    reply_to_message_id UUID REFERENCES messages(id) ON DELETE SET NULL,
+    change_seq BIGINT DEFAULT nextval('messaging_change_seq'),
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
     updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
 );
 
+-- Per-participant unread counters and read watermarks (see services/inbox_service.py)
+CREATE TABLE conversation_read_states (
+    conversation_id UUID NOT NULL REFERENCES conversations(id),
+    user_id UUID NOT NULL REFERENCES users(id),
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    last_read_message_id UUID REFERENCES messages(id),
+    last_read_message_at TIMESTAMP WITHOUT TIME ZONE,
+    last_read_at TIMESTAMP WITHOUT TIME ZONE,
+    change_seq BIGINT DEFAULT nextval('messaging_change_seq'),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    CONSTRAINT unique_conversation_read_state UNIQUE (conversation_id, user_id)
+);
+
+-- Normalized message reactions and their maintained counts (see services/reaction_service.py)
+CREATE TABLE message_reactions (
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id),
+    emoji VARCHAR(32) NOT NULL,
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    CONSTRAINT unique_message_reaction UNIQUE (message_id, user_id, emoji)
+);
+
+CREATE TABLE message_reaction_counts (
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    conversation_id UUID NOT NULL REFERENCES conversations(id),
+    emoji VARCHAR(32) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    change_seq BIGINT DEFAULT nextval('messaging_change_seq'),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    CONSTRAINT unique_message_reaction_count UNIQUE (message_id, emoji)
+);
+
 CREATE TABLE notifications (
-	sender_id UUID NOT NULL REFERENCES users(id), 
+	sender_id UUID REFERENCES users(id), 
 	receiver_id UUID NOT NULL REFERENCES users(id), 
 	type NOTIFICATIONTYPE NOT NULL, 
 	title VARCHAR(200) NOT NULL, 
@@ -964,9 +1065,20 @@ CREATE TABLE notifications (
 	related_post_id UUID REFERENCES posts(id), 
 	related_match_id UUID REFERENCES matches(id), 
 	related_message_id UUID REFERENCES messages(id), 
+	status NOTIFICATIONSTATUS, 
+	push_attempts INTEGER DEFAULT 0, 
+	sent_at TIMESTAMP WITHOUT TIME ZONE, 
+	delivered_at TIMESTAMP WITHOUT TIME ZONE, 
+	failure_reason VARCHAR(100), 
+	group_key VARCHAR(120), 
+	actor_count INTEGER DEFAULT 1, 
+	sample_actor_ids JSON, 
+	last_actor_at TIMESTAMP WITHOUT TIME ZONE, 
+	last_pushed_at TIMESTAMP WITHOUT TIME ZONE, 
 	id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),  
 	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, 
-	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, 
+	CONSTRAINT uq_notifications_receiver_group UNIQUE (receiver_id, group_key)
 );
 
 CREATE TABLE match_teams (
@@ -1035,6 +1147,7 @@ CREATE INDEX idx_page_profiles_is_verified ON page_profiles(is_verified);
 CREATE INDEX idx_page_profiles_is_active ON page_profiles(is_active);
 CREATE INDEX idx_page_profiles_created_at ON page_profiles(created_at);
 CREATE INDEX idx_page_profiles_location ON page_profiles USING GIST (ll_to_earth(latitude, longitude));
+CREATE INDEX idx_page_profiles_search_vector ON page_profiles USING GIN (search_vector);
 
 -- Matches indexes
 CREATE INDEX idx_matches_creator_id ON matches(creator_id);
@@ -1043,6 +1156,7 @@ CREATE INDEX idx_matches_status ON matches(status);
 CREATE INDEX idx_matches_match_type ON matches(match_type);
 CREATE INDEX idx_matches_match_format ON matches(match_format);
 CREATE INDEX idx_matches_location ON matches(location);
+CREATE INDEX idx_matches_geo ON matches USING GIST (ll_to_earth(latitude, longitude));
 CREATE INDEX idx_matches_is_public ON matches(is_public);
 CREATE INDEX idx_matches_is_active ON matches(is_active);
 CREATE INDEX idx_matches_created_at ON matches(created_at);
@@ -1288,4 +1402,39 @@ CREATE INDEX idx_members_created_at ON members(created_at);
 CREATE INDEX idx_job_applications_job_id ON job_applications(job_id);
 CREATE INDEX idx_job_applications_applicant_user_id ON job_applications(applicant_user_id);
 CREATE INDEX idx_job_applications_status ON job_applications(status);
-CREATE INDEX idx_job_applications_applied_at ON job_applications(applied_at);
\ No newline at end of file
+CREATE INDEX idx_job_applications_applied_at ON job_applications(applied_at);
+-- Trigram indexes for fuzzy search (serve both similarity % and ILIKE '%...%')
+CREATE INDEX idx_users_username_trgm ON users USING GIN (username gin_trgm_ops);
+CREATE INDEX idx_user_profiles_full_name_trgm ON user_profiles USING GIN (full_name gin_trgm_ops);
+CREATE INDEX idx_user_profiles_location_trgm ON user_profiles USING GIN (location gin_trgm_ops);
+CREATE INDEX idx_matches_name_trgm ON matches USING GIN (match_name gin_trgm_ops);
+CREATE INDEX idx_matches_location_trgm ON matches USING GIN (location gin_trgm_ops);
+CREATE INDEX idx_matches_venue_trgm ON matches USING GIN (venue gin_trgm_ops);
+CREATE INDEX idx_page_profiles_academy_name_trgm ON page_profiles USING GIN (academy_name gin_trgm_ops);
+CREATE INDEX idx_page_profiles_city_trgm ON page_profiles USING GIN (city gin_trgm_ops);
+CREATE INDEX idx_jobs_title_trgm ON jobs USING GIN (title gin_trgm_ops);
+CREATE INDEX idx_jobs_location_trgm ON jobs USING GIN (location gin_trgm_ops);
+
+-- Saved-search alert lookup
+CREATE INDEX idx_search_filter_terms_kind_term ON search_filter_terms(kind, term);
+
+-- Inbox read states
+CREATE INDEX idx_conversation_read_states_user_id ON conversation_read_states(user_id);
+
+-- Keyset-paged message history (see services/message_history.py)
+CREATE INDEX idx_messages_conversation_created_at_id ON messages(conversation_id, created_at, id);
+
+-- Messaging delta sync (see services/sync_service.py)
+CREATE INDEX ix_conversations_change_seq ON conversations(change_seq);
+CREATE INDEX idx_messages_conversation_change_seq ON messages(conversation_id, change_seq);
+CREATE INDEX idx_conversation_read_states_conversation_change_seq ON conversation_read_states(conversation_id, change_seq);
+CREATE INDEX idx_message_reaction_counts_conversation_change_seq ON message_reaction_counts(conversation_id, change_seq);
+
+-- Direct conversations keyed by "<smaller user id>:<larger user id>"
+CREATE UNIQUE INDEX idx_conversations_pair_key ON conversations(pair_key);
+
+-- Push targets per user (see services/notification_dispatch.py)
+CREATE INDEX ix_device_tokens_user_id ON device_tokens(user_id);
+
+-- Unread badge counts and their reconciliation (see services/notification_counter.py)
+CREATE INDEX idx_notifications_receiver_is_read ON notifications(receiver_id, is_read);
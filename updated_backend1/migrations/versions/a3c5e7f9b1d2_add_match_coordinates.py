@@ -0,0 +1,37 @@
+"""Add match coordinates and earthdistance indexes for radius search
+
+Revision ID: a3c5e7f9b1d2
+Revises: 29e06ed8-095
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d2'
+down_revision = '29e06ed8-095'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+        op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+        op.execute('CREATE INDEX IF NOT EXISTS idx_matches_geo ON matches USING GIST (ll_to_earth(latitude, longitude))')
+        op.execute('CREATE INDEX IF NOT EXISTS idx_page_profiles_location ON page_profiles USING GIST (ll_to_earth(latitude, longitude))')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS idx_matches_geo')
+
+    with op.batch_alter_table('matches', schema=None) as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
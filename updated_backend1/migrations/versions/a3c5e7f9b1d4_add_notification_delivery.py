@@ -0,0 +1,67 @@
+"""Add notification delivery status columns and device_tokens
+
+Revision ID: a3c5e7f9b1d4
+Revises: f2b4d6e8a0c3
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d4'
+down_revision = 'f2b4d6e8a0c3'
+branch_labels = None
+depends_on = None
+
+NOTIFICATION_STATUSES = ('PENDING', 'SENT', 'DELIVERED', 'READ', 'FAILED')
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    if postgres:
+        op.execute("CREATE TYPE notificationstatus AS ENUM ('PENDING', 'SENT', 'DELIVERED', 'READ', 'FAILED')")
+        status_type = postgresql.ENUM(*NOTIFICATION_STATUSES, name='notificationstatus', create_type=False)
+    else:
+        status_type = sa.Enum(*NOTIFICATION_STATUSES, name='notificationstatus')
+
+    # Existing notifications were delivered (or not) synchronously; count them as sent
+    op.add_column('notifications', sa.Column('status', status_type, nullable=True, server_default='SENT'))
+    op.add_column('notifications', sa.Column('push_attempts', sa.Integer(), nullable=True, server_default='0'))
+    op.add_column('notifications', sa.Column('sent_at', sa.DateTime(), nullable=True))
+    op.add_column('notifications', sa.Column('delivered_at', sa.DateTime(), nullable=True))
+    op.add_column('notifications', sa.Column('failure_reason', sa.String(length=100), nullable=True))
+    op.alter_column('notifications', 'status', server_default=None)
+
+    # System notifications have no sender
+    op.alter_column('notifications', 'sender_id', existing_type=sa.UUID(), nullable=True)
+
+    op.create_table(
+        'device_tokens',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('token', sa.String(length=255), nullable=False),
+        sa.Column('platform', sa.String(length=20), nullable=True),
+        sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token')
+    )
+    op.create_index('ix_device_tokens_user_id', 'device_tokens', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_device_tokens_user_id', table_name='device_tokens')
+    op.drop_table('device_tokens')
+    op.alter_column('notifications', 'sender_id', existing_type=sa.UUID(), nullable=False)
+    op.drop_column('notifications', 'failure_reason')
+    op.drop_column('notifications', 'delivered_at')
+    op.drop_column('notifications', 'sent_at')
+    op.drop_column('notifications', 'push_attempts')
+    op.drop_column('notifications', 'status')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TYPE IF EXISTS notificationstatus")
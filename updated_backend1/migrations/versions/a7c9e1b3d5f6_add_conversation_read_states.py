@@ -0,0 +1,63 @@
+"""Add conversation_read_states and conversations.last_message_sender_id
+
+Revision ID: a7c9e1b3d5f6
+Revises: f6b8d0a2c4e5
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1b3d5f6'
+down_revision = 'f6b8d0a2c4e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('last_message_sender_id', sa.UUID(), nullable=True))
+    op.create_foreign_key('conversations_last_message_sender_id_fkey', 'conversations', 'users',
+                          ['last_message_sender_id'], ['id'])
+
+    op.create_table(
+        'conversation_read_states',
+        sa.Column('conversation_id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_read_message_id', sa.UUID(), nullable=True),
+        sa.Column('last_read_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['last_read_message_id'], ['messages.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('conversation_id', 'user_id', name='unique_conversation_read_state')
+    )
+    op.create_index('idx_conversation_read_states_user_id', 'conversation_read_states', ['user_id'])
+
+    # Seed counters for existing direct conversations; anything missed is
+    # backfilled lazily by the inbox service
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            INSERT INTO conversation_read_states (id, conversation_id, user_id, unread_count, created_at, updated_at)
+            SELECT uuid_generate_v4(), c.id, members.user_id,
+                   (SELECT count(*) FROM messages m
+                     WHERE m.conversation_id = c.id
+                       AND m.receiver_id = members.user_id
+                       AND m.is_read IS NOT TRUE),
+                   now(), now()
+            FROM conversations c
+            CROSS JOIN LATERAL (VALUES (c.user1_id), (c.user2_id)) AS members(user_id)
+            ON CONFLICT (conversation_id, user_id) DO NOTHING
+        """)
+
+
+def downgrade():
+    op.drop_index('idx_conversation_read_states_user_id', table_name='conversation_read_states')
+    op.drop_table('conversation_read_states')
+    op.drop_constraint('conversations_last_message_sender_id_fkey', 'conversations', type_='foreignkey')
+    op.drop_column('conversations', 'last_message_sender_id')
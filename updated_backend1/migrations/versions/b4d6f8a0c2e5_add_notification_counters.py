@@ -0,0 +1,50 @@
+"""Add notification_counters for maintained unread badge counts
+
+Revision ID: b4d6f8a0c2e5
+Revises: a3c5e7f9b1d4
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c2e5'
+down_revision = 'a3c5e7f9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id')
+    )
+    op.alter_column('notification_counters', 'unread_count', server_default=None)
+
+    # Unread lookups and the reconciler's recount
+    op.create_index('idx_notifications_receiver_is_read', 'notifications', ['receiver_id', 'is_read'])
+
+    # Seed counters from the existing unread notifications
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            INSERT INTO notification_counters (id, user_id, unread_count, reconciled_at, created_at, updated_at)
+            SELECT uuid_generate_v4(), receiver_id, count(*), now(), now(), now()
+            FROM notifications
+            WHERE is_read = false
+            GROUP BY receiver_id
+        """)
+
+
+def downgrade():
+    op.drop_index('idx_notifications_receiver_is_read', table_name='notifications')
+    op.drop_table('notification_counters')
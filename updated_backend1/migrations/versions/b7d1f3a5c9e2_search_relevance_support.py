@@ -0,0 +1,32 @@
+"""Enable pg_trgm and add Global search type for SQL relevance ranking
+
+Revision ID: b7d1f3a5c9e2
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d1f3a5c9e2'
+down_revision = 'a3c5e7f9b1d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block on older servers
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE searchtype ADD VALUE IF NOT EXISTS 'Global'")
+
+
+def downgrade():
+    # Enum values cannot be dropped in PostgreSQL; pg_trgm is left installed
+    # because later indexes may depend on it.
+    pass
@@ -0,0 +1,45 @@
+"""Add conversation_read_states.last_read_message_at read watermark
+
+Revision ID: b8d0f2a4c6e7
+Revises: a7c9e1b3d5f6
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c6e7'
+down_revision = 'a7c9e1b3d5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversation_read_states', sa.Column('last_read_message_at', sa.DateTime(), nullable=True))
+
+    # Existing watermarks take the timestamp of the message they point at;
+    # legacy per-message is_read flags are folded in for recipients without one
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            UPDATE conversation_read_states s
+            SET last_read_message_at = m.created_at
+            FROM messages m
+            WHERE m.id = s.last_read_message_id
+        """)
+        op.execute("""
+            UPDATE conversation_read_states s
+            SET last_read_message_at = r.read_up_to
+            FROM (SELECT conversation_id, receiver_id, max(created_at) AS read_up_to
+                  FROM messages
+                  WHERE is_read IS TRUE
+                  GROUP BY conversation_id, receiver_id) r
+            WHERE r.conversation_id = s.conversation_id
+              AND r.receiver_id = s.user_id
+              AND s.last_read_message_at IS NULL
+        """)
+
+
+def downgrade():
+    op.drop_column('conversation_read_states', 'last_read_message_at')
@@ -0,0 +1,35 @@
+"""Add trending_snapshots table
+
+Revision ID: c2e4a6b8d0f1
+Revises: b7d1f3a5c9e2
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e4a6b8d0f1'
+down_revision = 'b7d1f3a5c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'trending_snapshots',
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.Column('build_duration', sa.Float(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('version', name='trending_snapshots_version_key')
+    )
+
+
+def downgrade():
+    op.drop_table('trending_snapshots')
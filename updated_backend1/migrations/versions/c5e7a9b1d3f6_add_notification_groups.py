@@ -0,0 +1,36 @@
+"""Add aggregation columns to notifications
+
+Revision ID: c5e7a9b1d3f6
+Revises: b4d6f8a0c2e5
+Create Date: 2026-10-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7a9b1d3f6'
+down_revision = 'b4d6f8a0c2e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing notifications are single-actor and ungrouped (NULL group_key)
+    op.add_column('notifications', sa.Column('group_key', sa.String(length=120), nullable=True))
+    op.add_column('notifications', sa.Column('actor_count', sa.Integer(), nullable=True, server_default='1'))
+    op.add_column('notifications', sa.Column('sample_actor_ids', sa.JSON(), nullable=True))
+    op.add_column('notifications', sa.Column('last_actor_at', sa.DateTime(), nullable=True))
+    op.add_column('notifications', sa.Column('last_pushed_at', sa.DateTime(), nullable=True))
+    op.alter_column('notifications', 'actor_count', server_default=None)
+    op.create_unique_constraint('uq_notifications_receiver_group', 'notifications', ['receiver_id', 'group_key'])
+
+
+def downgrade():
+    op.drop_constraint('uq_notifications_receiver_group', 'notifications', type_='unique')
+    op.drop_column('notifications', 'last_pushed_at')
+    op.drop_column('notifications', 'last_actor_at')
+    op.drop_column('notifications', 'sample_actor_ids')
+    op.drop_column('notifications', 'actor_count')
+    op.drop_column('notifications', 'group_key')
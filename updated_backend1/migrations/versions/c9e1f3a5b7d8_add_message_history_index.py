@@ -0,0 +1,30 @@
+"""Add messages.reply_to_message_id and the (conversation_id, created_at, id) history index
+
+Revision ID: c9e1f3a5b7d8
+Revises: b8d0f2a4c6e7
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1f3a5b7d8'
+down_revision = 'b8d0f2a4c6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('messages', sa.Column('reply_to_message_id', sa.UUID(), nullable=True))
+    op.create_foreign_key('messages_reply_to_message_id_fkey', 'messages', 'messages',
+                          ['reply_to_message_id'], ['id'], ondelete='SET NULL')
+    op.create_index('idx_messages_conversation_created_at_id', 'messages',
+                    ['conversation_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('idx_messages_conversation_created_at_id', table_name='messages')
+    op.drop_constraint('messages_reply_to_message_id_fkey', 'messages', type_='foreignkey')
+    op.drop_column('messages', 'reply_to_message_id')
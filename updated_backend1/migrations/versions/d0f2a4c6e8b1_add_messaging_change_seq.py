@@ -0,0 +1,52 @@
+"""Add the messaging change sequence for delta sync
+
+Revision ID: d0f2a4c6e8b1
+Revises: c9e1f3a5b7d8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0f2a4c6e8b1'
+down_revision = 'c9e1f3a5b7d8'
+branch_labels = None
+depends_on = None
+
+TABLES = ('conversations', 'messages', 'conversation_read_states')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), nullable=True))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE SEQUENCE IF NOT EXISTS messaging_change_seq")
+        # Existing rows get sequence values in the order they last changed
+        for table in TABLES:
+            op.execute(f"""
+                UPDATE {table} t SET change_seq = ordered.seq
+                FROM (
+                    SELECT id, nextval('messaging_change_seq') AS seq
+                    FROM (SELECT id FROM {table} ORDER BY updated_at, id) oldest_first
+                ) ordered
+                WHERE t.id = ordered.id
+            """)
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN change_seq SET DEFAULT nextval('messaging_change_seq')")
+
+    op.create_index('ix_conversations_change_seq', 'conversations', ['change_seq'])
+    op.create_index('idx_messages_conversation_change_seq', 'messages', ['conversation_id', 'change_seq'])
+    op.create_index('idx_conversation_read_states_conversation_change_seq', 'conversation_read_states',
+                    ['conversation_id', 'change_seq'])
+
+
+def downgrade():
+    op.drop_index('idx_conversation_read_states_conversation_change_seq', table_name='conversation_read_states')
+    op.drop_index('idx_messages_conversation_change_seq', table_name='messages')
+    op.drop_index('ix_conversations_change_seq', table_name='conversations')
+    for table in TABLES:
+        op.drop_column(table, 'change_seq')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP SEQUENCE IF EXISTS messaging_change_seq")
@@ -0,0 +1,57 @@
+"""Add GIN trigram indexes for fuzzy search
+
+Revision ID: d4f6b8a0c2e3
+Revises: c2e4a6b8d0f1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8a0c2e3'
+down_revision = 'c2e4a6b8d0f1'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, candidate columns - the first one present is indexed)
+TRIGRAM_INDEXES = [
+    ('idx_users_username_trgm', 'users', ['username']),
+    ('idx_user_profiles_full_name_trgm', 'user_profiles', ['full_name']),
+    ('idx_user_profiles_location_trgm', 'user_profiles', ['location']),
+    ('idx_matches_name_trgm', 'matches', ['title', 'match_name']),
+    ('idx_matches_location_trgm', 'matches', ['location']),
+    ('idx_matches_venue_trgm', 'matches', ['venue']),
+    ('idx_page_profiles_academy_name_trgm', 'page_profiles', ['academy_name']),
+    ('idx_page_profiles_city_trgm', 'page_profiles', ['city']),
+    ('idx_jobs_title_trgm', 'jobs', ['title']),
+    ('idx_jobs_location_trgm', 'jobs', ['location']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for index_name, table, candidates in TRIGRAM_INDEXES:
+        if table not in tables:
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        column = next((name for name in candidates if name in columns), None)
+        if column:
+            op.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING GIN ({column} gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for index_name, _, _ in TRIGRAM_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index_name}')
@@ -0,0 +1,59 @@
+"""Add message_reactions and message_reaction_counts
+
+Revision ID: e1a3b5c7d9f2
+Revises: d0f2a4c6e8b1
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a3b5c7d9f2'
+down_revision = 'd0f2a4c6e8b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'message_reactions',
+        sa.Column('message_id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('emoji', sa.String(length=32), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id', 'user_id', 'emoji', name='unique_message_reaction')
+    )
+
+    op.create_table(
+        'message_reaction_counts',
+        sa.Column('message_id', sa.UUID(), nullable=False),
+        sa.Column('conversation_id', sa.UUID(), nullable=False),
+        sa.Column('emoji', sa.String(length=32), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('change_seq', sa.BigInteger(), nullable=True),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id', 'emoji', name='unique_message_reaction_count')
+    )
+    op.create_index('idx_message_reaction_counts_conversation_change_seq', 'message_reaction_counts',
+                    ['conversation_id', 'change_seq'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE message_reaction_counts ALTER COLUMN change_seq SET DEFAULT nextval('messaging_change_seq')")
+
+
+def downgrade():
+    op.drop_index('idx_message_reaction_counts_conversation_change_seq', table_name='message_reaction_counts')
+    op.drop_table('message_reaction_counts')
+    op.drop_table('message_reactions')
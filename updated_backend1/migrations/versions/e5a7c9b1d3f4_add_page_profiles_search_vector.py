@@ -0,0 +1,41 @@
+"""Add stored search_vector column and GIN index to page_profiles
+
+Revision ID: e5a7c9b1d3f4
+Revises: d4f6b8a0c2e3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9b1d3f4'
+down_revision = 'd4f6b8a0c2e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated columns need PostgreSQL 12+; other databases use the ILIKE fallback
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("""
+        ALTER TABLE page_profiles
+        ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(academy_name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(tagline, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(city, '') || ' ' || coalesce(state, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'D')
+        ) STORED
+    """)
+    op.execute('CREATE INDEX IF NOT EXISTS idx_page_profiles_search_vector ON page_profiles USING GIN (search_vector)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS idx_page_profiles_search_vector')
+    op.execute('ALTER TABLE page_profiles DROP COLUMN IF EXISTS search_vector')
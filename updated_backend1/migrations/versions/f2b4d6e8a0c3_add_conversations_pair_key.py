@@ -0,0 +1,46 @@
+"""Add conversations.pair_key with a unique index for direct conversation lookup
+
+Revision ID: f2b4d6e8a0c3
+Revises: e1a3b5c7d9f2
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b4d6e8a0c3'
+down_revision = 'e1a3b5c7d9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('pair_key', sa.String(length=73), nullable=True))
+
+    # Key existing direct conversations (those without group participants).
+    # Where duplicates were created by racing requests, the oldest one keeps
+    # the key and the others stay reachable by id only.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            UPDATE conversations c SET pair_key = keyed.pair_key
+            FROM (
+                SELECT id, pair_key,
+                       row_number() OVER (PARTITION BY pair_key ORDER BY created_at, id) AS position
+                FROM (
+                    SELECT id, created_at,
+                           least(user1_id::text, user2_id::text) || ':' || greatest(user1_id::text, user2_id::text) AS pair_key
+                    FROM conversations
+                    WHERE NOT EXISTS (SELECT 1 FROM conversation_participants p WHERE p.conversation_id = conversations.id)
+                ) direct
+            ) keyed
+            WHERE c.id = keyed.id AND keyed.position = 1
+        """)
+
+    op.create_index('idx_conversations_pair_key', 'conversations', ['pair_key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('idx_conversations_pair_key', table_name='conversations')
+    op.drop_column('conversations', 'pair_key')
@@ -0,0 +1,37 @@
+"""Add saved-search alerts: search_filters.alerts_enabled and search_filter_terms
+
+Revision ID: f6b8d0a2c4e5
+Revises: e5a7c9b1d3f4
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0a2c4e5'
+down_revision = 'e5a7c9b1d3f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('search_filters', sa.Column('alerts_enabled', sa.Boolean(), nullable=True,
+                                              server_default=sa.true()))
+    op.create_table(
+        'search_filter_terms',
+        sa.Column('filter_id', sa.UUID(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('term', sa.String(length=200), nullable=False),
+        sa.ForeignKeyConstraint(['filter_id'], ['search_filters.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('filter_id', 'kind', 'term')
+    )
+    op.create_index('idx_search_filter_terms_kind_term', 'search_filter_terms', ['kind', 'term'])
+    # Existing saved filters are indexed by rebuild_search_alert_index.py
+
+
+def downgrade():
+    op.drop_index('idx_search_filter_terms_kind_term', table_name='search_filter_terms')
+    op.drop_table('search_filter_terms')
+    op.drop_column('search_filters', 'alerts_enabled')
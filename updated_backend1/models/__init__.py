@@ -4,9 +4,9 @@ from .profile_page import ProfilePage, PageAdmin, AcademyStudent, AcademyProgram
 from .details import AcademyDetails, VenueDetails, CommunityDetails
 from .post import Post, PostLike, PostComment, PostBookmark, PostShare
 from .match import Match, MatchParticipant, MatchComment, MatchLike, MatchTeam, MatchUmpire, MatchTeamParticipant
-from .message import Message, Conversation, ConversationParticipant
-from .notification import Notification, NotificationPreferences
-from .search import SearchResult, SearchTrend, SearchSuggestion, SearchFilter, SearchAnalytics
+from .message import Message, Conversation, ConversationParticipant, ConversationReadState, MessageReaction, MessageReactionCount
+from .notification import Notification, NotificationPreferences, NotificationCounter, DeviceToken
+from .search import SearchResult, SearchTrend, SearchSuggestion, SearchFilter, SearchFilterTerm, SearchAnalytics, TrendingSnapshot
 from .page_followers import PageFollower
 from .relationships import Relationship
 from .otp import PasswordResetOTP
@@ -43,13 +43,20 @@ __all__ = [
     'Message',
     'Conversation',
     'ConversationParticipant',
+    'ConversationReadState',
+    'MessageReaction',
+    'MessageReactionCount',
     'Notification',
     'NotificationPreferences',
+    'NotificationCounter',
+    'DeviceToken',
     'SearchResult',
     'SearchTrend',
     'SearchSuggestion',
     'SearchFilter',
+    'SearchFilterTerm',
     'SearchAnalytics',
+    'TrendingSnapshot',
     'PasswordResetOTP',
     'ProfilePage',
     'PageAdmin',
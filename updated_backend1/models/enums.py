@@ -20,6 +20,7 @@ class SearchType(Enum):
     COMMUNITY = "Community"
     VENUE = "Venue"
     LOCATION = "Location"
+    GLOBAL = "Global"
 
 class MatchType(Enum):
     FRIENDLY = "friendly"
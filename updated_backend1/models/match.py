@@ -12,6 +12,8 @@ class Match(BaseModel):
     match_type = db.Column(db.String(20), nullable=False)
     location = db.Column(db.String(200), nullable=False)
     venue = db.Column(db.String(200))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     
     # Date and time
     match_date = db.Column(db.Date, nullable=False)
@@ -377,16 +379,17 @@ class Match(BaseModel):
         }
     
     @classmethod
-    def get_nearby_matches(cls, latitude, longitude, radius_km=50, page=1, per_page=20):
-        """Get matches near a location (requires location data in match)"""
-        # This is a simplified version - in production, you'd use PostGIS or similar
-        matches = cls.query.filter(cls.status == MatchStatus.UPCOMING)
-        matches = matches.order_by(cls.match_date.asc())
-        
-        return matches.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+    def get_nearby_matches(cls, latitude, longitude, radius_km=50, limit=20, cursor=None):
+        """Get upcoming matches within radius_km, nearest first
+
+        Returns ([(match, distance_km)], next_cursor).
+        """
+        from services.geo_search import geo_search_service
+
+        query = cls.query.filter(cls.status == MatchStatus.UPCOMING)
+        return geo_search_service.nearby(
+            cls, query, latitude, longitude, radius_km,
+            limit=limit, cursor=cursor
         )
 
 class MatchParticipant(BaseModel):
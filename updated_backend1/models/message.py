@@ -1,6 +1,31 @@
 from .base import BaseModel, db
+import uuid
 from datetime import datetime
 from enum import Enum
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session
+
+# Messaging rows carry a change_seq drawn from one sequence so offline clients
+# can sync everything that changed since a token (services/sync_service.py)
+MESSAGING_CHANGE_SEQUENCE = 'messaging_change_seq'
+messaging_change_seq = db.Sequence(MESSAGING_CHANGE_SEQUENCE, metadata=db.metadata)
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def direct_pair_key(user_a, user_b):
+    """Canonical key of the direct conversation between two users, in either order"""
+    first, second = sorted(str(_as_uuid(user_id)) for user_id in (user_a, user_b))
+    return f"{first}:{second}"
+
+
+def dialect_insert(table):
+    """INSERT supporting ON CONFLICT clauses for the bound dialect (PostgreSQL or SQLite)"""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(table)
 
 class ConversationType(Enum):
     DIRECT = "direct"
@@ -29,10 +54,21 @@ class Conversation(BaseModel):
     # Last message info
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_message_content = db.Column(db.Text)
+    last_message_sender_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    change_seq = db.Column(db.BigInteger, index=True)
+    
+    # Direct conversations only: "<smaller user id>:<larger user id>" (see direct_pair_key)
+    pair_key = db.Column(db.String(73), nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_conversations_pair_key', 'pair_key', unique=True),
+    )
     
     # Message relationships
     messages = db.relationship('Message', backref='conversation', lazy='dynamic', cascade='all, delete-orphan')
     participants = db.relationship('ConversationParticipant', backref='conversation', lazy='dynamic', cascade='all, delete-orphan')
+    read_states = db.relationship('ConversationReadState', backref='conversation', lazy='dynamic', cascade='all, delete-orphan')
+    last_message_sender = db.relationship('User', foreign_keys=[last_message_sender_id])
     
     def to_dict(self):
         """Convert conversation to dictionary with user info"""
@@ -116,25 +152,36 @@ class Conversation(BaseModel):
     
     @classmethod
     def get_or_create_direct_conversation(cls, user1_id, user2_id):
-        """Get existing direct conversation or create new one between two users"""
-        # Ensure consistent ordering for unique constraint
-        if user1_id > user2_id:
-            user1_id, user2_id = user2_id, user1_id
+        """Get or atomically create the direct conversation between two users
         
-        conversation = cls.query.filter_by(
-            user1_id=user1_id, 
-            user2_id=user2_id,
-            conversation_type=ConversationType.DIRECT
-        ).first()
+        Looked up by the canonical pair_key. Concurrent callers race on its
+        unique index with ON CONFLICT DO NOTHING and all end up with the
+        same row. Commits when it creates.
+        """
+        pair_key = direct_pair_key(user1_id, user2_id)
+        conversation = cls.query.filter_by(pair_key=pair_key).first()
+        if conversation:
+            return conversation
         
-        if not conversation:
-            conversation = cls(
-                user1_id=user1_id,
-                user2_id=user2_id,
-                conversation_type=ConversationType.DIRECT
-            )
-            conversation.save()
-        return conversation
+        # Consistent ordering: user1 is the smaller id, as in the key
+        user1_id, user2_id = sorted((_as_uuid(user1_id), _as_uuid(user2_id)))
+        db.session.execute(
+            dialect_insert(cls.__table__)
+            .values(user1_id=user1_id, user2_id=user2_id, pair_key=pair_key,
+                    change_seq=next_change_seq(db.engine.dialect.name))
+            .on_conflict_do_nothing(index_elements=['pair_key'])
+        )
+        db.session.commit()
+        return cls.query.filter_by(pair_key=pair_key).one()
+    
+    @classmethod
+    def direct_conversation_ids(cls, user_id, other_user_ids):
+        """{other_user_id: direct conversation id or None} for many users in one query"""
+        keys = {direct_pair_key(user_id, other_user_id): other_user_id for other_user_id in other_user_ids}
+        if not keys:
+            return {}
+        found = dict(db.session.query(cls.pair_key, cls.id).filter(cls.pair_key.in_(keys)).all())
+        return {other_user_id: found.get(key) for key, other_user_id in keys.items()}
     
     @classmethod
     def create_group_conversation(cls, name, description, created_by_id, participant_ids):
@@ -180,6 +227,30 @@ class ConversationParticipant(BaseModel):
         }
         return data
 
+class ConversationReadState(BaseModel):
+    """Per-participant unread counter and read watermark for a conversation
+    
+    Maintained by services/inbox_service.py on send and read so the inbox
+    never has to count unread messages. The watermark (last_read_message_id
+    and its created_at in last_read_message_at) only moves forward; every
+    message at or before it counts as read by this participant.
+    """
+    __tablename__ = 'conversation_read_states'
+    
+    conversation_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('conversations.id'), nullable=False)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+    last_read_message_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('messages.id'), nullable=True)
+    last_read_message_at = db.Column(db.DateTime)
+    last_read_at = db.Column(db.DateTime)
+    change_seq = db.Column(db.BigInteger)
+    
+    __table_args__ = (
+        db.UniqueConstraint('conversation_id', 'user_id', name='unique_conversation_read_state'),
+        db.Index('idx_conversation_read_states_user_id', 'user_id'),
+        db.Index('idx_conversation_read_states_conversation_change_seq', 'conversation_id', 'change_seq'),
+    )
+
 class Message(BaseModel):
     """Message model for messaging"""
     __tablename__ = 'messages'
@@ -190,23 +261,42 @@ class Message(BaseModel):
     content = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     read_at = db.Column(db.DateTime)
+    reply_to_message_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('messages.id', ondelete='SET NULL'), nullable=True)
+    change_seq = db.Column(db.BigInteger)
     
-    def to_dict(self):
-        """Convert message to dictionary with sender info"""
+    # History is paged by (created_at, id) within a conversation
+    __table_args__ = (
+        db.Index('idx_messages_conversation_created_at_id', 'conversation_id', 'created_at', 'id'),
+        db.Index('idx_messages_conversation_change_seq', 'conversation_id', 'change_seq'),
+    )
+    
+    def to_dict(self, receipt=None):
+        """Convert message to dictionary with sender info
+        
+        receipt is the read state derived from the conversation's read
+        watermarks (see InboxService.receipt); without one the legacy
+        is_read flag is used.
+        """
         data = super().to_dict()
         data['message_type'] = self.message_type.value if self.message_type else None
-        data['status'] = self.status.value if self.status else None
+        if receipt is not None:
+            data.update(receipt)
+        else:
+            data['status'] = MessageStatus.READ.value if self.is_read else MessageStatus.SENT.value
         data['sender'] = {
             'id': self.sender.id,
             'username': self.sender.username,
             'profile': self.sender.profile.to_dict() if self.sender.profile else None
         }
-        data['reactions'] = self.reactions or {}
-        data['reply_to_message'] = self.reply_to_message.to_dict() if self.reply_to_message else None
+        # Reply previews and reaction aggregates are batch-loaded by services/message_history.py
         return data
     
     def mark_as_read(self, user_id=None):
-        """Mark message as read"""
+        """Mark message as read
+        
+        Legacy per-message flag; read state now lives in the participant's
+        watermark, advanced with InboxService.mark_read.
+        """
         self.is_read = True
         self.read_at = datetime.utcnow()
         self.status = MessageStatus.READ
@@ -220,33 +310,6 @@ class Message(BaseModel):
         self.save()
         return self
     
-    def add_reaction(self, emoji, user_id):
-        """Add a reaction to the message"""
-        if not self.reactions:
-            self.reactions = {}
-        
-        if emoji not in self.reactions:
-            self.reactions[emoji] = []
-        
-        if user_id not in self.reactions[emoji]:
-            self.reactions[emoji].append(user_id)
-            self.save()
-            return True
-        return False
-    
-    def remove_reaction(self, emoji, user_id):
-        """Remove a reaction from the message"""
-        if not self.reactions or emoji not in self.reactions:
-            return False
-        
-        if user_id in self.reactions[emoji]:
-            self.reactions[emoji].remove(user_id)
-            if not self.reactions[emoji]:
-                del self.reactions[emoji]
-            self.save()
-            return True
-        return False
-    
     @classmethod
     def create_message(cls, conversation_id, sender_id, content, message_type=MessageType.TEXT, 
                       receiver_id=None, file_url=None, file_name=None, file_size=None, 
@@ -277,3 +340,69 @@ class Message(BaseModel):
             conversation.save()
         
         return message
+
+class MessageReaction(BaseModel):
+    """One user's emoji reaction to a message
+    
+    Written through services/reaction_service.py, which keeps the per-message
+    totals in MessageReactionCount in the same transaction.
+    """
+    __tablename__ = 'message_reactions'
+    
+    message_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('messages.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    emoji = db.Column(db.String(32), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('message_id', 'user_id', 'emoji', name='unique_message_reaction'),
+    )
+
+class MessageReactionCount(BaseModel):
+    """Maintained number of reactions per (message, emoji)
+    
+    Rows are kept at zero rather than deleted so delta sync sees removals.
+    """
+    __tablename__ = 'message_reaction_counts'
+    
+    message_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('messages.id', ondelete='CASCADE'), nullable=False)
+    conversation_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('conversations.id'), nullable=False)
+    emoji = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    change_seq = db.Column(db.BigInteger)
+    
+    __table_args__ = (
+        db.UniqueConstraint('message_id', 'emoji', name='unique_message_reaction_count'),
+        db.Index('idx_message_reaction_counts_conversation_change_seq', 'conversation_id', 'change_seq'),
+    )
+
+
+def next_change_seq(dialect_name):
+    """SQL expression for the next messaging change sequence value
+    
+    PostgreSQL draws from the messaging_change_seq sequence. Other databases
+    (SQLite in tests) have a single writer, so one more than the highest value
+    in use is monotonic as well.
+    """
+    if dialect_name == 'postgresql':
+        return messaging_change_seq.next_value()
+    highest = [
+        select(func.coalesce(func.max(model.change_seq), 0)).scalar_subquery()
+        for model in (Conversation, ConversationReadState, Message, MessageReactionCount)
+    ]
+    return select(func.max(*highest) + 1).scalar_subquery()
+
+
+def _stamp_change_seq(mapper, connection, target):
+    target.change_seq = next_change_seq(connection.dialect.name)
+
+
+def _restamp_change_seq(mapper, connection, target):
+    # Flushes with no net column changes must not bump the sequence
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        _stamp_change_seq(mapper, connection, target)
+
+
+for _model in (Conversation, ConversationReadState, Message, MessageReactionCount):
+    event.listen(_model, 'before_insert', _stamp_change_seq)
+    event.listen(_model, 'before_update', _restamp_change_seq)
@@ -1,12 +1,23 @@
 from .base import BaseModel, db
+import uuid
 from datetime import datetime
 from .enums import NotificationType, NotificationPriority, NotificationStatus
 
+# Preference column suffix of each notification type (push_likes, in_app_likes, ...)
+PREFERENCE_TOPICS = {
+    NotificationType.LIKE: 'likes',
+    NotificationType.COMMENT: 'comments',
+    NotificationType.FOLLOW: 'follows',
+    NotificationType.MESSAGE: 'messages',
+    NotificationType.MATCH: 'matches',
+    NotificationType.SYSTEM: 'system',
+}
+
 class Notification(BaseModel):
     """Notification model for user notifications"""
     __tablename__ = 'notifications'
     
-    sender_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    sender_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
     receiver_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
     type = db.Column(db.Enum(NotificationType), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -19,10 +30,32 @@ class Notification(BaseModel):
     related_match_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('matches.id'), nullable=True)
     related_message_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('messages.id'), nullable=True)
     
+    # Delivery tracking, updated in bulk by services/notification_dispatch.py
+    status = db.Column(db.Enum(NotificationStatus), default=NotificationStatus.PENDING)
+    push_attempts = db.Column(db.Integer, default=0)
+    sent_at = db.Column(db.DateTime)
+    delivered_at = db.Column(db.DateTime)
+    failure_reason = db.Column(db.String(100))
+    
+    # Aggregated likes/comments/follows, updated in place by services/notification_aggregation.py
+    group_key = db.Column(db.String(120))  # set while the group is open
+    actor_count = db.Column(db.Integer, default=1)
+    sample_actor_ids = db.Column(db.JSON)  # most recent actors, newest first
+    last_actor_at = db.Column(db.DateTime)
+    last_pushed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        # Unread counts (badge reconciliation, unread_only listings)
+        db.Index('idx_notifications_receiver_is_read', 'receiver_id', 'is_read'),
+        # One open group per receiver and key; ungrouped rows have a NULL key
+        db.UniqueConstraint('receiver_id', 'group_key', name='uq_notifications_receiver_group'),
+    )
+    
     def to_dict(self):
         """Convert notification to dictionary with sender info"""
         data = super().to_dict()
         data['type'] = self.type.value if self.type else None
+        data['status'] = self.status.value if self.status else None
         if self.sender:
             data['sender'] = {
                 'id': self.sender.id,
@@ -38,6 +71,14 @@ class Notification(BaseModel):
         self.save()
         return self
     
+    def mark_as_delivered(self):
+        """Mark notification as delivered to a device"""
+        if self.status != NotificationStatus.READ:
+            self.status = NotificationStatus.DELIVERED
+        self.delivered_at = self.delivered_at or datetime.utcnow()
+        self.save()
+        return self
+    
     def get_push_payload(self):
         """Get push notification payload"""
         return {
@@ -144,19 +185,12 @@ class NotificationPreferences(BaseModel):
     
     def is_notification_enabled(self, notification_type, delivery_method='push'):
         """Check if notification type is enabled for delivery method"""
-        if delivery_method == 'push':
-            if not self.push_enabled:
-                return False
-            return getattr(self, f'push_{notification_type.value}', True)
-        elif delivery_method == 'in_app':
-            if not self.in_app_enabled:
-                return False
-            return getattr(self, f'in_app_{notification_type.value}', True)
-        elif delivery_method == 'email':
-            if not self.email_enabled:
-                return False
-            return getattr(self, f'email_{notification_type.value}', True)
-        return False
+        if delivery_method not in ('push', 'in_app', 'email'):
+            return False
+        if not getattr(self, f'{delivery_method}_enabled'):
+            return False
+        topic = PREFERENCE_TOPICS.get(notification_type, notification_type.value)
+        return getattr(self, f'{delivery_method}_{topic}', True)
     
     def is_quiet_hours(self):
         """Check if current time is within quiet hours"""
@@ -181,3 +215,61 @@ class NotificationPreferences(BaseModel):
             preferences = cls(user_id=user_id)
             preferences.save()
         return preferences
+
+class NotificationCounter(BaseModel):
+    """Maintained unread notification count of one user (services/notification_counter.py)"""
+    __tablename__ = 'notification_counters'
+    
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+
+class DeviceToken(BaseModel):
+    """FCM registration token of one of a user's devices"""
+    __tablename__ = 'device_tokens'
+    
+    user_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    token = db.Column(db.String(255), nullable=False, unique=True)
+    platform = db.Column(db.String(20))  # android, ios or web
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    def register(cls, user_id, token, platform=None):
+        """Attach a token to the user, moving it from whoever held it before"""
+        from .message import dialect_insert
+        
+        now = datetime.utcnow()
+        db.session.execute(
+            dialect_insert(cls.__table__)
+            .values(id=uuid.uuid4(), user_id=user_id, token=token, platform=platform,
+                    last_seen_at=now, created_at=now, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=['token'],
+                set_={'user_id': user_id, 'platform': platform, 'last_seen_at': now, 'updated_at': now}
+            )
+        )
+        db.session.commit()
+    
+    @classmethod
+    def unregister(cls, user_id, token):
+        """Remove one of the user's tokens; returns whether it existed"""
+        deleted = cls.query.filter_by(user_id=user_id, token=token).delete(synchronize_session=False)
+        db.session.commit()
+        return bool(deleted)
+    
+    @classmethod
+    def tokens_for(cls, user_ids):
+        """{user_id: [token]} for many users in one query"""
+        tokens = {}
+        if not user_ids:
+            return tokens
+        for user_id, token in db.session.query(cls.user_id, cls.token).filter(cls.user_id.in_(user_ids)).all():
+            tokens.setdefault(user_id, []).append(token)
+        return tokens
+    
+    @classmethod
+    def prune(cls, tokens):
+        """Delete tokens the provider reported as no longer registered"""
+        if not tokens:
+            return 0
+        return cls.query.filter(cls.token.in_(tokens)).delete(synchronize_session=False)
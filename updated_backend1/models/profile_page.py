@@ -2,6 +2,7 @@ from .base import db
 from datetime import datetime
 import uuid
 import json
+import re
 from .enums import AcademyType, AcademyLevel, PageType
 
 class ProfilePage(db.Model):
@@ -100,6 +101,9 @@ class ProfilePage(db.Model):
     # Soft delete
     deleted_at = db.Column(db.DateTime, nullable=True)
     
+    # search_vector (tsvector) is a PostgreSQL generated column maintained by the
+    # database; it is deliberately not mapped - see text_search()
+    
     # Relationships (commented out for tables that don't exist yet)
     # admins = db.relationship('PageAdmin', backref='profile_page', lazy='dynamic', cascade='all, delete-orphan')
     # students = db.relationship('AcademyStudent', backref='profile_page', lazy='dynamic', cascade='all, delete-orphan')
@@ -244,6 +248,39 @@ class ProfilePage(db.Model):
             query = query.filter(cls.country.ilike(f'%{country}%'))
             
         return query.all()
+    
+    @classmethod
+    def text_search(cls, search):
+        """Return (condition, rank) for a full-text search over page profiles
+
+        On PostgreSQL this matches the stored, GIN-indexed ``search_vector``
+        column (weighted name > tagline > city/state > description) with a
+        prefix tsquery, ranked by ts_rank_cd. Other databases fall back to
+        ILIKE with a weighted CASE rank.
+        """
+        from sqlalchemy import case, func, literal, literal_column, or_
+        
+        terms = re.findall(r'\w+', search or '', re.UNICODE)
+        pattern = f'%{search}%'
+        
+        if db.engine.dialect.name == 'postgresql' and terms:
+            vector = literal_column(f'{cls.__tablename__}.search_vector')
+            ts_query = func.to_tsquery('english', ' & '.join(f'{term}:*' for term in terms))
+            condition = or_(vector.op('@@')(ts_query), cls.academy_name.ilike(pattern))
+            return condition, func.ts_rank_cd(vector, ts_query)
+        
+        condition = or_(
+            cls.academy_name.ilike(pattern),
+            cls.tagline.ilike(pattern),
+            cls.city.ilike(pattern),
+            cls.description.ilike(pattern)
+        )
+        rank = literal(0.0) \
+            + case((cls.academy_name.ilike(pattern), 1.0), else_=0.0) \
+            + case((cls.tagline.ilike(pattern), 0.4), else_=0.0) \
+            + case((cls.city.ilike(pattern), 0.2), else_=0.0) \
+            + case((cls.description.ilike(pattern), 0.1), else_=0.0)
+        return condition, rank
 
 class PageAdmin(db.Model):
     """Consolidated admins model for all page types"""
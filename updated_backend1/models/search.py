@@ -162,6 +162,7 @@ class SearchFilter(BaseModel):
     is_public = db.Column(db.Boolean, default=False)
     usage_count = db.Column(db.Integer, default=0)
     last_used = db.Column(db.DateTime, default=datetime.utcnow)
+    alerts_enabled = db.Column(db.Boolean, default=True)  # Notify when new content matches
     
     def to_dict(self):
         data = super().to_dict()
@@ -186,6 +187,24 @@ class SearchFilter(BaseModel):
         
         return query.order_by(cls.usage_count.desc()).limit(limit).all()
 
+class SearchFilterTerm(db.Model):
+    """Reverse index of saved filters by their most discriminating term
+
+    Each alert-enabled saved filter is indexed under one or more terms such
+    as ``location:pune`` or ``skill_level:intermediate`` for the kind of
+    content it watches (match, job or page). A new row only has to be
+    checked against filters indexed under one of its own terms.
+    """
+    __tablename__ = 'search_filter_terms'
+    __table_args__ = (
+        db.Index('idx_search_filter_terms_kind_term', 'kind', 'term'),
+    )
+    
+    filter_id = db.Column(db.UUID(as_uuid=True), db.ForeignKey('search_filters.id', ondelete='CASCADE'),
+                          primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    term = db.Column(db.String(200), primary_key=True)
+
 class SearchAnalytics(BaseModel):
     """Search analytics and metrics model"""
     __tablename__ = 'search_analytics'
@@ -272,3 +291,37 @@ class SearchAnalytics(BaseModel):
         
         analytics.save()
         return analytics
+
+class TrendingSnapshot(BaseModel):
+    """Precomputed trending content served by the discovery tabs"""
+    __tablename__ = 'trending_snapshots'
+    
+    version = db.Column(db.Integer, nullable=False, unique=True)
+    built_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    build_duration = db.Column(db.Float)  # in milliseconds
+    payload = db.Column(db.JSON, nullable=False)  # category -> list of result cards
+    
+    def age_seconds(self, now=None):
+        """Seconds since the snapshot was built"""
+        now = now or datetime.utcnow()
+        return max(0.0, (now - self.built_at).total_seconds())
+    
+    @classmethod
+    def get_latest(cls):
+        """Get the newest snapshot"""
+        return cls.query.order_by(cls.version.desc()).first()
+    
+    @classmethod
+    def get_latest_version(cls):
+        """Get the newest snapshot version without loading its payload"""
+        return db.session.query(db.func.max(cls.version)).scalar()
+    
+    @classmethod
+    def prune(cls, keep=5):
+        """Delete all but the newest ``keep`` snapshots"""
+        latest = cls.get_latest_version()
+        if latest is None:
+            return 0
+        deleted = cls.query.filter(cls.version <= latest - keep).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Rebuild the saved-search alert index (search_filter_terms)
+Run once after the search alerts migration, or after changing how filters are indexed
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from services.search_alerts import search_alert_service
+
+def rebuild_search_alert_index():
+    """Re-index every saved search filter"""
+    with app.app_context():
+        try:
+            indexed = search_alert_service.rebuild_index()
+            print(f"✅ Indexed {indexed} saved search filters for alerts")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding search alert index: {e}")
+            return False
+
+if __name__ == "__main__":
+    sys.exit(0 if rebuild_search_alert_index() else 1)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Reconcile the maintained unread notification counters (notification_counters)
+Run from cron (e.g. hourly) to correct drift from writes that bypassed the counter service
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from services.notification_counter import notification_counter
+
+def reconcile_notification_counters():
+    """Recount unread notifications and fix counters that drifted"""
+    with app.app_context():
+        try:
+            fixed = notification_counter.reconcile()
+            print(f"✅ Reconciled {fixed} notification counters")
+            return True
+        except Exception as e:
+            print(f"❌ Error reconciling notification counters: {e}")
+            return False
+
+if __name__ == "__main__":
+    sys.exit(0 if reconcile_notification_counters() else 1)
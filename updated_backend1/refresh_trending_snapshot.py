@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Rebuild the trending snapshot served by /api/search/trending
+Run from cron (e.g. every 5 minutes) so requests never wait on a rebuild
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from services.trending_snapshot import trending_snapshot_service
+
+def refresh_trending_snapshot():
+    """Build a new trending snapshot version"""
+    with app.app_context():
+        try:
+            snapshot = trending_snapshot_service.build()
+            counts = ', '.join(f"{category}={len(items)}" for category, items in snapshot.payload.items())
+            print(f"✅ Trending snapshot v{snapshot.version} built in {snapshot.build_duration:.0f}ms ({counts})")
+            return True
+        except Exception as e:
+            print(f"❌ Error building trending snapshot: {e}")
+            return False
+
+if __name__ == "__main__":
+    sys.exit(0 if refresh_trending_snapshot() else 1)
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from services.search_service import search_service
+from services.fuzzy_search import fuzzy_search_service
 from models import SearchType, SearchResult, SearchFilter, SearchAnalytics
 from datetime import datetime, timedelta
 import logging
@@ -21,9 +22,9 @@ def global_search():
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Parse search type
+        # Parse search type (accepts 'global' as well as 'Global')
         try:
-            search_type_enum = SearchType(search_type)
+            search_type_enum = SearchType(search_type.capitalize())
         except ValueError:
             return jsonify({'error': 'Invalid search type'}), 400
         
@@ -80,7 +81,8 @@ def get_search_suggestions():
         
         return jsonify({
             'suggestions': suggestions,
-            'query': query
+            'query': query,
+            'did_you_mean': fuzzy_search_service.did_you_mean(query)
         }), 200
         
     except Exception as e:
@@ -130,13 +132,15 @@ def geolocation_search():
         longitude = request.args.get('longitude', type=float)
         radius_km = request.args.get('radius_km', 50, type=float)
         search_type = request.args.get('type', 'match')
+        cursor = request.args.get('cursor')
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
         
-        if not latitude or not longitude:
+        if latitude is None or longitude is None:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
         
-        # Parse search type
+        # Parse search type (accepts 'match' as well as 'Match')
         try:
-            search_type_enum = SearchType(search_type)
+            search_type_enum = SearchType(search_type.capitalize())
         except ValueError:
             return jsonify({'error': 'Invalid search type'}), 400
         
@@ -148,14 +152,22 @@ def geolocation_search():
             filters['skill_level'] = request.args.get('skill_level')
         if request.args.get('status'):
             filters['status'] = request.args.get('status')
+        if request.args.get('page_type'):
+            filters['page_type'] = request.args.get('page_type')
         
-        results = search_service.geolocation_search(
-            latitude=latitude,
-            longitude=longitude,
-            radius_km=radius_km,
-            search_type=search_type_enum,
-            filters=filters
-        )
+        try:
+            results = search_service.geolocation_search(
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                search_type=search_type_enum,
+                filters=filters,
+                cursor=cursor,
+                limit=limit
+            )
+        except ValueError as e:
+            # Covers InvalidCursorError, bad coordinates and unknown status values
+            return jsonify({'error': str(e)}), 400
         
         return jsonify(results), 200
         
@@ -184,7 +196,8 @@ def save_search_filter():
             filter_name=data['filter_name'],
             search_type=search_type,
             filters=data['filters'],
-            is_public=data.get('is_public', False)
+            is_public=data.get('is_public', False),
+            alerts_enabled=data.get('alerts_enabled', True)
         )
         
         return jsonify({
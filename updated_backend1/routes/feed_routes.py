@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from models import db, Post, PostLike, PostComment, PostBookmark, User
+from models import db, Post, PostLike, PostComment, PostBookmark, User, NotificationType
+from services.audience_fanout import audience_fanout
+from services.notification_service import notification_service
 from datetime import datetime
 import re
 from utils.firebase_auth import get_user_id_from_token, get_user_info_from_token
@@ -291,6 +293,20 @@ def create_post():
         except Exception as e:
             print(f"Error calculating engagement score: {e}")
         
+        # Notify the page's followers in chunks on the fan-out worker
+        if post.page_id:
+            try:
+                audience_fanout.notify_page_followers(
+                    post.page_id,
+                    NotificationType.SYSTEM,
+                    title='New post on a page you follow',
+                    content=(post.content or '')[:140],
+                    sender_id=current_user_id,
+                    related_post_id=post.id
+                )
+            except Exception as e:
+                print(f"Error notifying page followers: {e}")
+        
         return jsonify({
             'success': True,
             'message': 'Post created successfully',
@@ -379,6 +395,18 @@ def toggle_like_post(post_id):
         post.calculate_engagement_score()
         post.update_trending_score()
         
+        # Likes on one post are aggregated into a single notification for the author
+        if is_liked and post.user_id != current_user_id:
+            liker = User.query.get(current_user_id)
+            notification_service.create_and_send_notification(
+                receiver_id=post.user_id,
+                notification_type=NotificationType.LIKE,
+                title='New like',
+                content=f"{liker.username if liker else 'Someone'} liked your post",
+                sender_id=current_user_id,
+                related_post_id=post.id
+            )
+        
         return jsonify({
             'message': message,
             'is_liked': is_liked,
@@ -448,6 +476,17 @@ def create_comment(post_id):
         post.calculate_engagement_score()
         post.update_trending_score()
         
+        if post.user_id != current_user_id:
+            commenter = User.query.get(current_user_id)
+            notification_service.create_and_send_notification(
+                receiver_id=post.user_id,
+                notification_type=NotificationType.COMMENT,
+                title='New comment',
+                content=f"{commenter.username if commenter else 'Someone'} commented on your post",
+                sender_id=current_user_id,
+                related_post_id=post.id
+            )
+        
         return jsonify({
             'message': 'Comment created successfully',
             'comment': comment.to_dict()
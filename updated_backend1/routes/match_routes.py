@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-from models import db, Match, MatchParticipant, MatchComment, MatchLike, MatchType, MatchStatus
+from models import db, Match, MatchParticipant, MatchComment, MatchLike, MatchType, MatchStatus, NotificationType
 from models.user import User
 from services.notification_service import notification_service
+from services.audience_fanout import audience_fanout
 from datetime import datetime, date, time
 import logging
 
@@ -250,7 +251,7 @@ def join_match(match_id):
         if match.creator_id != current_user_id:
             notification_service.create_and_send_notification(
                 receiver_id=match.creator_id,
-                notification_type='match_join',
+                notification_type=NotificationType.MATCH,
                 title='New Player Joined',
                 content=f'A new player joined your match: {match.title}',
                 sender_id=current_user_id,
@@ -312,16 +313,15 @@ def start_match(match_id):
         if not success:
             return jsonify({'error': 'Cannot start this match'}), 400
         
-        # Notify all participants
-        for participant in match.participants:
-            notification_service.create_and_send_notification(
-                receiver_id=participant.user_id,
-                notification_type='match_join',
-                title='Match Started',
-                content=f'Your match has started: {match.title}',
-                action_url=f'/matches/{match.id}',
-                related_match_id=match.id
-            )
+        # Notify all participants in chunks on the fan-out worker
+        audience_fanout.notify_match_participants(
+            match.id,
+            NotificationType.MATCH,
+            title='Match Started',
+            content=f'Your match has started: {match.title}',
+            sender_id=current_user_id,
+            action_url=f'/matches/{match.id}'
+        )
         
         return jsonify({
             'message': 'Match started successfully',
@@ -382,16 +382,15 @@ def cancel_match(match_id):
         if not success:
             return jsonify({'error': 'Cannot cancel this match'}), 400
         
-        # Notify all participants
-        for participant in match.participants:
-            notification_service.create_and_send_notification(
-                receiver_id=participant.user_id,
-                notification_type='match_join',
-                title='Match Cancelled',
-                content=f'Your match has been cancelled: {match.title}',
-                action_url=f'/matches/{match.id}',
-                related_match_id=match.id
-            )
+        # Notify all participants in chunks on the fan-out worker
+        audience_fanout.notify_match_participants(
+            match.id,
+            NotificationType.MATCH,
+            title='Match Cancelled',
+            content=f'Your match has been cancelled: {match.title}',
+            sender_id=current_user_id,
+            action_url=f'/matches/{match.id}'
+        )
         
         return jsonify({
             'message': 'Match cancelled successfully',
@@ -135,6 +135,8 @@ def create_match():
             match_type=match_type_value,
             location=data['location'],
             venue=data.get('venue', ''),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
             match_date=match_date,
             match_time=match_time,
             players_needed=data['players_needed'],
@@ -398,6 +400,10 @@ def leave_match(match_id):
                 match.location = data['location']
             if 'venue' in data:
                 match.venue = data['venue']
+            if 'latitude' in data:
+                match.latitude = data['latitude']
+            if 'longitude' in data:
+                match.longitude = data['longitude']
             if 'match_date' in data:
                 match.match_date = data['match_date']
             if 'match_time' in data:
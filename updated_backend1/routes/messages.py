@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
-from models import Message, Conversation, User, db
-from datetime import datetime
+from models import Message, Conversation, ConversationReadState, User, db
+from services.inbox_service import inbox_service
+from services.message_dispatcher import message_dispatcher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,16 +23,18 @@ def get_conversations():
             page=page, per_page=per_page, error_out=False
         )
         
+        # Unread counts come from the read watermarks, one query for the page
+        unread_counts = dict(db.session.query(
+            ConversationReadState.conversation_id, ConversationReadState.unread_count
+        ).filter(
+            ConversationReadState.conversation_id.in_([c.id for c in conversations.items]),
+            ConversationReadState.user_id == user_id
+        ).all())
+        
         conversations_data = []
         for conversation in conversations.items:
             conv_dict = conversation.to_dict()
-            # Get unread count for current user
-            unread_count = Message.query.filter_by(
-                conversation_id=conversation.id,
-                receiver_id=user_id,
-                is_read=False
-            ).count()
-            conv_dict['unread_count'] = unread_count
+            conv_dict['unread_count'] = unread_counts.get(conversation.id, 0)
             conversations_data.append(conv_dict)
         
         return jsonify({
@@ -72,16 +75,16 @@ def get_conversation(conversation_id):
             Message.created_at.desc()
         ).paginate(page=page, per_page=per_page, error_out=False)
         
-        # Mark messages as read
-        Message.query.filter_by(
-            conversation_id=conversation_id,
-            receiver_id=user_id,
-            is_read=False
-        ).update({'is_read': True, 'read_at': datetime.utcnow()})
+        # Opening the conversation reads it: advance the watermark to the latest message
+        inbox_service.mark_read(conversation_id, user_id)
         db.session.commit()
         
+        watermarks = inbox_service.read_watermarks(conversation_id)
         conversation_dict = conversation.to_dict()
-        conversation_dict['messages'] = [msg.to_dict() for msg in messages.items]
+        conversation_dict['messages'] = [
+            msg.to_dict(receipt=inbox_service.receipt(msg, watermarks, user_id))
+            for msg in messages.items
+        ]
         conversation_dict['pagination'] = {
             'page': messages.page,
             'pages': messages.pages,
@@ -118,7 +121,7 @@ def create_conversation():
             return jsonify({'error': 'Receiver not found'}), 404
         
         # Get or create conversation
-        conversation = Conversation.get_or_create_conversation(user_id, receiver_id)
+        conversation = Conversation.get_or_create_direct_conversation(user_id, receiver_id)
         
         return jsonify({
             'conversation': conversation.to_dict()
@@ -146,25 +149,12 @@ def send_message(conversation_id):
         if conversation.user1_id != user_id and conversation.user2_id != user_id:
             return jsonify({'error': 'Unauthorized to send message in this conversation'}), 403
         
-        # Determine receiver
-        receiver_id = conversation.user2_id if conversation.user1_id == user_id else conversation.user1_id
-        
-        message = Message(
-            conversation_id=conversation_id,
-            sender_id=user_id,
-            receiver_id=receiver_id,
-            content=data['content']
-        )
-        message.save()
-        
-        # Update conversation last message
-        conversation.last_message_at = datetime.utcnow()
-        conversation.last_message_content = data['content']
-        conversation.save()
+        # One transaction; broadcast, unread counters and notifications follow asynchronously
+        ack = message_dispatcher.send(conversation_id, user_id, data['content'])
         
         return jsonify({
             'message': 'Message sent successfully',
-            'message_data': message.to_dict()
+            'message_data': ack
         }), 201
         
     except Exception as e:
@@ -231,10 +221,7 @@ def get_unread_count():
     try:
         user_id = 1  # 1 - using test user ID
         
-        unread_count = Message.query.filter_by(
-            receiver_id=user_id,
-            is_read=False
-        ).count()
+        unread_count = inbox_service.get_total_unread(user_id)
         
         return jsonify({
             'unread_count': unread_count
@@ -258,15 +245,11 @@ def mark_conversation_read(conversation_id):
         if conversation.user1_id != user_id and conversation.user2_id != user_id:
             return jsonify({'error': 'Unauthorized to access this conversation'}), 403
         
-        # Mark all unread messages as read
-        Message.query.filter_by(
-            conversation_id=conversation_id,
-            receiver_id=user_id,
-            is_read=False
-        ).update({'is_read': True, 'read_at': datetime.utcnow()})
+        # Advance the read watermark to the latest message
+        receipt = inbox_service.mark_read(conversation_id, user_id)
         db.session.commit()
         
-        return jsonify({'message': 'Conversation marked as read'}), 200
+        return jsonify({'message': 'Conversation marked as read', 'receipt': receipt}), 200
         
     except Exception as e:
         logger.error(f"Mark conversation read error: {e}")
@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
-from models import db, Conversation, Message, ConversationParticipant, ConversationType, MessageType, User
+from models import db, Conversation, Message, ConversationType, User
+from services.inbox_service import inbox_service
+from services.message_history import message_history_service
+from services.message_dispatcher import message_dispatcher
+from services.sync_service import sync_service
+from services.reaction_service import reaction_service
 
 messaging_bp = Blueprint('messaging', __name__)
 
+# user_ids accepted by one direct conversation lookup
+MAX_DIRECT_LOOKUP = 200
+
 @messaging_bp.route('/conversations', methods=['GET'])
 def get_conversations():
     """Get conversations for current user"""
@@ -11,37 +19,45 @@ def get_conversations():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Get conversations where user is a participant
-        query = Conversation.query.filter(
-            (Conversation.user1_id == current_user_id) |
-            (Conversation.user2_id == current_user_id) |
-            (Conversation.participants.any(ConversationParticipant.user_id == current_user_id))
-        )
+        # Unread counters and participant cards come from the maintained read states
+        return jsonify(inbox_service.get_inbox(current_user_id, page, per_page)), 200
         
-        # Order by last message time
-        query = query.order_by(Conversation.last_message_at.desc())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@messaging_bp.route('/sync', methods=['GET'])
+def sync_messaging():
+    """Conversations, messages and read watermarks changed since a sync token"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        since = request.args.get('since')
+        limit = request.args.get('limit', type=int)
         
-        # Paginate results
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        return jsonify(sync_service.sync(current_user_id, since, limit)), 200
         
-        conversations = []
-        for conv in pagination.items:
-            conv_dict = conv.to_dict()
-            conv_dict['unread_count'] = conv.get_unread_count(current_user_id)
-            conversations.append(conv_dict)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@messaging_bp.route('/conversations/direct', methods=['GET'])
+def lookup_direct_conversations():
+    """Direct conversation ids with many users at once (e.g. "message" buttons on a follower list)"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        user_ids = [user_id.strip() for user_id in request.args.get('user_ids', '').split(',') if user_id.strip()]
         
-        return jsonify({
-            'conversations': conversations,
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
-        }), 200
+        if not user_ids:
+            return jsonify({'error': 'user_ids is required'}), 400
+        if len(user_ids) > MAX_DIRECT_LOOKUP:
+            return jsonify({'error': f'At most {MAX_DIRECT_LOOKUP} user_ids per request'}), 400
         
+        # One indexed IN query on pair_key; users without a conversation map to null
+        conversation_ids = Conversation.direct_conversation_ids(current_user_id, user_ids)
+        return jsonify({'conversations': conversation_ids}), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,8 +124,7 @@ def get_conversation_messages(conversation_id):
     """Get messages for a conversation"""
     try:
         current_user_id = 1  # 1 - using test user ID
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        limit = request.args.get('limit', 50, type=int)
         
         conversation = Conversation.query.get(conversation_id)
         if not conversation:
@@ -118,23 +133,20 @@ def get_conversation_messages(conversation_id):
         if not conversation.is_participant(current_user_id):
             return jsonify({'error': 'Not authorized to view this conversation'}), 403
         
-        query = Message.query.filter_by(conversation_id=conversation_id)
-        query = query.order_by(Message.created_at.desc())
-        
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        messages = [message.to_dict() for message in pagination.items]
-        
-        return jsonify({
-            'messages': messages,
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
-        }), 200
+        # Keyset paging on (created_at, id): ?before=<cursor>, ?after=<cursor> or ?around=<message_id>
+        try:
+            history = message_history_service.get_history(
+                conversation_id,
+                current_user_id,
+                before=request.args.get('before'),
+                after=request.args.get('after'),
+                around=request.args.get('around'),
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(history), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -156,21 +168,18 @@ def send_message(conversation_id):
         if not conversation.is_participant(current_user_id):
             return jsonify({'error': 'Not authorized to send message to this conversation'}), 403
         
-        message = Message.create_message(
-            conversation_id=conversation_id,
-            sender_id=current_user_id,
-            content=data['content'],
-            message_type=MessageType(data.get('message_type', 'text')),
-            file_url=data.get('file_url'),
-            file_name=data.get('file_name'),
-            file_size=data.get('file_size'),
-            mime_type=data.get('mime_type'),
-            reply_to_message_id=data.get('reply_to_message_id')
+        # One transaction; broadcast, unread counters and notifications follow asynchronously
+        ack = message_dispatcher.send(
+            conversation_id,
+            current_user_id,
+            data['content'],
+            reply_to_message_id=data.get('reply_to_message_id'),
+            client_id=data.get('client_id')
         )
         
         return jsonify({
             'message': 'Message sent successfully',
-            'message_data': message.to_dict()
+            'message_data': ack
         }), 201
         
     except Exception as e:
@@ -189,11 +198,18 @@ def mark_message_read(message_id):
         if not message.conversation.is_participant(current_user_id):
             return jsonify({'error': 'Not authorized to mark this message as read'}), 403
         
-        message.mark_as_read(current_user_id)
+        # Reading a message reads everything before it: advance the watermark
+        receipt = inbox_service.mark_read(message.conversation_id, current_user_id, message)
+        db.session.commit()
+        
+        if receipt:
+            from services.socket_backplane import socket_backplane
+            socket_backplane.emit('messages_read', receipt, room=f"conversation_{message.conversation_id}")
         
         return jsonify({
             'message': 'Message marked as read successfully',
-            'message_id': message_id
+            'message_id': message_id,
+            'receipt': receipt
         }), 200
         
     except Exception as e:
@@ -218,16 +234,21 @@ def add_message_reaction(message_id):
         if not message.conversation.is_participant(current_user_id):
             return jsonify({'error': 'Not authorized to react to this message'}), 403
         
-        success = message.add_reaction(emoji, current_user_id)
+        # Idempotent: repeating the request changes nothing and broadcasts nothing
+        delta = reaction_service.add(message, current_user_id, emoji)
+        db.session.commit()
         
-        if success:
-            return jsonify({
-                'message': 'Reaction added successfully',
-                'reactions': message.reactions
-            }), 200
-        else:
-            return jsonify({'error': 'Failed to add reaction'}), 400
+        if delta:
+            from services.socket_backplane import socket_backplane
+            socket_backplane.emit('reaction_added', delta, room=f"conversation_{message.conversation_id}")
         
+        return jsonify({
+            'message': 'Reaction added successfully',
+            'reaction': delta
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -250,15 +271,20 @@ def remove_message_reaction(message_id):
         if not message.conversation.is_participant(current_user_id):
             return jsonify({'error': 'Not authorized to react to this message'}), 403
         
-        success = message.remove_reaction(emoji, current_user_id)
+        # Idempotent: repeating the request changes nothing and broadcasts nothing
+        delta = reaction_service.remove(message, current_user_id, emoji)
+        db.session.commit()
         
-        if success:
-            return jsonify({
-                'message': 'Reaction removed successfully',
-                'reactions': message.reactions
-            }), 200
-        else:
-            return jsonify({'error': 'Failed to remove reaction'}), 400
+        if delta:
+            from services.socket_backplane import socket_backplane
+            socket_backplane.emit('reaction_removed', delta, room=f"conversation_{message.conversation_id}")
+        
+        return jsonify({
+            'message': 'Reaction removed successfully',
+            'reaction': delta
+        }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
-from models import db, Notification, NotificationPreferences, NotificationType, NotificationPriority, User
+from models import db, Notification, NotificationPreferences, DeviceToken, NotificationType, NotificationPriority, User
 from services.notification_service import notification_service
+from services.audience_fanout import audience_fanout
+from services.notification_aggregation import notification_aggregator
+from services.notification_counter import notification_counter, parse_timestamp
 from datetime import datetime
 
 notification_bp = Blueprint('notification_routes', __name__)
@@ -54,7 +57,7 @@ def get_unread_count():
     """Get unread notification count for current user"""
     try:
         current_user_id = 1  # 1 - using test user ID
-        unread_count = Notification.get_unread_count(current_user_id)
+        unread_count = notification_counter.unread_count(current_user_id)
         
         return jsonify({
             'unread_count': unread_count
@@ -63,6 +66,19 @@ def get_unread_count():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@notification_bp.route('/notifications/badge', methods=['GET'])
+def get_notification_badge():
+    """Badge count for current user, read from the maintained counter"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        
+        return jsonify({
+            'unread_count': notification_counter.unread_count(current_user_id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @notification_bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
@@ -77,8 +93,8 @@ def mark_notification_read(notification_id):
         if notification.receiver_id != current_user_id:
             return jsonify({'error': 'Not authorized to mark this notification as read'}), 403
         
-        # Mark as read
-        notification.mark_as_read()
+        # Mark as read and move the badge counter with it
+        notification_counter.mark_read(current_user_id, [notification.id])
         
         return jsonify({
             'message': 'Notification marked as read successfully',
@@ -90,22 +106,50 @@ def mark_notification_read(notification_id):
 
 @notification_bp.route('/notifications/read-all', methods=['POST'])
 def mark_all_notifications_read():
-    """Mark all notifications as read for current user"""
+    """Mark all notifications (or all up to an optional 'before' timestamp) as read for current user"""
     try:
         current_user_id = 1  # 1 - using test user ID
+        data = request.get_json(silent=True) or {}
         
-        # Mark all unread notifications as read
-        unread_notifications = Notification.query.filter_by(
-            receiver_id=current_user_id,
-            is_read=False
-        ).all()
+        before = None
+        if data.get('before'):
+            try:
+                before = parse_timestamp(data['before'])
+            except ValueError:
+                return jsonify({'error': 'Invalid before timestamp'}), 400
         
-        for notification in unread_notifications:
-            notification.mark_as_read()
+        # Mark the unread notifications as read in one UPDATE
+        count = notification_counter.mark_all_read(current_user_id, before=before)
         
         return jsonify({
-            'message': f'Marked {len(unread_notifications)} notifications as read',
-            'count': len(unread_notifications)
+            'message': f'Marked {count} notifications as read',
+            'count': count,
+            'unread_count': notification_counter.unread_count(current_user_id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@notification_bp.route('/notifications/ack', methods=['POST'])
+def acknowledge_notifications():
+    """Acknowledge delivery of many notifications at once, optionally marking them read"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        data = request.get_json() or {}
+        
+        notification_ids = data.get('notification_ids') or []
+        if not isinstance(notification_ids, list) or not notification_ids:
+            return jsonify({'error': 'notification_ids is required'}), 400
+        
+        try:
+            counts = notification_counter.acknowledge(current_user_id, notification_ids, read=bool(data.get('read')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'delivered': counts['delivered'],
+            'read': counts['read'],
+            'unread_count': notification_counter.unread_count(current_user_id)
         }), 200
         
     except Exception as e:
@@ -126,8 +170,7 @@ def delete_notification(notification_id):
             return jsonify({'error': 'Not authorized to delete this notification'}), 403
         
         # Delete notification
-        db.session.delete(notification)
-        db.session.commit()
+        notification_counter.delete(current_user_id, [notification.id])
         
         return jsonify({
             'message': 'Notification deleted successfully',
@@ -179,6 +222,43 @@ def update_notification_preferences():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@notification_bp.route('/notifications/devices', methods=['POST'])
+def register_device():
+    """Register an FCM token for push notifications to the current user"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        data = request.get_json() or {}
+        
+        token = (data.get('token') or '').strip()
+        if not token or len(token) > 255:
+            return jsonify({'error': 'A device token of at most 255 characters is required'}), 400
+        
+        DeviceToken.register(current_user_id, token, platform=data.get('platform'))
+        
+        return jsonify({'message': 'Device registered successfully'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@notification_bp.route('/notifications/devices', methods=['DELETE'])
+def unregister_device():
+    """Stop push notifications to one of the current user's devices"""
+    try:
+        current_user_id = 1  # 1 - using test user ID
+        data = request.get_json() or {}
+        
+        if not data.get('token'):
+            return jsonify({'error': 'token is required'}), 400
+        
+        if not DeviceToken.unregister(current_user_id, data['token']):
+            return jsonify({'error': 'Device not found'}), 404
+        
+        return jsonify({'message': 'Device unregistered successfully'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @notification_bp.route('/notifications/test', methods=['POST'])
 def send_test_notification():
     """Send a test notification to current user"""
@@ -196,8 +276,8 @@ def send_test_notification():
         except ValueError:
             return jsonify({'error': 'Invalid notification type'}), 400
         
-        # Create and send test notification
-        notification = notification_service.create_and_send_notification(
+        # Queue test notification; delivery happens on the notification dispatcher
+        notification_id = notification_service.create_and_send_notification(
             receiver_id=current_user_id,
             notification_type=parsed_type,
             title=title,
@@ -206,11 +286,11 @@ def send_test_notification():
             action_url='/notifications'
         )
         
-        if notification:
+        if notification_id:
             return jsonify({
-                'message': 'Test notification sent successfully',
-                'notification': notification.to_dict()
-            }), 200
+                'message': 'Test notification queued successfully',
+                'notification_id': notification_id
+            }), 202
         else:
             return jsonify({'error': 'Failed to send test notification'}), 500
         
@@ -232,6 +312,43 @@ def get_notification_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@notification_bp.route('/notifications/fanouts', methods=['GET'])
+def get_fanout_stats():
+    """Totals and throughput of audience fan-outs in this process"""
+    try:
+        return jsonify({
+            'stats': audience_fanout.get_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@notification_bp.route('/notifications/aggregation', methods=['GET'])
+def get_aggregation_stats():
+    """Grouped notifications, rows saved and throttled pushes in this process"""
+    try:
+        return jsonify({
+            'stats': notification_aggregator.get_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@notification_bp.route('/notifications/fanouts/<job_id>', methods=['GET'])
+def get_fanout_job(job_id):
+    """Progress of one audience fan-out"""
+    try:
+        job = audience_fanout.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Fan-out job not found'}), 404
+        
+        return jsonify({
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @notification_bp.route('/notifications/bulk-action', methods=['POST'])
 def bulk_notification_action():
     """Perform bulk action on notifications"""
@@ -245,37 +362,28 @@ def bulk_notification_action():
         if not action or not notification_ids:
             return jsonify({'error': 'Action and notification_ids are required'}), 400
         
+        actions = {
+            'read': notification_counter.mark_read,
+            'delete': notification_counter.delete,
+            'unread': notification_counter.mark_unread
+        }
+        if action not in actions:
+            return jsonify({'error': 'Invalid action'}), 400
+        
         # Get notifications
-        notifications = Notification.query.filter(
+        found = db.session.query(Notification.id).filter(
             Notification.id.in_(notification_ids),
             Notification.receiver_id == current_user_id
-        ).all()
+        ).count()
         
-        if not notifications:
+        if not found:
             return jsonify({'error': 'No notifications found'}), 404
         
-        # Perform action
-        count = 0
-        if action == 'read':
-            for notification in notifications:
-                if not notification.is_read:
-                    notification.mark_as_read()
-                    count += 1
-        elif action == 'delete':
-            for notification in notifications:
-                db.session.delete(notification)
-                count += 1
-            db.session.commit()
-        elif action == 'unread':
-            for notification in notifications:
-                if notification.is_read:
-                    notification.is_read = False
-                    notification.read_at = None
-                    notification.status = 'sent'
-                    count += 1
-            db.session.commit()
-        else:
-            return jsonify({'error': 'Invalid action'}), 400
+        # Perform action as one statement; the badge counter moves with it
+        try:
+            count = actions[action](current_user_id, notification_ids)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
             'message': f'Bulk action completed successfully',
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import Notification, NotificationType, db
+from services.notification_counter import notification_counter, parse_timestamp
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,7 +75,8 @@ def mark_notification_read(notification_id):
         if notification.receiver_id != user_id:
             return jsonify({'error': 'Unauthorized to access this notification'}), 403
         
-        notification.mark_as_read()
+        notification_counter.mark_read(user_id, [notification.id])
+        db.session.refresh(notification)
         
         return jsonify({
             'message': 'Notification marked as read',
@@ -91,14 +93,18 @@ def mark_all_notifications_read():
     try:
         user_id = 1  # 1 - using test user ID
         
-        # Update all unread notifications
-        Notification.query.filter_by(
-            receiver_id=user_id,
-            is_read=False
-        ).update({'is_read': True, 'read_at': db.func.now()})
-        db.session.commit()
+        data = request.get_json(silent=True) or {}
+        before = None
+        if data.get('before'):
+            try:
+                before = parse_timestamp(data['before'])
+            except ValueError:
+                return jsonify({'error': 'Invalid before timestamp'}), 400
         
-        return jsonify({'message': 'All notifications marked as read'}), 200
+        # Update the unread notifications (up to 'before', if given) and the badge counter together
+        count = notification_counter.mark_all_read(user_id, before=before)
+        
+        return jsonify({'message': 'All notifications marked as read', 'count': count}), 200
         
     except Exception as e:
         logger.error(f"Mark all notifications read error: {e}")
@@ -110,10 +116,7 @@ def get_unread_count():
     try:
         user_id = 1  # 1 - using test user ID
         
-        unread_count = Notification.query.filter_by(
-            receiver_id=user_id,
-            is_read=False
-        ).count()
+        unread_count = notification_counter.unread_count(user_id)
         
         return jsonify({
             'unread_count': unread_count
@@ -136,7 +139,7 @@ def delete_notification(notification_id):
         if notification.receiver_id != user_id:
             return jsonify({'error': 'Unauthorized to delete this notification'}), 403
         
-        notification.delete()
+        notification_counter.delete(user_id, [notification.id])
         
         return jsonify({'message': 'Notification deleted successfully'}), 200
         
@@ -151,8 +154,7 @@ def clear_all_notifications():
         user_id = 1  # 1 - using test user ID
         
         # Delete all notifications for user
-        Notification.query.filter_by(receiver_id=user_id).delete()
-        db.session.commit()
+        notification_counter.delete(user_id)
         
         return jsonify({'message': 'All notifications cleared'}), 200
         
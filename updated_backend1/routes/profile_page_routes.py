@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import db, ProfilePage, PageAdmin, User, AcademyProgram, AcademyStudent
+from utils.pagination import estimate_count
 from datetime import datetime
 import json
 
@@ -552,11 +553,10 @@ def list_profile_pages():
         query = ProfilePage.query.filter(ProfilePage.deleted_at.is_(None))
         
         # Apply filters
+        rank = None
         if search:
-            query = query.filter(
-                (ProfilePage.academy_name.ilike(f'%{search}%')) |
-                (ProfilePage.description.ilike(f'%{search}%'))
-            )
+            condition, rank = ProfilePage.text_search(search)
+            query = query.filter(condition)
         
         if academy_type:
             query = query.filter(ProfilePage.academy_type == academy_type)
@@ -576,24 +576,25 @@ def list_profile_pages():
         if country:
             query = query.filter(ProfilePage.country.ilike(f'%{country}%'))
         
-        # Paginate results
-        pagination = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        # Rank search results; estimate the total instead of an exact COUNT(*)
+        if rank is not None:
+            query = query.order_by(rank.desc(), ProfilePage.page_id)
+        total, total_is_estimate = estimate_count(query)
+        pages = (total + per_page - 1) // per_page if per_page else 0
         
-        profile_pages = [profile.to_dict() for profile in pagination.items]
+        profiles = query.offset((max(page, 1) - 1) * per_page).limit(per_page).all()
+        profile_pages = [profile.to_dict() for profile in profiles]
         
         return jsonify({
             'profile_pages': profile_pages,
             'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'total_is_estimate': total_is_estimate,
+                'pages': pages,
+                'has_next': page < pages,
+                'has_prev': page > 1
             }
         }), 200
         
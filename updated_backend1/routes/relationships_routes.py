@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from models import db, Relationship, RelationshipType, RelationshipStatus, User
+from models import db, Relationship, RelationshipType, RelationshipStatus, User, NotificationType
+from services.notification_service import notification_service
 from datetime import datetime
 
 relationships_bp = Blueprint('relationships', __name__)
@@ -63,6 +64,15 @@ def follow_user():
         relationship, created = Relationship.follow_user(current_user_id, target_user_id)
         
         if created:
+            follower = User.query.get(current_user_id)
+            notification_service.create_and_send_notification(
+                receiver_id=target_user_id,
+                notification_type=NotificationType.FOLLOW,
+                title='New follower',
+                content=f"{follower.username if follower else 'Someone'} started following you",
+                sender_id=current_user_id
+            )
+            
             return jsonify({
                 'message': 'Successfully followed user',
                 'relationship': relationship.to_dict()
@@ -2,12 +2,26 @@ from flask import Blueprint, request, jsonify, current_app
 from models import User, UserProfile, Match, Post, db
 from models import ProfilePage, Job, Member, UserStats
 from sqlalchemy import or_, and_, desc, func
+from services.search_cache import search_cache
+from services.trending_snapshot import trending_snapshot_service
+from services.fuzzy_search import fuzzy_search_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 search_bp = Blueprint('search', __name__)
 
+# Snapshot categories served by each discovery tab
+TRENDING_CATEGORIES = {
+    'all': ['users', 'matches', 'posts', 'academies', 'jobs', 'communities'],
+    'location': ['locations'],
+    'academy': ['academies'],
+    'job': ['jobs'],
+    'coach': ['coaches'],
+    'community': ['communities'],
+    'venue': ['venues']
+}
+
 @search_bp.route('/users', methods=['GET'])
 def search_users():
     """Search for users by username, name, or location"""
@@ -283,7 +297,8 @@ def main_search():
             'results': results,
             'query': query,
             'category': category,
-            'total': len(results)
+            'total': len(results),
+            'did_you_mean': fuzzy_search_service.did_you_mean(query)
         }), 200
         
     except Exception as e:
@@ -298,34 +313,15 @@ def get_trending_content():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        results = []
-        
-        if category == 'all':
-            # Get trending content from all categories
-            results.extend(_get_trending_users(page, per_page))
-            results.extend(_get_trending_matches(page, per_page))
-            results.extend(_get_trending_posts(page, per_page))
-            results.extend(_get_trending_academies(page, per_page))
-            results.extend(_get_trending_jobs(page, per_page))
-            results.extend(_get_trending_communities(page, per_page))
-        elif category == 'location':
-            results.extend(_get_trending_locations(page, per_page))
-        elif category == 'academy':
-            results.extend(_get_trending_academies(page, per_page))
-        elif category == 'job':
-            results.extend(_get_trending_jobs(page, per_page))
-        elif category == 'coach':
-            results.extend(_get_trending_coaches(page, per_page))
-        elif category == 'community':
-            results.extend(_get_trending_communities(page, per_page))
-        elif category == 'venue':
-            results.extend(_get_trending_venues(page, per_page))
+        categories = TRENDING_CATEGORIES.get(category, [])
+        results, snapshot = trending_snapshot_service.get_trending(categories, page, per_page)
         
         return jsonify({
             'success': True,
             'results': results,
             'category': category,
-            'total': len(results)
+            'total': len(results),
+            'snapshot': snapshot
         }), 200
         
     except Exception as e:
@@ -380,26 +376,40 @@ def get_search_suggestions():
             })
         
         return jsonify({
-            'suggestions': suggestions[:10]  # Limit to 10 suggestions
+            'suggestions': suggestions[:10],  # Limit to 10 suggestions
+            'did_you_mean': fuzzy_search_service.did_you_mean(query)
         }), 200
         
     except Exception as e:
         logger.error(f"Get search suggestions error: {e}")
         return jsonify({'error': 'Failed to get search suggestions'}), 500
 
+@search_bp.route('/cache/stats', methods=['GET'])
+def get_search_cache_stats():
+    """Get search result cache hit ratio and size"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': search_cache.get_stats()
+        }), 200
+    except Exception as e:
+        logger.error(f"Get search cache stats error: {e}")
+        return jsonify({'error': 'Failed to get search cache stats'}), 500
+
 # Helper functions for different search types
+@search_cache.cached('search.users', ('users', 'user_profiles', 'posts'))
 def _search_users(query, page=1, per_page=5):
     """Search for users/players"""
     try:
         users = User.query.join(UserProfile).filter(
             and_(
                 User.is_active == True,
-                or_(
+                fuzzy_search_service.match([User.username, UserProfile.full_name, UserProfile.location], query, or_(
                     User.username.ilike(f'%{query}%'),
                     UserProfile.full_name.ilike(f'%{query}%'),
                     UserProfile.location.ilike(f'%{query}%'),
                     UserProfile.organization.ilike(f'%{query}%')
-                )
+                ))
             )
         ).limit(per_page).all()
         
@@ -422,20 +432,21 @@ def _search_users(query, page=1, per_page=5):
         return results
     except Exception as e:
         logger.error(f"Search users error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.matches', ('matches',))
 def _search_matches(query, page=1, per_page=5):
     """Search for matches"""
     try:
         matches = Match.query.filter(
             and_(
-                Match.is_active == True,
-                or_(
+                Match.is_public == True,
+                fuzzy_search_service.match([Match.title, Match.location, Match.venue], query, or_(
                     Match.title.ilike(f'%{query}%'),
                     Match.description.ilike(f'%{query}%'),
                     Match.location.ilike(f'%{query}%'),
                     Match.venue.ilike(f'%{query}%')
-                )
+                ))
             )
         ).order_by(desc(Match.created_at)).limit(per_page).all()
         
@@ -446,7 +457,7 @@ def _search_matches(query, page=1, per_page=5):
                 'name': match.title,
                 'initials': match.title[:2].upper(),
                 'followers': f"{match.players_needed or 0} players needed",
-                'type': match.match_type.value if match.match_type else 'Match',
+                'type': match.match_type or 'Match',
                 'verified': True,
                 'gradient': 'from-green-500 to-teal-600',
                 'category': 'match',
@@ -457,8 +468,9 @@ def _search_matches(query, page=1, per_page=5):
         return results
     except Exception as e:
         logger.error(f"Search matches error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.posts', ('posts',))
 def _search_posts(query, page=1, per_page=5):
     """Search for posts"""
     try:
@@ -484,7 +496,7 @@ def _search_posts(query, page=1, per_page=5):
         return results
     except Exception as e:
         logger.error(f"Search posts error: {e}")
-        return []
+        raise
 
 def _search_academies(query, page=1, per_page=5):
     """Search for academies"""
@@ -689,282 +701,29 @@ def _search_by_location(query, page=1, per_page=5):
         logger.error(f"Search by location error: {e}")
         return []
 
-# Trending content functions
-def _get_trending_users(page=1, per_page=5):
-    """Get trending users"""
-    try:
-        users = User.query.join(User.profile).order_by(desc(User.created_at)).limit(per_page).all()
-        
-        results = []
-        for user in users:
-            profile = user.profile
-            results.append({
-                'id': user.id,
-                'name': profile.full_name if profile else user.username,
-                'initials': (profile.full_name[:2].upper() if profile and profile.full_name else user.username[:2].upper()),
-                'followers': f"{user.posts.count()} posts",
-                'type': 'Player',
-                'verified': user.is_verified,
-                'gradient': 'from-blue-500 to-purple-600',
-                'category': 'user',
-                'description': profile.organization if profile else 'Cricket Player',
-                'location': profile.location if profile else None,
-                'isConnected': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending users error: {e}")
-        return []
-
-def _get_trending_matches(page=1, per_page=5):
-    """Get trending matches"""
-    try:
-        matches = Match.query.order_by(desc(Match.created_at)).limit(per_page).all()
-        
-        results = []
-        for match in matches:
-            results.append({
-                'id': match.id,
-                'name': match.title,
-                'initials': match.title[:2].upper(),
-                'followers': f"{match.players_needed or 0} players needed",
-                'type': match.match_type.value if match.match_type else 'Match',
-                'verified': True,
-                'gradient': 'from-green-500 to-teal-600',
-                'category': 'match',
-                'description': match.description,
-                'location': match.location,
-                'isJoined': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending matches error: {e}")
-        return []
-
-def _get_trending_posts(page=1, per_page=5):
-    """Get trending posts"""
-    try:
-        posts = Post.query.order_by(desc(Post.likes_count)).limit(per_page).all()
-        
-        results = []
-        for post in posts:
-            results.append({
-                'id': post.id,
-                'name': post.content[:50] + '...' if len(post.content) > 50 else post.content,
-                'initials': 'PO',
-                'followers': f"{post.likes_count or 0} likes",
-                'type': 'Post',
-                'verified': True,
-                'gradient': 'from-orange-500 to-red-600',
-                'category': 'post',
-                'description': post.content,
-                'location': None,
-                'isConnected': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending posts error: {e}")
-        return []
-
-def _get_trending_locations(page=1, per_page=5):
-    """Get trending locations"""
-    try:
-        # Get popular match locations
-        locations = db.session.query(Match.location, db.func.count(Match.id).label('count')).group_by(Match.location).order_by(desc('count')).limit(per_page).all()
-        
-        results = []
-        for location, count in locations:
-            if location:
-                results.append({
-                    'id': f"loc_{hash(location)}",
-                    'name': location,
-                    'initials': location[:2].upper(),
-                    'followers': f"{count} matches",
-                    'type': 'Location',
-                    'verified': True,
-                    'gradient': 'from-green-500 to-teal-600',
-                    'category': 'location',
-                    'description': f"Popular cricket location with {count} matches",
-                    'location': location,
-                    'isJoined': False
-                })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending locations error: {e}")
-        return []
-
-def _get_trending_academies(page=1, per_page=5):
-    """Get trending academies"""
-    try:
-        users = User.query.join(User.profile).filter(
-            or_(
-                UserProfile.organization.ilike('%academy%'),
-                UserProfile.organization.ilike('%cricket%'),
-                UserProfile.organization.ilike('%training%')
-            )
-        ).order_by(desc(User.created_at)).limit(per_page).all()
-        
-        results = []
-        for user in users:
-            profile = user.profile
-            results.append({
-                'id': user.id,
-                'name': profile.organization if profile and profile.organization else 'Cricket Academy',
-                'initials': 'AC',
-                'followers': f"{user.posts.count()} posts",
-                'type': 'Academy',
-                'verified': user.is_verified,
-                'gradient': 'from-purple-500 to-pink-600',
-                'category': 'academy',
-                'description': f"Cricket training academy in {profile.location if profile else 'Unknown location'}",
-                'location': profile.location if profile else None,
-                'isConnected': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending academies error: {e}")
-        return []
-
-def _get_trending_jobs(page=1, per_page=5):
-    """Get trending jobs"""
-    try:
-        posts = Post.query.filter(
-            or_(
-                Post.content.ilike('%job%'),
-                Post.content.ilike('%hiring%'),
-                Post.content.ilike('%position%'),
-                Post.content.ilike('%coach%'),
-                Post.content.ilike('%trainer%')
-            )
-        ).order_by(desc(Post.likes_count)).limit(per_page).all()
-        
-        results = []
-        for post in posts:
-            results.append({
-                'id': post.id,
-                'name': post.content[:50] + '...' if len(post.content) > 50 else post.content,
-                'initials': 'JO',
-                'followers': f"{post.likes_count or 0} interested",
-                'type': 'Job',
-                'verified': True,
-                'gradient': 'from-indigo-500 to-blue-600',
-                'category': 'job',
-                'description': post.content,
-                'location': None,
-                'isApplied': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending jobs error: {e}")
-        return []
-
-def _get_trending_coaches(page=1, per_page=5):
-    """Get trending coaches"""
-    try:
-        users = User.query.join(User.profile).filter(
-            or_(
-                UserProfile.organization.ilike('%coach%'),
-                UserProfile.organization.ilike('%trainer%'),
-                UserProfile.organization.ilike('%instructor%')
-            )
-        ).order_by(desc(User.created_at)).limit(per_page).all()
-        
-        results = []
-        for user in users:
-            profile = user.profile
-            results.append({
-                'id': user.id,
-                'name': profile.full_name if profile else user.username,
-                'initials': 'CH',
-                'followers': f"{user.posts.count()} posts",
-                'type': 'Coach',
-                'verified': user.is_verified,
-                'gradient': 'from-yellow-500 to-orange-600',
-                'category': 'coach',
-                'description': f"Cricket coach at {profile.organization if profile else 'Independent'}",
-                'location': profile.location if profile else None,
-                'isConnected': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending coaches error: {e}")
-        return []
-
-def _get_trending_communities(page=1, per_page=5):
-    """Get trending communities"""
-    try:
-        posts = Post.query.filter(
-            or_(
-                Post.content.ilike('%community%'),
-                Post.content.ilike('%group%'),
-                Post.content.ilike('%team%'),
-                Post.content.ilike('%club%')
-            )
-        ).order_by(desc(Post.likes_count)).limit(per_page).all()
-        
-        results = []
-        for post in posts:
-            results.append({
-                'id': post.id,
-                'name': post.content[:50] + '...' if len(post.content) > 50 else post.content,
-                'initials': 'CO',
-                'followers': f"{post.likes_count or 0} members",
-                'type': 'Community',
-                'verified': True,
-                'gradient': 'from-teal-500 to-green-600',
-                'category': 'community',
-                'description': post.content,
-                'location': None,
-                'isJoined': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending communities error: {e}")
-        return []
-
-def _get_trending_venues(page=1, per_page=5):
-    """Get trending venues"""
-    try:
-        venues = ProfilePage.query.filter(
-            and_(
-                ProfilePage.page_type == 'Pitch',
-                ProfilePage.is_active == True
-            )
-        ).order_by(desc(ProfilePage.capacity), desc(ProfilePage.created_at)).limit(per_page).all()
-        
-        results = []
-        for venue in venues:
-            results.append({
-                'id': str(venue.page_id),
-                'name': venue.academy_name,
-                'initials': venue.academy_name[:2].upper(),
-                'followers': f"{venue.capacity or 0} capacity",
-                'type': 'Venue',
-                'verified': venue.is_verified,
-                'gradient': 'from-green-500 to-emerald-600',
-                'category': 'venue',
-                'description': venue.description or venue.tagline,
-                'location': f"{venue.city}, {venue.state}" if venue.city else venue.location,
-                'isJoined': False
-            })
-        return results
-    except Exception as e:
-        logger.error(f"Get trending venues error: {e}")
-        return []
-
 # New search functions for database integration
+def _ranked_pages(page_type, query, per_page):
+    """Pages of a type matching query via the stored search vector, best match first"""
+    condition, rank = ProfilePage.text_search(query)
+    return ProfilePage.query.filter(
+        ProfilePage.page_type == page_type,
+        ProfilePage.deleted_at.is_(None),
+        fuzzy_search_service.match([ProfilePage.academy_name, ProfilePage.city], query, condition)
+    ).order_by(rank.desc(), desc(ProfilePage.created_at)).limit(per_page).all()
+
+@search_cache.cached('search.jobs', ('jobs',))
 def _search_jobs(query, page=1, per_page=5):
     """Search for jobs"""
     try:
         jobs = Job.query.filter(
             and_(
                 Job.is_active == True,
-                or_(
+                fuzzy_search_service.match([Job.title, Job.location], query, or_(
                     Job.title.ilike(f'%{query}%'),
                     Job.description.ilike(f'%{query}%'),
                     Job.location.ilike(f'%{query}%'),
                     Job.skills_required.ilike(f'%{query}%')
-                )
+                ))
             )
         ).order_by(desc(Job.created_at)).limit(per_page).all()
         
@@ -986,24 +745,13 @@ def _search_jobs(query, page=1, per_page=5):
         return results
     except Exception as e:
         logger.error(f"Search jobs error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.academies', ('page_profiles',))
 def _search_academies(query, page=1, per_page=5):
     """Search for academies"""
     try:
-        academies = ProfilePage.query.filter(
-            and_(
-                ProfilePage.page_type == 'Academy',
-                ProfilePage.is_active == True,
-                or_(
-                    ProfilePage.academy_name.ilike(f'%{query}%'),
-                    ProfilePage.description.ilike(f'%{query}%'),
-                    ProfilePage.location.ilike(f'%{query}%'),
-                    ProfilePage.city.ilike(f'%{query}%'),
-                    ProfilePage.state.ilike(f'%{query}%')
-                )
-            )
-        ).order_by(desc(ProfilePage.created_at)).limit(per_page).all()
+        academies = _ranked_pages('Academy', query, per_page)
         
         results = []
         for academy in academies:
@@ -1017,14 +765,15 @@ def _search_academies(query, page=1, per_page=5):
                 'gradient': 'from-orange-500 to-red-600',
                 'category': 'academy',
                 'description': academy.description or academy.tagline,
-                'location': f"{academy.city}, {academy.state}" if academy.city else academy.location,
+                'location': f"{academy.city}, {academy.state}" if academy.city else academy.address,
                 'isJoined': False
             })
         return results
     except Exception as e:
         logger.error(f"Search academies error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.coaches', ('users', 'user_profiles', 'posts'))
 def _search_coaches(query, page=1, per_page=5):
     """Search for coaches"""
     try:
@@ -1032,12 +781,12 @@ def _search_coaches(query, page=1, per_page=5):
         coaches = User.query.join(UserProfile).filter(
             and_(
                 User.is_active == True,
-                or_(
+                fuzzy_search_service.match([UserProfile.full_name, UserProfile.location], query, or_(
                     UserProfile.full_name.ilike(f'%{query}%'),
                     UserProfile.organization.ilike(f'%{query}%'),
                     UserProfile.location.ilike(f'%{query}%'),
                     UserProfile.bio.ilike(f'%{query}%')
-                )
+                ))
             )
         ).limit(per_page).all()
         
@@ -1060,24 +809,13 @@ def _search_coaches(query, page=1, per_page=5):
         return results
     except Exception as e:
         logger.error(f"Search coaches error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.venues', ('page_profiles',))
 def _search_venues(query, page=1, per_page=5):
     """Search for venues/pitches"""
     try:
-        venues = ProfilePage.query.filter(
-            and_(
-                ProfilePage.page_type == 'Pitch',
-                ProfilePage.is_active == True,
-                or_(
-                    ProfilePage.academy_name.ilike(f'%{query}%'),
-                    ProfilePage.description.ilike(f'%{query}%'),
-                    ProfilePage.location.ilike(f'%{query}%'),
-                    ProfilePage.city.ilike(f'%{query}%'),
-                    ProfilePage.state.ilike(f'%{query}%')
-                )
-            )
-        ).order_by(desc(ProfilePage.created_at)).limit(per_page).all()
+        venues = _ranked_pages('Pitch', query, per_page)
         
         results = []
         for venue in venues:
@@ -1091,30 +829,19 @@ def _search_venues(query, page=1, per_page=5):
                 'gradient': 'from-green-500 to-emerald-600',
                 'category': 'venue',
                 'description': venue.description or venue.tagline,
-                'location': f"{venue.city}, {venue.state}" if venue.city else venue.location,
+                'location': f"{venue.city}, {venue.state}" if venue.city else venue.address,
                 'isJoined': False
             })
         return results
     except Exception as e:
         logger.error(f"Search venues error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.communities', ('page_profiles',))
 def _search_communities(query, page=1, per_page=5):
     """Search for communities"""
     try:
-        communities = ProfilePage.query.filter(
-            and_(
-                ProfilePage.page_type == 'Community',
-                ProfilePage.is_active == True,
-                or_(
-                    ProfilePage.academy_name.ilike(f'%{query}%'),
-                    ProfilePage.description.ilike(f'%{query}%'),
-                    ProfilePage.location.ilike(f'%{query}%'),
-                    ProfilePage.city.ilike(f'%{query}%'),
-                    ProfilePage.state.ilike(f'%{query}%')
-                )
-            )
-        ).order_by(desc(ProfilePage.created_at)).limit(per_page).all()
+        communities = _ranked_pages('Community', query, per_page)
         
         results = []
         for community in communities:
@@ -1128,14 +855,15 @@ def _search_communities(query, page=1, per_page=5):
                 'gradient': 'from-teal-500 to-cyan-600',
                 'category': 'community',
                 'description': community.description or community.tagline,
-                'location': f"{community.city}, {community.state}" if community.city else community.location,
+                'location': f"{community.city}, {community.state}" if community.city else community.address,
                 'isJoined': False
             })
         return results
     except Exception as e:
         logger.error(f"Search communities error: {e}")
-        return []
+        raise
 
+@search_cache.cached('search.location', ('users', 'user_profiles', 'posts', 'page_profiles'))
 def _search_by_location(query, page=1, per_page=5):
     """Search by location across all entities"""
     try:
@@ -1145,7 +873,7 @@ def _search_by_location(query, page=1, per_page=5):
         users = User.query.join(UserProfile).filter(
             and_(
                 User.is_active == True,
-                UserProfile.location.ilike(f'%{query}%')
+                fuzzy_search_service.match([UserProfile.location], query, UserProfile.location.ilike(f'%{query}%'))
             )
         ).limit(per_page // 2).all()
         
@@ -1169,12 +897,12 @@ def _search_by_location(query, page=1, per_page=5):
         venues = ProfilePage.query.filter(
             and_(
                 ProfilePage.page_type == 'Pitch',
-                ProfilePage.is_active == True,
-                or_(
-                    ProfilePage.location.ilike(f'%{query}%'),
+                ProfilePage.deleted_at.is_(None),
+                fuzzy_search_service.match([ProfilePage.city], query, or_(
+                    ProfilePage.address.ilike(f'%{query}%'),
                     ProfilePage.city.ilike(f'%{query}%'),
                     ProfilePage.state.ilike(f'%{query}%')
-                )
+                ))
             )
         ).limit(per_page // 2).all()
         
@@ -1189,11 +917,11 @@ def _search_by_location(query, page=1, per_page=5):
                 'gradient': 'from-green-500 to-emerald-600',
                 'category': 'venue',
                 'description': venue.description or venue.tagline,
-                'location': f"{venue.city}, {venue.state}" if venue.city else venue.location,
+                'location': f"{venue.city}, {venue.state}" if venue.city else venue.address,
                 'isJoined': False
             })
         
         return results
     except Exception as e:
         logger.error(f"Search by location error: {e}")
-        return []
+        raise
@@ -4,6 +4,8 @@ from models.base import db
 from models.profile_page import ProfilePage
 from models.user import User, UserProfile
 from models.post import Post
+from services.search_cache import search_cache, normalize_query
+from utils.pagination import estimate_count
 import logging
 from datetime import datetime, timedelta
 
@@ -22,73 +24,23 @@ def search_profiles():
         # Get search parameters
         query = request.args.get('q', '').strip()
         profile_type = request.args.get('type', 'all')
-        sort_by = request.args.get('sort', 'name')
-        sort_order = request.args.get('order', 'asc')
+        sort_by = request.args.get('sort', 'relevance' if query else 'name')
+        sort_order = request.args.get('order', 'desc' if sort_by == 'relevance' else 'asc')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
         logger.info(f"🔍 Search request: query='{query}', type='{profile_type}', sort='{sort_by}'")
         
-        # Build base query
-        base_query = db.session.query(ProfilePage)
-        
-        # Apply text search if query provided
-        if query:
-            # Use PostgreSQL full-text search with proper syntax
-            base_query = base_query.filter(
-                or_(
-                    text("to_tsvector('english', academy_name || ' ' || COALESCE(description, '') || ' ' || COALESCE(tagline, '')) @@ plainto_tsquery('english', :query)"),
-                    ProfilePage.academy_name.ilike(f'%{query}%'),
-                    ProfilePage.description.ilike(f'%{query}%'),
-                    ProfilePage.tagline.ilike(f'%{query}%')
-                )
-            ).params(query=query)
-        
-        # Apply type filter
-        if profile_type != 'all':
-            base_query = base_query.filter(ProfilePage.page_type == profile_type)
-        
-        # Apply sorting
-        if sort_by == 'name':
-            order_column = ProfilePage.academy_name
-        elif sort_by == 'type':
-            order_column = ProfilePage.page_type
-        elif sort_by == 'created':
-            order_column = ProfilePage.created_at
-        elif sort_by == 'updated':
-            order_column = ProfilePage.updated_at
-        else:
-            order_column = ProfilePage.academy_name
-        
-        if sort_order == 'desc':
-            base_query = base_query.order_by(order_column.desc())
-        else:
-            base_query = base_query.order_by(order_column.asc())
-        
-        # Get total count
-        total_count = base_query.count()
-        
-        # Apply pagination
-        offset = (page - 1) * per_page
-        profiles = base_query.offset(offset).limit(per_page).all()
-        
-        # Convert to response format
-        results = []
-        for profile in profiles:
-            results.append({
-                'id': str(profile.page_id),
-                'name': profile.academy_name,
-                'type': profile.page_type.lower(),
-                'description': profile.description,
-                'tagline': profile.tagline,
-                'city': profile.city,
-                'state': profile.state,
-                'country': profile.country,
-                'created_at': profile.created_at.isoformat(),
-                'updated_at': profile.updated_at.isoformat(),
-                'is_public': profile.is_public,
-                'is_verified': profile.is_verified
-            })
+        cache_key = search_cache.make_key(
+            'routes.profiles', query, category=profile_type,
+            filters={'sort': sort_by, 'order': sort_order}, page=page, per_page=per_page
+        )
+        results, total_count, total_is_estimate = search_cache.get_or_compute(
+            cache_key,
+            lambda: _search_profile_pages(normalize_query(query), profile_type, sort_by,
+                                          sort_order, page, per_page),
+            tables=('page_profiles',)
+        )
         
         logger.info(f"✅ Found {len(results)} profiles out of {total_count} total")
         
@@ -99,6 +51,7 @@ def search_profiles():
                 'page': page,
                 'per_page': per_page,
                 'total': total_count,
+                'total_is_estimate': total_is_estimate,
                 'pages': (total_count + per_page - 1) // per_page,
                 'has_next': page * per_page < total_count,
                 'has_prev': page > 1
@@ -118,6 +71,67 @@ def search_profiles():
             'error': str(e)
         }), 500
 
+def _search_profile_pages(query, profile_type, sort_by, sort_order, page, per_page):
+    """Run the profile page search; results are cached by search_profiles"""
+    # Build base query
+    base_query = db.session.query(ProfilePage)
+    
+    # Apply text search against the stored, GIN-indexed search vector
+    rank = None
+    if query:
+        condition, rank = ProfilePage.text_search(query)
+        base_query = base_query.filter(condition)
+    
+    # Apply type filter
+    if profile_type != 'all':
+        base_query = base_query.filter(ProfilePage.page_type == profile_type)
+    
+    # Apply sorting
+    if sort_by == 'relevance' and rank is not None:
+        order_column = rank
+    elif sort_by == 'name':
+        order_column = ProfilePage.academy_name
+    elif sort_by == 'type':
+        order_column = ProfilePage.page_type
+    elif sort_by == 'created':
+        order_column = ProfilePage.created_at
+    elif sort_by == 'updated':
+        order_column = ProfilePage.updated_at
+    else:
+        order_column = ProfilePage.academy_name
+    
+    if sort_order == 'desc':
+        base_query = base_query.order_by(order_column.desc(), ProfilePage.page_id)
+    else:
+        base_query = base_query.order_by(order_column.asc(), ProfilePage.page_id)
+    
+    # Planner estimate instead of an exact COUNT(*) over large result sets
+    total_count, total_is_estimate = estimate_count(base_query)
+    
+    # Apply pagination
+    offset = (page - 1) * per_page
+    profiles = base_query.offset(offset).limit(per_page).all()
+    
+    # Convert to response format
+    results = []
+    for profile in profiles:
+        results.append({
+            'id': str(profile.page_id),
+            'name': profile.academy_name,
+            'type': profile.page_type.lower(),
+            'description': profile.description,
+            'tagline': profile.tagline,
+            'city': profile.city,
+            'state': profile.state,
+            'country': profile.country,
+            'created_at': profile.created_at.isoformat(),
+            'updated_at': profile.updated_at.isoformat(),
+            'is_public': profile.is_public,
+            'is_verified': profile.is_verified
+        })
+    
+    return results, total_count, total_is_estimate
+
 @search_routes.route('/search/posts', methods=['GET'])
 def search_posts():
     """
@@ -369,25 +383,16 @@ def comprehensive_search():
                 'message': 'Please provide a search query'
             }), 200
         
-        # Search Users (Registered Users)
-        if search_type in ['all', 'users']:
-            users = search_users_comprehensive(query, sort_by, sort_order, page, per_page)
-            results['users'] = users
-        
-        # Search Pages (Academies, Venues, Communities)
-        if search_type in ['all', 'pages']:
-            pages = search_pages_comprehensive(query, sort_by, sort_order, page, per_page)
-            results['pages'] = pages
-        
-        # Search Posts
-        if search_type in ['all', 'posts']:
-            posts = search_posts_comprehensive(query, sort_by, sort_order, page, per_page)
-            results['posts'] = posts
-        
-        # Search Videos
-        if search_type in ['all', 'videos']:
-            videos = search_videos_comprehensive(query, sort_by, sort_order, page, per_page)
-            results['videos'] = videos
+        cache_key = search_cache.make_key(
+            'routes.comprehensive', query, category=search_type,
+            filters={'sort': sort_by, 'order': sort_order}, page=page, per_page=per_page
+        )
+        results.update(search_cache.get_or_compute(
+            cache_key,
+            lambda: _search_comprehensive(normalize_query(query), search_type, sort_by,
+                                          sort_order, page, per_page),
+            tables=('users', 'user_profiles', 'page_profiles', 'posts')
+        ))
         
         # Calculate total results
         results['total_results'] = len(results['users']) + len(results['pages']) + len(results['posts']) + len(results['videos'])
@@ -411,6 +416,32 @@ def comprehensive_search():
             'error': str(e)
         }), 500
 
+def _search_comprehensive(query, search_type, sort_by, sort_order, page, per_page):
+    """Run the per-table comprehensive searches; cached by comprehensive_search"""
+    found = {}
+    
+    # Search Users (Registered Users)
+    if search_type in ['all', 'users']:
+        users = search_users_comprehensive(query, sort_by, sort_order, page, per_page)
+        found['users'] = users
+    
+    # Search Pages (Academies, Venues, Communities)
+    if search_type in ['all', 'pages']:
+        pages = search_pages_comprehensive(query, sort_by, sort_order, page, per_page)
+        found['pages'] = pages
+    
+    # Search Posts
+    if search_type in ['all', 'posts']:
+        posts = search_posts_comprehensive(query, sort_by, sort_order, page, per_page)
+        found['posts'] = posts
+    
+    # Search Videos
+    if search_type in ['all', 'videos']:
+        videos = search_videos_comprehensive(query, sort_by, sort_order, page, per_page)
+        found['videos'] = videos
+    
+    return found
+
 def search_users_comprehensive(query, sort_by, sort_order, page, per_page):
     """Search registered users from database"""
     try:
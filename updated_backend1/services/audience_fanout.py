@@ -0,0 +1,277 @@
+"""
+Audience Fan-out
+Notify every follower of a page or participant of a match in chunks.
+
+A fan-out never loads its audience into memory. Receiver ids are streamed
+from a single-column SELECT on its own connection with a server-side cursor
+(stream_results on PostgreSQL), NOTIFICATION_FANOUT_CHUNK_SIZE ids at a
+time. Each chunk is handled as follows:
+
+    1. drop the sender and users on either side of a block with the sender
+    2. hand the chunk to the notification dispatcher, which filters by cached
+       preferences and writes the rows with multi-row INSERTs
+    3. queue the chunk's pushes on the dispatcher worker
+
+Jobs run on a background worker (inline with NOTIFICATION_FANOUT_ASYNC off)
+and record their progress: receivers streamed, dropped as blocked, dropped
+by preferences and notified, chunks, elapsed time and throughput. Recent jobs and running totals are
+available from get_job() and get_stats().
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from sqlalchemy import or_, select
+
+from models import db, MatchParticipant, PageFollower, Relationship
+from models.enums import RelationshipType
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for get_job()
+RECENT_JOBS = 200
+
+
+def page_follower_ids(page_id):
+    """SELECT of the active followers of a page"""
+    return select(PageFollower.user_id).where(
+        PageFollower.page_id == page_id,
+        PageFollower.status == 'active'
+    )
+
+
+def match_participant_ids(match_id):
+    """SELECT of the participants of a match"""
+    return select(MatchParticipant.user_id).where(MatchParticipant.match_id == match_id)
+
+
+class AudienceFanout:
+    """Stream an audience in chunks into bulk notification writes"""
+
+    def __init__(self, chunk_size=1000):
+        self.async_fanout = True
+        self.chunk_size = chunk_size
+        self._queue = deque()
+        self._jobs = OrderedDict()
+        self._totals = {'jobs': 0, 'failed': 0, 'streamed': 0, 'blocked': 0, 'filtered': 0,
+                        'notified': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def configure(self, config):
+        """Apply NOTIFICATION_FANOUT_* settings from a Flask config"""
+        self.async_fanout = config.get('NOTIFICATION_FANOUT_ASYNC', self.async_fanout)
+        self.chunk_size = config.get('NOTIFICATION_FANOUT_CHUNK_SIZE', self.chunk_size)
+
+    # ------------------------------------------------------------------
+    # Audiences
+    # ------------------------------------------------------------------
+
+    def notify_page_followers(self, page_id, notification_type, title, content, sender_id=None, **kwargs):
+        """Notify the active followers of a page; returns the job id"""
+        return self.fan_out(f"page:{page_id}", page_follower_ids(page_id),
+                            notification_type, title, content, sender_id=sender_id, **kwargs)
+
+    def notify_match_participants(self, match_id, notification_type, title, content, sender_id=None, **kwargs):
+        """Notify the participants of a match; returns the job id"""
+        kwargs.setdefault('related_match_id', match_id)
+        return self.fan_out(f"match:{match_id}", match_participant_ids(match_id),
+                            notification_type, title, content, sender_id=sender_id, **kwargs)
+
+    def fan_out(self, audience, receiver_ids, notification_type, title, content, sender_id=None, **kwargs):
+        """Notify every user id selected by receiver_ids (a one-column SELECT); returns the job id
+
+        Notification fields are validated before the job is queued, so a bad
+        type or sender id raises ValueError in the caller.
+        """
+        from services.notification_dispatch import notification_dispatcher
+
+        # Ids read back from UUID columns are compared with the sender in Python,
+        # so a string id (e.g. a JWT identity) must not reach the template
+        if sender_id is not None and not isinstance(sender_id, uuid.UUID):
+            sender_id = uuid.UUID(str(sender_id))
+
+        # Validate once up front; every chunk stamps copies of this template
+        template = notification_dispatcher.intent(None, notification_type, title, content,
+                                                  sender_id=sender_id, **kwargs)
+        job = {
+            'id': str(uuid.uuid4()),
+            'audience': audience,
+            'status': 'queued',
+            'streamed': 0,
+            'blocked': 0,
+            'filtered': 0,
+            'notified': 0,
+            'chunks': 0,
+            'queued_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'seconds': None,
+            'per_second': None,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > RECENT_JOBS:
+                self._jobs.popitem(last=False)
+        self.enqueue((job, receiver_ids, template))
+        return job['id']
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, task):
+        from flask import has_app_context
+
+        if not self.async_fanout or not has_app_context():
+            self.run(*task)
+            return
+        with self._lock:
+            self._queue.append(task)
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _ensure_worker(self):
+        from flask import current_app
+
+        if self._worker is not None and self._worker.is_alive():
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            while True:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                try:
+                    with app.app_context():
+                        self.flush()
+                except Exception as e:
+                    logger.error(f"Audience fan-out worker error: {e}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=run, name='notification-fanout', daemon=True)
+                self._worker.start()
+
+    def flush(self):
+        """Run every queued fan-out; returns the number of jobs run"""
+        count = 0
+        while True:
+            with self._lock:
+                task = self._queue.popleft() if self._queue else None
+            if task is None:
+                return count
+            self.run(*task)
+            count += 1
+
+    # ------------------------------------------------------------------
+    # Fan-out
+    # ------------------------------------------------------------------
+
+    def _blocked(self, sender_id):
+        """Users who blocked or muted the sender, or whom the sender blocked"""
+        if sender_id is None:
+            return set()
+        rows = db.session.query(Relationship.follower_id, Relationship.following_id).filter(
+            Relationship.relationship_type.in_([RelationshipType.BLOCK, RelationshipType.MUTE]),
+            or_(Relationship.following_id == sender_id,
+                (Relationship.follower_id == sender_id) & (Relationship.relationship_type == RelationshipType.BLOCK))
+        ).all()
+        return {follower_id if following_id == sender_id else following_id for follower_id, following_id in rows}
+
+    def _stream(self, receiver_ids):
+        """Chunks of distinct receiver ids, read with a server-side cursor on PostgreSQL"""
+        query = receiver_ids.distinct()
+        if db.engine.dialect.name != 'postgresql':
+            # SQLite cannot keep a read cursor open across the per-chunk commits
+            ids = [row[0] for row in db.session.execute(query)]
+            for start in range(0, len(ids), self.chunk_size):
+                yield ids[start:start + self.chunk_size]
+            return
+        with db.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=self.chunk_size).execute(query)
+            for rows in result.partitions(self.chunk_size):
+                yield [row[0] for row in rows]
+
+    def _update(self, job, **values):
+        with self._lock:
+            job.update(values)
+
+    def run(self, job, receiver_ids, template):
+        """Stream the audience and notify it chunk by chunk"""
+        from services.notification_dispatch import notification_dispatcher
+
+        started = time.monotonic()
+        self._update(job, status='running', started_at=datetime.utcnow().isoformat())
+        sender_id = template['sender_id']
+        try:
+            excluded = self._blocked(sender_id)
+            if sender_id is not None:
+                excluded.add(sender_id)
+
+            for chunk in self._stream(receiver_ids):
+                receivers = [user_id for user_id in chunk if user_id not in excluded]
+                notified = notification_dispatcher.process(
+                    [dict(template, id=uuid.uuid4(), receiver_id=user_id) for user_id in receivers],
+                    defer_pushes=True
+                ) if receivers else 0
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    job['streamed'] += len(chunk)
+                    job['blocked'] += len(chunk) - len(receivers)
+                    job['filtered'] += len(receivers) - notified
+                    job['notified'] += notified
+                    job['chunks'] += 1
+                    job['seconds'] = round(elapsed, 3)
+                    job['per_second'] = round(job['streamed'] / elapsed, 1) if elapsed else None
+            status, error = 'completed', None
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Fan-out to {job['audience']} failed after {job['streamed']} receivers: {e}")
+            status, error = 'failed', str(e)
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            job.update({
+                'status': status,
+                'error': error,
+                'finished_at': datetime.utcnow().isoformat(),
+                'seconds': round(elapsed, 3),
+                'per_second': round(job['streamed'] / elapsed, 1) if elapsed else None
+            })
+            self._totals['jobs'] += 1
+            self._totals['failed'] += status == 'failed'
+            for name in ('streamed', 'blocked', 'filtered', 'notified'):
+                self._totals[name] += job[name]
+            self._totals['seconds'] += elapsed
+        logger.info(f"Fan-out to {job['audience']}: {job['notified']} notified of {job['streamed']} "
+                    f"in {elapsed:.2f}s")
+        return job
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._totals)
+            stats['queued'] = len(self._queue)
+            stats['running'] = sum(1 for job in self._jobs.values() if job['status'] == 'running')
+        stats['seconds'] = round(stats['seconds'], 3)
+        stats['per_second'] = round(stats['streamed'] / stats['seconds'], 1) if stats['seconds'] else None
+        stats['chunk_size'] = self.chunk_size
+        return stats
+
+
+audience_fanout = AudienceFanout()
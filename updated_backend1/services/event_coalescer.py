@@ -0,0 +1,132 @@
+"""
+Event Coalescer
+Per-room keyed state whose changes reach clients as one batched diff per interval.
+
+Chatty real-time signals (typing, presence) are recorded here instead of
+being broadcast as they arrive. Repeating a value only refreshes its expiry,
+so a client sending typing_start on every keystroke costs nothing after the
+first; a background thread emits at most one diff per room per interval and
+expires entries whose TTL ran out, so stale state clears itself even when a
+client never sends the matching stop event.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EventCoalescer:
+    """Debounced per-room state with batched diffs and TTL expiry
+
+    emit(room, diff) is called from the flush thread with {key: value} for
+    every key that changed since the last emit; removed keys map to None.
+    """
+
+    def __init__(self, name, emit, interval=0.5):
+        self.name = name
+        self.interval = interval
+        self._emit = emit
+        # room -> {key: (value, expires_at, (expired_value, expired_ttl))}
+        self._state = {}
+        # room -> {key: value} as last emitted
+        self._emitted = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def set(self, room, key, value, ttl=None, expired_value=None, expired_ttl=None):
+        """Record a value; after ttl seconds it becomes expired_value (None removes it)
+
+        expired_value itself is removed after expired_ttl seconds, if given.
+        """
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._state.setdefault(room, {})[key] = (value, expires_at, (expired_value, expired_ttl))
+            if self._emitted.get(room, {}).get(key) != value:
+                self._dirty.add(room)
+        self._ensure_worker()
+
+    def clear(self, room, key):
+        """Remove a key; clients see it disappear on the next flush"""
+        with self._lock:
+            entries = self._state.get(room)
+            if entries is None or entries.pop(key, None) is None:
+                return
+            if not entries:
+                del self._state[room]
+            if key in self._emitted.get(room, {}):
+                self._dirty.add(room)
+
+    def get(self, room):
+        """Current {key: value} for a room"""
+        with self._lock:
+            return {key: entry[0] for key, entry in self._state.get(room, {}).items()}
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _expire(self, now):
+        for room, entries in list(self._state.items()):
+            for key, (value, expires_at, (expired_value, expired_ttl)) in list(entries.items()):
+                if expires_at is None or expires_at > now:
+                    continue
+                if expired_value is None:
+                    del entries[key]
+                else:
+                    entries[key] = (expired_value, now + expired_ttl if expired_ttl else None, (None, None))
+                self._dirty.add(room)
+            if not entries:
+                del self._state[room]
+
+    def _diffs(self):
+        diffs = []
+        for room in self._dirty:
+            current = {key: entry[0] for key, entry in self._state.get(room, {}).items()}
+            emitted = self._emitted.get(room, {})
+            diff = {key: value for key, value in current.items() if emitted.get(key) != value}
+            diff.update({key: None for key in emitted if key not in current})
+            if current:
+                self._emitted[room] = current
+            else:
+                self._emitted.pop(room, None)
+            if diff:
+                diffs.append((room, diff))
+        self._dirty.clear()
+        return diffs
+
+    def flush(self):
+        """Expire stale entries and emit one diff per changed room; returns the rooms emitted to"""
+        with self._lock:
+            self._expire(time.monotonic())
+            diffs = self._diffs()
+
+        for room, diff in diffs:
+            try:
+                self._emit(room, diff)
+            except Exception as e:
+                logger.error(f"{self.name} emit to {room} failed: {e}")
+        return len(diffs)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"{self.name} flush error: {e}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=run, name=f'{self.name}-coalescer', daemon=True)
+                self._worker.start()
@@ -0,0 +1,200 @@
+"""
+Fuzzy Search Service
+Typo-tolerant matching for names, usernames, locations and titles.
+
+On PostgreSQL fuzzy conditions use the pg_trgm ``%`` similarity operator,
+which (like the existing ILIKE filters) is served by the GIN gin_trgm_ops
+indexes on those columns. Other databases fall back to an in-process
+trigram index over the indexed vocabulary: the query is corrected against
+the vocabulary first and the corrected terms are matched with ILIKE.
+
+"Did you mean" suggestions come from the same vocabulary index.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import or_
+
+from models import db, User, UserProfile, Match, ProfilePage, Job
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[\w']+", re.UNICODE)
+
+
+def trigrams(term):
+    """pg_trgm-style trigrams of a single word (padded with two leading spaces and one trailing)"""
+    padded = f"  {term.casefold()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall((text or '').casefold()) if len(token) >= 2]
+
+
+class NgramIndex:
+    """Inverted trigram index over a vocabulary of words"""
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._trigrams = {}
+        self._frequency = defaultdict(int)
+
+    def __len__(self):
+        return len(self._trigrams)
+
+    def add(self, term, count=1):
+        term = term.casefold()
+        if term not in self._trigrams:
+            grams = trigrams(term)
+            self._trigrams[term] = grams
+            for gram in grams:
+                self._postings[gram].add(term)
+        self._frequency[term] += count
+
+    def __contains__(self, term):
+        return term.casefold() in self._trigrams
+
+    def similar(self, term, threshold=0.3, limit=5):
+        """Vocabulary words whose trigram similarity to term is >= threshold
+
+        Only words sharing at least one trigram are scored, so lookups touch
+        the posting lists rather than the whole vocabulary.
+        """
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+
+        scored = []
+        for candidate, common in shared.items():
+            union = len(grams) + len(self._trigrams[candidate]) - common
+            similarity = common / union if union else 0.0
+            if similarity >= threshold:
+                scored.append((similarity, self._frequency[candidate], candidate))
+
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(candidate, similarity) for similarity, _, candidate in scored[:limit]]
+
+
+class FuzzySearchService:
+    """Trigram fuzzy matching and did-you-mean suggestions"""
+
+    # Columns whose words make up the did-you-mean vocabulary
+    VOCABULARY_COLUMNS = (
+        User.username, UserProfile.full_name, UserProfile.location,
+        Match.title, Match.location, Match.venue,
+        ProfilePage.academy_name, ProfilePage.city,
+        Job.title, Job.location
+    )
+
+    def __init__(self, threshold=0.3, vocabulary_ttl=600, max_terms_per_column=50000):
+        self.threshold = threshold
+        self.vocabulary_ttl = vocabulary_ttl
+        self.max_terms_per_column = max_terms_per_column
+        self._index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_postgres(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    # ------------------------------------------------------------------
+    # Vocabulary
+    # ------------------------------------------------------------------
+
+    def _build_vocabulary(self):
+        index = NgramIndex()
+        for column in self.VOCABULARY_COLUMNS:
+            try:
+                rows = db.session.query(column, db.func.count()) \
+                    .filter(column.isnot(None)) \
+                    .group_by(column) \
+                    .limit(self.max_terms_per_column) \
+                    .all()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Fuzzy vocabulary skipped {column}: {e}")
+                continue
+            for value, count in rows:
+                for token in tokenize(value):
+                    index.add(token, count)
+        return index
+
+    def vocabulary(self):
+        """The trigram vocabulary index, rebuilt every vocabulary_ttl seconds"""
+        index = self._index
+        if index is not None and time.monotonic() - self._built_at < self.vocabulary_ttl:
+            return index
+
+        with self._lock:
+            if self._index is None or time.monotonic() - self._built_at >= self.vocabulary_ttl:
+                start_time = time.time()
+                self._index = self._build_vocabulary()
+                self._built_at = time.monotonic()
+                logger.info(f"Built fuzzy vocabulary ({len(self._index)} terms) in "
+                            f"{(time.time() - start_time) * 1000:.0f}ms")
+            return self._index
+
+    def invalidate(self):
+        """Force a vocabulary rebuild on next use"""
+        self._built_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def correct_terms(self, query, limit=3):
+        """Vocabulary words close to each query token (excluding exact matches)"""
+        index = self.vocabulary()
+        corrections = []
+        for token in tokenize(query):
+            if token in index:
+                continue
+            corrections.extend(term for term, _ in index.similar(token, self.threshold, limit))
+        return corrections
+
+    def condition(self, columns, query):
+        """SQL condition matching any column fuzzily against query"""
+        if self._is_postgres():
+            return or_(*[column.op('%')(query) for column in columns])
+
+        terms = self.correct_terms(query)
+        if not terms:
+            return None
+        return or_(*[column.ilike(f'%{term}%') for column in columns for term in terms])
+
+    def match(self, columns, query, exact_condition):
+        """Combine an existing exact (ILIKE) condition with the fuzzy one"""
+        fuzzy = self.condition(columns, query)
+        return exact_condition if fuzzy is None else or_(exact_condition, fuzzy)
+
+    def did_you_mean(self, query):
+        """Suggest a corrected query, or None if every token is already known"""
+        index = self.vocabulary()
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+
+        corrected = []
+        changed = False
+        for token in tokens:
+            if token in index:
+                corrected.append(token)
+                continue
+            best = index.similar(token, self.threshold, limit=1)
+            if best:
+                corrected.append(best[0][0])
+                changed = True
+            else:
+                corrected.append(token)
+
+        return ' '.join(corrected) if changed else None
+
+
+fuzzy_search_service = FuzzySearchService()
@@ -0,0 +1,229 @@
+"""
+Geo Search Service
+Radius search over models with latitude/longitude columns.
+
+On PostgreSQL the query uses the earthdistance extension: an ``earth_box``
+prefilter (served by the GiST ``ll_to_earth`` index) followed by an exact
+``earth_distance`` check and ordering. Other databases (SQLite in tests) use
+an in-process grid-bucket index kept in sync by mapper events, with exact
+haversine distances computed in Python.
+
+Results are ordered by (distance, primary key) and paged with an opaque cursor.
+"""
+
+import logging
+import threading
+import uuid
+
+from sqlalchemy import and_, event, func, or_
+
+from models import db, Match, ProfilePage
+from utils.geo import GridIndex, haversine_km, is_valid_coordinate
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def _primary_key(model):
+    """Single-column primary key of a mapped model"""
+    return model.__mapper__.primary_key[0]
+
+
+def _coerce_key(model, key):
+    """Convert a cursor key back to the primary key's python type"""
+    column = _primary_key(model)
+    if getattr(column.type, 'as_uuid', False):
+        try:
+            return uuid.UUID(str(key))
+        except ValueError as e:
+            raise InvalidCursorError('Invalid cursor') from e
+    return key
+
+
+class GeoSearchService:
+    """Nearest-first radius search with cursor paging"""
+
+    # Candidates checked against the base query per round trip on the fallback path
+    CANDIDATE_BATCH = 200
+
+    def __init__(self, cell_degrees=0.25):
+        self.cell_degrees = cell_degrees
+        self._indexes = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Index maintenance (non-Postgres fallback)
+    # ------------------------------------------------------------------
+
+    def register(self, model):
+        """Track a model with latitude/longitude columns in the grid index"""
+        if model in self._indexes:
+            return
+        self._indexes[model] = GridIndex(self.cell_degrees)
+        event.listen(model, 'after_insert', self._on_upsert)
+        event.listen(model, 'after_update', self._on_upsert)
+        event.listen(model, 'after_delete', self._on_delete)
+
+    def _index_for(self, target):
+        for model, index in self._indexes.items():
+            if isinstance(target, model):
+                return model, index
+        return None, None
+
+    def _on_upsert(self, mapper, connection, target):
+        model, index = self._index_for(target)
+        if index is None or model not in self._loaded:
+            return
+        key = str(getattr(target, _primary_key(model).key))
+        with self._lock:
+            index.add(key, target.latitude, target.longitude)
+
+    def _on_delete(self, mapper, connection, target):
+        model, index = self._index_for(target)
+        if index is None or model not in self._loaded:
+            return
+        key = str(getattr(target, _primary_key(model).key))
+        with self._lock:
+            index.remove(key)
+
+    def _ensure_loaded(self, model):
+        """Build the grid index for a model from the database on first use"""
+        if model in self._loaded:
+            return self._indexes[model]
+
+        pk = _primary_key(model)
+        rows = db.session.query(pk, model.latitude, model.longitude).filter(
+            model.latitude.isnot(None),
+            model.longitude.isnot(None)
+        ).all()
+
+        with self._lock:
+            index = self._indexes[model]
+            index.clear()
+            for key, latitude, longitude in rows:
+                index.add(str(key), latitude, longitude)
+            self._loaded.add(model)
+
+        logger.info(f"Built geo grid index for {model.__tablename__} ({len(index)} points)")
+        return index
+
+    def reset(self):
+        """Drop all in-process indexes; they rebuild lazily on next query"""
+        with self._lock:
+            for index in self._indexes.values():
+                index.clear()
+            self._loaded.clear()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _use_earthdistance(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def nearby(self, model, base_query, latitude, longitude, radius_km,
+               limit=20, cursor=None):
+        """Return ([(instance, distance_km)], next_cursor) nearest first
+
+        ``base_query`` carries any non-spatial filters (status, page type...).
+        Raises InvalidCursorError for a malformed cursor and ValueError for
+        out-of-range coordinates.
+        """
+        if not is_valid_coordinate(latitude, longitude):
+            raise ValueError('Latitude must be between -90 and 90 and longitude between -180 and 180')
+        if radius_km is None or radius_km <= 0:
+            raise ValueError('radius_km must be positive')
+
+        after = decode_cursor(cursor)
+        if after is not None:
+            if not isinstance(after.get('d'), (int, float)) or 'id' not in after:
+                raise InvalidCursorError('Invalid cursor')
+            after = (float(after['d']), str(after['id']))
+
+        if self._use_earthdistance():
+            rows = self._nearby_earthdistance(model, base_query, latitude, longitude,
+                                              radius_km, limit, after)
+        else:
+            rows = self._nearby_grid(model, base_query, latitude, longitude,
+                                     radius_km, limit, after)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last, distance = rows[-1]
+            next_cursor = encode_cursor({
+                'd': distance,
+                'id': str(getattr(last, _primary_key(model).key))
+            })
+
+        return rows, next_cursor
+
+    def _nearby_earthdistance(self, model, base_query, latitude, longitude,
+                              radius_km, limit, after):
+        pk = _primary_key(model)
+        origin = func.ll_to_earth(latitude, longitude)
+        point = func.ll_to_earth(model.latitude, model.longitude)
+        distance_km = func.earth_distance(origin, point) / 1000.0
+
+        query = base_query.filter(
+            model.latitude.isnot(None),
+            model.longitude.isnot(None),
+            func.earth_box(origin, radius_km * 1000.0).op('@>')(point),
+            distance_km <= radius_km
+        )
+
+        if after is not None:
+            after_distance, after_key = after
+            after_key = _coerce_key(model, after_key)
+            query = query.filter(or_(
+                distance_km > after_distance,
+                and_(distance_km == after_distance, pk > after_key)
+            ))
+
+        rows = query.add_columns(distance_km.label('distance_km')) \
+            .order_by(distance_km.asc(), pk.asc()) \
+            .limit(limit + 1) \
+            .all()
+
+        return [(instance, float(distance)) for instance, distance in rows]
+
+    def _nearby_grid(self, model, base_query, latitude, longitude,
+                     radius_km, limit, after):
+        index = self._ensure_loaded(model)
+        with self._lock:
+            candidates = index.nearby(latitude, longitude, radius_km)
+
+        if after is not None:
+            candidates = [c for c in candidates if (c[0], c[1]) > after]
+
+        pk = _primary_key(model)
+        rows = []
+        for start in range(0, len(candidates), self.CANDIDATE_BATCH):
+            batch = candidates[start:start + self.CANDIDATE_BATCH]
+            keys = [_coerce_key(model, key) for _, key in batch]
+            found = {
+                str(getattr(instance, pk.key)): instance
+                for instance in base_query.filter(pk.in_(keys)).all()
+            }
+
+            for _, key in batch:
+                instance = found.get(key)
+                if instance is None or not is_valid_coordinate(instance.latitude, instance.longitude):
+                    continue
+                # Recompute from the loaded row so a stale index entry can't misplace it
+                distance = haversine_km(latitude, longitude, instance.latitude, instance.longitude)
+                if distance > radius_km:
+                    continue
+                rows.append((instance, distance))
+
+            if len(rows) > limit:
+                break
+
+        rows.sort(key=lambda row: (row[1], str(getattr(row[0], pk.key))))
+        return rows[:limit + 1]
+
+
+geo_search_service = GeoSearchService()
+geo_search_service.register(Match)
+geo_search_service.register(ProfilePage)
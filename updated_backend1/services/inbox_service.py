@@ -0,0 +1,343 @@
+"""
+Inbox Service
+Conversation lists with maintained unread counters and bulk-loaded cards.
+
+Every (conversation, user) pair has a ConversationReadState row holding the
+user's unread counter and "read up to" watermark. Sending a message bumps the
+other participants' counters with one UPDATE; reading advances the reader's
+watermark and recounts their unread messages in a single UPDATE. Per-message
+read status and receipts are derived from the watermarks instead of being
+written message by message.
+An inbox page is then served in a fixed number of queries no matter how
+many conversations it holds:
+
+    1. conversations joined to the user's read state (page + 1 rows)
+    2. total conversation count
+    3. active group participants of the page's conversations
+    4. user cards (user + profile) for everyone referenced on the page
+
+Conversations created before read states existed get their state rows
+backfilled from a single grouped COUNT the first time they appear.
+
+The Core statements here bypass the ORM, so they stamp change_seq
+themselves; delta sync (services/sync_service.py) relies on it.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, or_, select, update
+
+from models import db, User, UserProfile, Conversation, ConversationParticipant, ConversationReadState, Message, MessageStatus
+from models.message import dialect_insert, next_change_seq
+
+logger = logging.getLogger(__name__)
+
+
+class InboxService:
+    """Unread counters, read watermarks and batched inbox pages"""
+
+    # ------------------------------------------------------------------
+    # Membership
+    # ------------------------------------------------------------------
+
+    def membership(self, user_id):
+        """SQL condition: the user belongs to Conversation (direct or group)"""
+        return or_(
+            Conversation.user1_id == user_id,
+            Conversation.user2_id == user_id,
+            exists().where(and_(
+                ConversationParticipant.conversation_id == Conversation.id,
+                ConversationParticipant.user_id == user_id,
+                ConversationParticipant.is_active != False
+            ))
+        )
+
+    def participant_ids(self, conversation):
+        """Everyone who should receive messages in a conversation"""
+        user_ids = {conversation.user1_id, conversation.user2_id}
+        rows = db.session.query(ConversationParticipant.user_id).filter(
+            ConversationParticipant.conversation_id == conversation.id,
+            ConversationParticipant.is_active != False
+        ).all()
+        user_ids.update(user_id for user_id, in rows)
+        user_ids.discard(None)
+        return user_ids
+
+    def is_participant(self, conversation, user_id):
+        """Membership check tolerant of string ids (JWT identities) vs UUID columns"""
+        return str(user_id) in {str(participant_id) for participant_id in self.participant_ids(conversation)}
+
+    # ------------------------------------------------------------------
+    # Counter maintenance
+    # ------------------------------------------------------------------
+
+    def _change_seq(self):
+        return next_change_seq(db.engine.dialect.name)
+
+    def _insert_states(self, rows):
+        """INSERT read state rows, skipping any a concurrent transaction created first"""
+        now = datetime.utcnow()
+        db.session.execute(
+            dialect_insert(ConversationReadState.__table__)
+            .values(change_seq=self._change_seq())
+            .on_conflict_do_nothing(index_elements=['conversation_id', 'user_id']),
+            [dict(row, created_at=now, updated_at=now) for row in rows]
+        )
+
+    def _ensure_states(self, conversation_id, user_ids):
+        """Insert any missing read state rows for these users"""
+        existing = {
+            user_id for user_id, in db.session.query(ConversationReadState.user_id).filter(
+                ConversationReadState.conversation_id == conversation_id,
+                ConversationReadState.user_id.in_(user_ids)
+            )
+        }
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        if missing:
+            self._insert_states([{
+                'conversation_id': conversation_id,
+                'user_id': user_id,
+                'unread_count': 0
+            } for user_id in missing])
+        return missing
+
+    def record_message(self, conversation, message):
+        """Bump unread counters for everyone but the sender; the sender has read up to here
+
+        Returns the conversation's participant ids. Flushes but does not
+        commit; the caller owns the transaction.
+        """
+        participant_ids = self.participant_ids(conversation)
+        participant_ids.add(message.sender_id)
+        self._ensure_states(conversation.id, participant_ids)
+
+        now = datetime.utcnow()
+        table = ConversationReadState.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.conversation_id == conversation.id, table.c.user_id != message.sender_id)
+            .values(unread_count=table.c.unread_count + 1, updated_at=now, change_seq=self._change_seq())
+        )
+        db.session.execute(
+            update(table)
+            .where(table.c.conversation_id == conversation.id, table.c.user_id == message.sender_id)
+            .values(unread_count=0, last_read_message_id=message.id,
+                    last_read_message_at=message.created_at or now,
+                    last_read_at=now, updated_at=now, change_seq=self._change_seq())
+        )
+        return participant_ids
+
+    def _advance_watermark(self, conversation_id, user_id, message_id, message_at):
+        """One UPDATE moving the watermark forward and recounting unread; None if it did not move"""
+        table = ConversationReadState.__table__
+        unread = select(func.count(Message.id)).where(
+            Message.conversation_id == conversation_id,
+            Message.sender_id != user_id,
+            Message.created_at > message_at
+        ).scalar_subquery()
+        now = datetime.utcnow()
+        row = db.session.execute(
+            update(table)
+            .where(
+                table.c.conversation_id == conversation_id,
+                table.c.user_id == user_id,
+                or_(table.c.last_read_message_at.is_(None), table.c.last_read_message_at < message_at)
+            )
+            .values(
+                unread_count=unread,
+                last_read_message_id=message_id,
+                last_read_message_at=message_at,
+                last_read_at=now,
+                updated_at=now,
+                change_seq=self._change_seq()
+            )
+            .returning(table.c.unread_count)
+        ).first()
+        return row.unread_count if row is not None else None
+
+    def mark_read(self, conversation_id, user_id, message=None):
+        """Advance the user's read watermark to message (default: the latest message)
+
+        Returns the watermark to broadcast as a read receipt, or None when the
+        user had already read that far. Flushes but does not commit; the
+        caller owns the transaction.
+        """
+        if message is None:
+            message = Message.query.filter_by(conversation_id=conversation_id) \
+                .order_by(Message.created_at.desc(), Message.id.desc()).first()
+            if message is None:
+                return None
+
+        unread = self._advance_watermark(conversation_id, user_id, message.id, message.created_at)
+        if unread is None and self._ensure_states(conversation_id, [user_id]):
+            unread = self._advance_watermark(conversation_id, user_id, message.id, message.created_at)
+        if unread is None:
+            return None
+
+        return {
+            'conversation_id': conversation_id,
+            'user_id': user_id,
+            'last_read_message_id': message.id,
+            'read_up_to': message.created_at.isoformat(),
+            'unread_count': unread
+        }
+
+    def latest_message(self, conversation_id, message_ids):
+        """The newest of message_ids within the conversation, or None"""
+        if not message_ids:
+            return None
+        return Message.query.filter(
+            Message.id.in_(message_ids),
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.desc(), Message.id.desc()).first()
+
+    # ------------------------------------------------------------------
+    # Receipts
+    # ------------------------------------------------------------------
+
+    def read_watermarks(self, conversation_id):
+        """{user_id: read-up-to timestamp} for every participant of a conversation"""
+        return dict(db.session.query(
+            ConversationReadState.user_id, ConversationReadState.last_read_message_at
+        ).filter(ConversationReadState.conversation_id == conversation_id).all())
+
+    def receipt(self, message, watermarks, viewer_id):
+        """Read status of a message as seen by viewer_id, derived from the watermarks
+
+        status is 'read' once every other participant's watermark has passed
+        the message; is_read is whether the viewer has read it.
+        """
+        def has_read(user_id):
+            read_up_to = watermarks.get(user_id)
+            return read_up_to is not None and read_up_to >= message.created_at
+
+        recipients = [user_id for user_id in watermarks if user_id != message.sender_id]
+        read_by = [user_id for user_id in recipients if has_read(user_id)]
+        read_by_all = bool(recipients) and len(read_by) == len(recipients)
+        return {
+            'status': MessageStatus.READ.value if read_by_all else MessageStatus.SENT.value,
+            'is_read': message.sender_id == viewer_id or has_read(viewer_id),
+            'read_by_count': len(read_by)
+        }
+
+    # ------------------------------------------------------------------
+    # Inbox
+    # ------------------------------------------------------------------
+
+    def _backfill_unread(self, user_id, conversation_ids):
+        """Unread counts for conversations without a state row, stored for next time"""
+        counts = dict(db.session.query(Message.conversation_id, func.count(Message.id)).filter(
+            Message.conversation_id.in_(conversation_ids),
+            Message.receiver_id == user_id,
+            Message.is_read != True
+        ).group_by(Message.conversation_id).all())
+
+        self._insert_states([{
+            'conversation_id': conversation_id,
+            'user_id': user_id,
+            'unread_count': counts.get(conversation_id, 0)
+        } for conversation_id in conversation_ids])
+        db.session.commit()
+        return counts
+
+    def user_cards(self, user_ids):
+        """{user_id: card} for the given users in one query"""
+        if not user_ids:
+            return {}
+        rows = db.session.query(User.id, User.username, User.is_verified,
+                                UserProfile.full_name, UserProfile.profile_image_url) \
+            .outerjoin(UserProfile, UserProfile.user_id == User.id) \
+            .filter(User.id.in_(user_ids)) \
+            .all()
+        return {
+            row.id: {
+                'id': row.id,
+                'username': row.username,
+                'full_name': row.full_name,
+                'profile_image_url': row.profile_image_url,
+                'is_verified': row.is_verified
+            }
+            for row in rows
+        }
+
+    def get_inbox(self, user_id, page=1, per_page=20):
+        """One page of the user's conversations, newest activity first"""
+        membership = self.membership(user_id)
+
+        rows = db.session.query(Conversation, ConversationReadState) \
+            .outerjoin(ConversationReadState, and_(
+                ConversationReadState.conversation_id == Conversation.id,
+                ConversationReadState.user_id == user_id
+            )) \
+            .filter(membership) \
+            .order_by(Conversation.last_message_at.desc(), Conversation.id.desc()) \
+            .offset((page - 1) * per_page) \
+            .limit(per_page + 1) \
+            .all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
+        total = db.session.query(func.count(Conversation.id)).filter(membership).scalar()
+
+        conversation_ids = [conversation.id for conversation, _ in rows]
+        group_members = defaultdict(list)
+        if conversation_ids:
+            for conversation_id, member_id in db.session.query(
+                ConversationParticipant.conversation_id, ConversationParticipant.user_id
+            ).filter(
+                ConversationParticipant.conversation_id.in_(conversation_ids),
+                ConversationParticipant.is_active != False
+            ):
+                group_members[conversation_id].append(member_id)
+
+        missing_states = [conversation.id for conversation, state in rows if state is None]
+        backfilled = self._backfill_unread(user_id, missing_states) if missing_states else {}
+
+        referenced = set()
+        for conversation, _ in rows:
+            referenced.update((conversation.user1_id, conversation.user2_id, conversation.last_message_sender_id))
+            referenced.update(group_members.get(conversation.id, ()))
+        referenced.discard(None)
+        cards = self.user_cards(referenced)
+
+        conversations = []
+        for conversation, state in rows:
+            members = group_members.get(conversation.id)
+            member_ids = members if members else [conversation.user1_id, conversation.user2_id]
+            conversations.append({
+                'id': conversation.id,
+                'conversation_type': 'group' if members else 'direct',
+                'participants': [cards[member_id] for member_id in dict.fromkeys(member_ids)
+                                 if member_id != user_id and member_id in cards],
+                'last_message_at': conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+                'last_message_content': conversation.last_message_content,
+                'last_message_sender': cards.get(conversation.last_message_sender_id),
+                'unread_count': state.unread_count if state else backfilled.get(conversation.id, 0),
+                'last_read_message_id': state.last_read_message_id if state else None,
+                'read_up_to': state.last_read_message_at.isoformat() if state and state.last_read_message_at else None,
+                'last_read_at': state.last_read_at.isoformat() if state and state.last_read_at else None,
+                'created_at': conversation.created_at.isoformat() if conversation.created_at else None
+            })
+
+        return {
+            'conversations': conversations,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_next': has_next,
+                'has_prev': page > 1
+            }
+        }
+
+    def get_total_unread(self, user_id):
+        """Unread messages across all of the user's conversations"""
+        return db.session.query(func.coalesce(func.sum(ConversationReadState.unread_count), 0)) \
+            .filter(ConversationReadState.user_id == user_id) \
+            .scalar()
+
+
+inbox_service = InboxService()
@@ -0,0 +1,317 @@
+"""
+Message Dispatcher
+Single-transaction message send with fan-out handed to a background worker.
+
+The send path only does what the sender has to wait for:
+
+    1. INSERT the message (receiver resolved by a subquery on the conversation)
+    2. UPDATE the conversation's last_message_* columns
+    3. COMMIT once and return an acknowledgement
+
+Everything that grows with the size of the conversation runs afterwards on
+the dispatcher thread, in batches:
+
+    - unread counters and the sender's read watermark (InboxService)
+    - the new_message broadcast to the conversation room
+    - notifications for the other participants, handed to the notification
+      dispatcher as one batch (preferences, bulk INSERT, unread counters,
+      in-app emits, and pushes deferred to its worker)
+
+Send latency therefore stays flat as groups grow. With
+MESSAGE_DISPATCH_ASYNC off (tests, scripts) the fan-out runs inline.
+
+If a batch fails, its messages are retried one transaction each, so one
+bad message cannot cost the rest their fan-out. A message that still fails
+is put back on the queue with exponential backoff, up to
+MESSAGE_DISPATCH_MAX_ATTEMPTS. Counters and the broadcast are committed
+before notifications are written, so a retry after that point only redoes
+the notifications and never counts a message twice.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import case, insert, select, update
+
+from models import db, Conversation, Message
+from models.message import next_change_seq
+from models.enums import NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Characters of the message shown in notification bodies
+NOTIFICATION_PREVIEW_LENGTH = 140
+
+
+def _as_uuid(value):
+    """Ids from JSON payloads arrive as strings"""
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+class MessageDispatcher:
+    """Send messages in one transaction and fan them out asynchronously"""
+
+    def __init__(self, batch_size=100, flush_interval=0.05, max_attempts=5, retry_delay=1.0, max_retry_delay=60.0):
+        self.async_dispatch = True
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._queue = deque()
+        self._retries = []
+        self._retry_order = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def configure(self, config):
+        """Apply MESSAGE_DISPATCH_* settings from a Flask config"""
+        self.async_dispatch = config.get('MESSAGE_DISPATCH_ASYNC', self.async_dispatch)
+        self.batch_size = config.get('MESSAGE_DISPATCH_BATCH_SIZE', self.batch_size)
+        self.max_attempts = config.get('MESSAGE_DISPATCH_MAX_ATTEMPTS', self.max_attempts)
+        self.retry_delay = config.get('MESSAGE_DISPATCH_RETRY_DELAY', self.retry_delay)
+
+    # ------------------------------------------------------------------
+    # Send path
+    # ------------------------------------------------------------------
+
+    def send(self, conversation_id, sender_id, content, reply_to_message_id=None, client_id=None):
+        """Store a message and queue its fan-out; returns the acknowledgement
+
+        The caller checks membership first. Commits the session.
+        """
+        conversation_id = _as_uuid(conversation_id)
+        reply_to_message_id = _as_uuid(reply_to_message_id) if reply_to_message_id else None
+        message_id = uuid.uuid4()
+        now = datetime.utcnow()
+        conversations = Conversation.__table__
+
+        # Legacy receiver_id column: the other user of the conversation pair
+        change_seq = next_change_seq(db.engine.dialect.name)
+        receiver_id = select(
+            case((conversations.c.user1_id == sender_id, conversations.c.user2_id), else_=conversations.c.user1_id)
+        ).where(conversations.c.id == conversation_id).scalar_subquery()
+
+        try:
+            db.session.execute(insert(Message.__table__).values(
+                id=message_id,
+                conversation_id=conversation_id,
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                content=content,
+                is_read=False,
+                reply_to_message_id=reply_to_message_id,
+                created_at=now,
+                updated_at=now,
+                change_seq=change_seq
+            ))
+            db.session.execute(
+                update(conversations)
+                .where(conversations.c.id == conversation_id)
+                .values(last_message_at=now, last_message_content=content,
+                        last_message_sender_id=sender_id, updated_at=now, change_seq=change_seq)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        ack = {
+            'message_id': message_id,
+            'conversation_id': conversation_id,
+            'created_at': now.isoformat(),
+            'status': 'sent',
+            'client_id': client_id
+        }
+        self.enqueue(ack)
+        return ack
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, ack):
+        from flask import has_app_context
+
+        # The ack itself goes back to the sender; retry state lives on the task
+        task = {'ack': ack, 'recorded': False, 'attempt': 0}
+        if not self.async_dispatch or not has_app_context():
+            self._dispatch([task])
+            return
+        with self._lock:
+            self._queue.append(task)
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _ensure_worker(self):
+        from flask import current_app
+
+        if self._worker is not None and self._worker.is_alive():
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    with app.app_context():
+                        self.flush()
+                except Exception as e:
+                    logger.error(f"Message dispatcher error: {e}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=run, name='message-dispatcher', daemon=True)
+                self._worker.start()
+
+    def _take(self, force_retries=False):
+        now = time.monotonic()
+        with self._lock:
+            while self._retries and (force_retries or self._retries[0][0] <= now):
+                self._queue.append(heapq.heappop(self._retries)[2])
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def pending(self):
+        """(queued messages, messages waiting to be retried)"""
+        with self._lock:
+            return len(self._queue), len(self._retries)
+
+    def flush(self, force_retries=False):
+        """Dispatch everything queued so far; returns the number of messages dispatched
+
+        force_retries dispatches waiting retries without sitting out their backoff.
+        """
+        dispatched = 0
+        while True:
+            tasks = self._take(force_retries)
+            if not tasks:
+                return dispatched
+            dispatched += self._dispatch(tasks)
+            # Retries put back by this pass wait for a later flush
+            force_retries = False
+
+    def _dispatch(self, tasks):
+        """Process a batch; on failure fall back to one transaction per message"""
+        try:
+            return self.process(tasks)
+        except Exception as e:
+            db.session.rollback()
+            if len(tasks) > 1:
+                logger.warning(f"Dispatch of {len(tasks)} messages failed, retrying one by one: {e}")
+
+        dispatched = 0
+        for task in tasks:
+            try:
+                dispatched += self.process([task])
+            except Exception as e:
+                db.session.rollback()
+                self._retry(task, e)
+        return dispatched
+
+    def _retry(self, task, error):
+        message_id = task['ack']['message_id']
+        task['attempt'] += 1
+        if task['attempt'] >= self.max_attempts:
+            logger.error(f"Giving up on fan-out of message {message_id} after {task['attempt']} attempts: {error}")
+            return
+        delay = min(self.retry_delay * (2 ** (task['attempt'] - 1)), self.max_retry_delay) * random.uniform(0.5, 1.0)
+        logger.warning(f"Fan-out of message {message_id} failed, retrying in {delay:.1f}s: {error}")
+        with self._lock:
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_order), task))
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Fan-out
+    # ------------------------------------------------------------------
+
+    def process(self, tasks):
+        """Counters, broadcast and notifications for a batch of sent messages
+
+        Counters are committed and the broadcast sent before notifications are
+        written; tasks past that point are marked recorded, so a retry only
+        redoes their notifications.
+        """
+        from services.inbox_service import inbox_service
+        from services.message_history import message_history_service
+        from services.socket_backplane import socket_backplane
+
+        by_id = {task['ack']['message_id']: task for task in tasks}
+        messages = Message.query.filter(Message.id.in_(by_id)).all()
+        conversations = {
+            conversation.id: conversation
+            for conversation in Conversation.query.filter(
+                Conversation.id.in_({message.conversation_id for message in messages})
+            ).all()
+        }
+
+        recipients = {}
+        fresh = []
+        for message in sorted(messages, key=lambda message: (message.created_at, message.id)):
+            conversation = conversations.get(message.conversation_id)
+            if conversation is None:
+                continue
+            if by_id[message.id]['recorded']:
+                participant_ids = inbox_service.participant_ids(conversation)
+            else:
+                participant_ids = inbox_service.record_message(conversation, message)
+                fresh.append(message)
+            recipients[message.id] = participant_ids - {message.sender_id}
+        db.session.commit()
+        for message in fresh:
+            by_id[message.id]['recorded'] = True
+
+        # Serialized once per conversation so cards and watermarks load in bulk;
+        # the broadcast is viewer-neutral, clients derive is_read from the receipts
+        by_conversation = {}
+        for message in messages:
+            by_conversation.setdefault(message.conversation_id, []).append(message)
+        serialized = {}
+        for conversation_id, batch in by_conversation.items():
+            for data in message_history_service.serialize(batch, conversation_id, None):
+                data['client_id'] = by_id[data['id']]['ack'].get('client_id')
+                serialized[data['id']] = data
+
+        for message in fresh:
+            data = serialized[message.id]
+            try:
+                socket_backplane.emit('new_message', {
+                    'message': data,
+                    'conversation_id': message.conversation_id
+                }, room=f"conversation_{message.conversation_id}")
+            except Exception as e:
+                logger.error(f"Failed to broadcast message {message.id}: {e}")
+
+        self._notify(messages, recipients, serialized)
+        return len(messages)
+
+    def _notify(self, messages, recipients, serialized):
+        """Hand message notifications for every recipient to the notification dispatcher as one batch"""
+        from services.notification_dispatch import notification_dispatcher
+
+        intents = []
+        for message in messages:
+            sender = serialized[message.id].get('sender') or {}
+            title = f"New message from {sender.get('full_name') or sender.get('username') or 'someone'}"
+            for receiver_id in recipients.get(message.id, ()):
+                intents.append(notification_dispatcher.intent(
+                    receiver_id, NotificationType.MESSAGE, title,
+                    (message.content or '')[:NOTIFICATION_PREVIEW_LENGTH],
+                    sender_id=message.sender_id,
+                    related_message_id=message.id
+                ))
+        if not intents:
+            return 0
+        return notification_dispatcher.process(intents, defer_pushes=True)
+
+
+message_dispatcher = MessageDispatcher()
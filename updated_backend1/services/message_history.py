@@ -0,0 +1,163 @@
+"""
+Message History Service
+Keyset-paged conversation history with batch-loaded senders and reply previews.
+
+History is ordered by (created_at, id) and served from the composite index
+idx_messages_conversation_created_at_id, so every page costs the same no
+matter how deep into the conversation it is:
+
+    before=<cursor>   older messages than the cursor
+    after=<cursor>    newer messages than the cursor
+    around=<id>       up to limit messages centred on an anchor message
+    (none)            the newest messages
+
+A page is assembled in a fixed number of queries: the page itself (two for
+around), the conversation's read watermarks, the replied-to messages, the
+sender cards and the reaction aggregates (two). Messages are returned newest first, like the old page-numbered
+endpoint.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import db, Message
+from services.inbox_service import inbox_service
+from services.reaction_service import reaction_service
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Characters of the replied-to message shown in a reply preview
+REPLY_PREVIEW_LENGTH = 120
+
+
+def message_cursor(message):
+    """Opaque cursor for a message's position in its conversation"""
+    return encode_cursor({'t': message.created_at.isoformat(), 'id': str(message.id)})
+
+
+def _cursor_position(cursor):
+    payload = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(payload['t']), uuid.UUID(payload['id'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+
+class MessageHistoryService:
+    """Cursor-paged message history for a conversation"""
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 100
+
+    def _base(self, conversation_id):
+        return Message.query.filter(Message.conversation_id == conversation_id)
+
+    def _older(self, conversation_id, position, limit, inclusive=False):
+        """Up to limit messages at or before position, newest first, plus whether more exist"""
+        key = tuple_(Message.created_at, Message.id)
+        query = self._base(conversation_id)
+        if position is not None:
+            query = query.filter(key <= tuple_(*position) if inclusive else key < tuple_(*position))
+        rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    def _newer(self, conversation_id, position, limit):
+        """Up to limit messages after position, newest first, plus whether more exist"""
+        key = tuple_(Message.created_at, Message.id)
+        rows = self._base(conversation_id) \
+            .filter(key > tuple_(*position)) \
+            .order_by(Message.created_at.asc(), Message.id.asc()) \
+            .limit(limit + 1) \
+            .all()
+        more = len(rows) > limit
+        return list(reversed(rows[:limit])), more
+
+    def get_history(self, conversation_id, viewer_id, before=None, after=None, around=None, limit=None):
+        """One page of history; raises InvalidCursorError (a ValueError) for bad cursors or anchors"""
+        limit = max(1, min(limit or self.DEFAULT_LIMIT, self.MAX_LIMIT))
+        if sum(1 for value in (before, after, around) if value) > 1:
+            raise ValueError('Use only one of before, after or around')
+
+        if around:
+            try:
+                anchor_id = uuid.UUID(str(around))
+            except ValueError as e:
+                raise InvalidCursorError('Invalid anchor message') from e
+            anchor = self._base(conversation_id).filter(Message.id == anchor_id).first()
+            if anchor is None:
+                raise InvalidCursorError('Anchor message not found in this conversation')
+            position = (anchor.created_at, anchor.id)
+            # The anchor counts towards the older half
+            older, has_more_before = self._older(conversation_id, position, limit - limit // 2, inclusive=True)
+            newer, has_more_after = self._newer(conversation_id, position, limit // 2)
+            messages = newer + older
+        elif after:
+            messages, has_more_after = self._newer(conversation_id, _cursor_position(after), limit)
+            has_more_before = True
+        else:
+            position = _cursor_position(before) if before else None
+            messages, has_more_before = self._older(conversation_id, position, limit)
+            has_more_after = position is not None
+
+        return {
+            'messages': self.serialize(messages, conversation_id, viewer_id),
+            'cursors': {
+                'before': message_cursor(messages[-1]) if messages else before,
+                'after': message_cursor(messages[0]) if messages else after
+            },
+            'has_more_before': has_more_before,
+            'has_more_after': has_more_after,
+            'limit': limit
+        }
+
+    def serialize(self, messages, conversation_id, viewer_id):
+        """Message dicts with sender cards, reply previews, receipts and reactions, loaded in bulk"""
+        if not messages:
+            return []
+
+        reply_ids = {message.reply_to_message_id for message in messages if message.reply_to_message_id}
+        replies = {}
+        if reply_ids:
+            for row in db.session.query(Message.id, Message.sender_id, Message.content, Message.created_at) \
+                    .filter(Message.id.in_(reply_ids)):
+                replies[row.id] = row
+
+        cards = inbox_service.user_cards(
+            {message.sender_id for message in messages} | {reply.sender_id for reply in replies.values()}
+        )
+        watermarks = inbox_service.read_watermarks(conversation_id)
+        reactions = reaction_service.aggregates([message.id for message in messages], viewer_id)
+
+        results = []
+        for message in messages:
+            reply = replies.get(message.reply_to_message_id)
+            data = {
+                'id': message.id,
+                'conversation_id': message.conversation_id,
+                'sender_id': message.sender_id,
+                'receiver_id': message.receiver_id,
+                'content': message.content,
+                'created_at': message.created_at.isoformat() if message.created_at else None,
+                'updated_at': message.updated_at.isoformat() if message.updated_at else None,
+                'sender': cards.get(message.sender_id),
+                'reply_to_message_id': message.reply_to_message_id,
+                # A deleted original leaves the id set but no preview
+                'reply_to_message': {
+                    'id': reply.id,
+                    'sender': cards.get(reply.sender_id),
+                    'content': (reply.content or '')[:REPLY_PREVIEW_LENGTH],
+                    'created_at': reply.created_at.isoformat() if reply.created_at else None
+                } if reply else None,
+                'reactions': reactions.get(message.id, []),
+                'cursor': message_cursor(message)
+            }
+            data.update(inbox_service.receipt(message, watermarks, viewer_id))
+            results.append(data)
+        return results
+
+
+message_history_service = MessageHistoryService()
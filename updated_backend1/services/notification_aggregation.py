@@ -0,0 +1,268 @@
+"""
+Notification Aggregation
+Collapse likes, comments and follows into one notification per target.
+
+Without aggregation a popular post produces one notification row and one
+push per like. Instead, notifications of an aggregated type are grouped by
+(receiver, type, target) and each group is a single notifications row that
+is updated in place:
+
+    group_key         e.g. 'like:post:<post_id>' or 'follow'; set while the
+                      group is open, cleared once it is read or has had no
+                      new actor for NOTIFICATION_AGGREGATION_WINDOW seconds
+    actor_count       actors in the group (a repeat by one of the sampled
+                      actors is not counted again)
+    sample_actor_ids  the most recent few actors, newest first
+    last_actor_at     when the group last gained an actor (the rolling window)
+    last_pushed_at    when the group was last pushed
+
+A dispatcher batch is collapsed per group in Python first and then written
+with a constant number of statements, whatever its size:
+
+    1. UPDATE closing the batch's groups that were read or went quiet
+    2. SELECT of the open groups (sample actors and counts to merge)
+    3. one multi-row INSERT ... ON CONFLICT (receiver_id, group_key)
+       DO UPDATE actor_count = actor_count + excluded.actor_count
+    4. UPDATE ... RETURNING of the groups whose push is due
+
+A group is pushed when it opens and then at most once per
+NOTIFICATION_AGGREGATION_PUSH_INTERVAL seconds, so a viral post costs its
+author a handful of pushes rather than one per like. Only a new group counts
+towards the unread badge; updating an unread group does not change it.
+
+Sample actors are merged in Python between steps 2 and 3, so two writers
+racing on the same group can drop a sample; actor_count is always added in
+SQL and stays exact.
+"""
+
+import logging
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from sqlalchemy import or_, select, update
+
+from models import db, Notification, User
+from models.enums import NotificationType, NotificationStatus
+from models.message import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Aggregated types and the field naming their target (None: the receiver themselves)
+AGGREGATED_TYPES = {
+    NotificationType.LIKE: 'related_post_id',
+    NotificationType.COMMENT: 'related_post_id',
+    NotificationType.FOLLOW: None,
+}
+
+# Summary line of a group with more than one actor
+GROUP_VERBS = {
+    NotificationType.LIKE: 'liked your post',
+    NotificationType.COMMENT: 'commented on your post',
+    NotificationType.FOLLOW: 'started following you',
+}
+
+
+def group_key(intent):
+    """Group key of a notification intent, or None if it is not aggregated"""
+    notification_type = intent['type']
+    if notification_type not in AGGREGATED_TYPES:
+        return None
+    field = AGGREGATED_TYPES[notification_type]
+    if field is None:
+        return notification_type.value
+    if not intent.get(field):
+        return None
+    return f"{notification_type.value}:{field[len('related_'):-len('_id')]}:{intent[field]}"
+
+
+class NotificationAggregator:
+    """Write aggregated notifications as group rows updated in place"""
+
+    def __init__(self, window_seconds=21600, push_interval=900, sample_size=3):
+        self.enabled = True
+        self.window_seconds = window_seconds
+        self.push_interval = push_interval
+        self.sample_size = sample_size
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Apply NOTIFICATION_AGGREGATION_* settings from a Flask config"""
+        self.enabled = config.get('NOTIFICATION_AGGREGATION_ENABLED', self.enabled)
+        self.window_seconds = config.get('NOTIFICATION_AGGREGATION_WINDOW', self.window_seconds)
+        self.push_interval = config.get('NOTIFICATION_AGGREGATION_PUSH_INTERVAL', self.push_interval)
+        self.sample_size = config.get('NOTIFICATION_AGGREGATION_SAMPLE_SIZE', self.sample_size)
+
+    def group_key(self, intent):
+        return group_key(intent) if self.enabled else None
+
+    def _collapse(self, grouped):
+        """One entry per (receiver, group key); the latest intent wins"""
+        groups = OrderedDict()
+        for intent, key, channels in grouped:
+            entry = groups.setdefault((intent['receiver_id'], key), {'actors': [], 'channels': set()})
+            entry['intent'] = intent
+            entry['channels'] |= channels
+            actor = str(intent['sender_id']) if intent['sender_id'] is not None else None
+            if actor is not None and actor in entry['actors']:
+                entry['actors'].remove(actor)
+            entry['actors'].insert(0, actor)
+        return groups
+
+    def _summary(self, intent, actor_count, sample_actor_ids, names):
+        if actor_count <= 1 or intent['type'] not in GROUP_VERBS:
+            return intent['content']
+        name = names.get(sample_actor_ids[0]) if sample_actor_ids else None
+        others = actor_count - 1
+        return f"{name or 'Someone'} and {others} other{'s' if others > 1 else ''} {GROUP_VERBS[intent['type']]}"
+
+    def store(self, grouped, now):
+        """Write a batch of (intent, group key, channels) as group rows
+
+        Flushes but does not commit; the caller owns the transaction. Returns
+        (deliveries, created): a (group intent, channels) pair per group
+        touched, where push is left out of channels while the group is
+        throttled, and a Counter of new groups per receiver for the badge.
+        """
+        if not grouped:
+            return [], Counter()
+        groups = self._collapse(grouped)
+        notifications = Notification.__table__
+        receivers = {receiver_id for receiver_id, _ in groups}
+        keys = {key for _, key in groups}
+        in_batch = (notifications.c.receiver_id.in_(receivers), notifications.c.group_key.in_(keys))
+
+        # 1. Close read and quiet groups so the upsert starts new ones
+        db.session.execute(
+            update(notifications)
+            .where(*in_batch, or_(notifications.c.is_read == True,
+                                  notifications.c.last_actor_at < now - timedelta(seconds=self.window_seconds)))
+            .values(group_key=None)
+        )
+
+        # 2. Open groups: counts and sample actors to merge with the batch
+        existing = {
+            (receiver_id, key): (actor_count or 0, sample_actor_ids or [])
+            for receiver_id, key, actor_count, sample_actor_ids in db.session.execute(
+                select(notifications.c.receiver_id, notifications.c.group_key,
+                       notifications.c.actor_count, notifications.c.sample_actor_ids).where(*in_batch)
+            )
+        }
+
+        rows = []
+        for (receiver_id, key), entry in groups.items():
+            actors = [actor for actor in entry['actors'] if actor is not None]
+            if (receiver_id, key) in existing:
+                actor_count, samples = existing[(receiver_id, key)]
+                added = len([actor for actor in actors if actor not in samples])
+            else:
+                actor_count, samples = 0, []
+                added = max(len(actors), 1)
+            samples = (actors + [actor for actor in samples if actor not in actors])[:self.sample_size]
+            entry.update(key=key, actor_count=actor_count + added, samples=samples)
+            rows.append((entry, added))
+
+        # Newest actor of each group, named in the summary line
+        newest = {uuid.UUID(entry['samples'][0]) for entry, _ in rows if entry['samples']}
+        names = {
+            str(user_id): username
+            for user_id, username in db.session.query(User.id, User.username).filter(User.id.in_(newest))
+        } if newest else {}
+
+        # 3. Upsert every group of the batch in one statement
+        values = []
+        for entry, added in rows:
+            intent = entry['intent']
+            entry['content'] = self._summary(intent, entry['actor_count'], entry['samples'], names)
+            pushed = 'push' in entry['channels']
+            values.append({
+                'id': intent['id'],
+                'sender_id': intent['sender_id'],
+                'receiver_id': intent['receiver_id'],
+                'type': intent['type'],
+                'title': intent['title'],
+                'content': entry['content'],
+                'is_read': False,
+                'status': NotificationStatus.PENDING if pushed else NotificationStatus.SENT,
+                'sent_at': None if pushed else now,
+                'push_attempts': 0,
+                'group_key': entry['key'],
+                'actor_count': added,
+                'sample_actor_ids': entry['samples'],
+                'last_actor_at': now,
+                'created_at': now,
+                'updated_at': now,
+                'related_post_id': intent['related_post_id'],
+                'related_match_id': intent['related_match_id'],
+                'related_message_id': intent['related_message_id']
+            })
+        statement = dialect_insert(notifications).values(values)
+        stored = db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=['receiver_id', 'group_key'],
+                set_={
+                    'actor_count': notifications.c.actor_count + statement.excluded.actor_count,
+                    'sample_actor_ids': statement.excluded.sample_actor_ids,
+                    'sender_id': statement.excluded.sender_id,
+                    'title': statement.excluded.title,
+                    'content': statement.excluded.content,
+                    'last_actor_at': now,
+                    'updated_at': now
+                }
+            ).returning(notifications.c.receiver_id, notifications.c.group_key,
+                        notifications.c.id, notifications.c.actor_count)
+        ).all()
+        stored = {(receiver_id, key): (group_id, actor_count) for receiver_id, key, group_id, actor_count in stored}
+
+        # 4. Claim the pushes that are due; new groups have never been pushed
+        push_ids = [stored[(entry['intent']['receiver_id'], entry['key'])][0]
+                    for entry, _ in rows if 'push' in entry['channels']]
+        due = set()
+        if push_ids:
+            due = set(db.session.execute(
+                update(notifications)
+                .where(notifications.c.id.in_(push_ids),
+                       or_(notifications.c.last_pushed_at.is_(None),
+                           notifications.c.last_pushed_at < now - timedelta(seconds=self.push_interval)))
+                .values(last_pushed_at=now, status=NotificationStatus.PENDING)
+                .returning(notifications.c.id)
+            ).scalars().all())
+
+        deliveries, created = [], Counter()
+        for entry, _ in rows:
+            intent = entry['intent']
+            group_id, actor_count = stored[(intent['receiver_id'], entry['key'])]
+            if group_id == intent['id']:
+                created[intent['receiver_id']] += 1
+            channels = set(entry['channels'])
+            if group_id not in due:
+                channels.discard('push')
+            deliveries.append((dict(
+                intent,
+                id=group_id,
+                content=entry['content'],
+                actor_count=actor_count,
+                sample_actor_ids=entry['samples'],
+                data=dict(intent['data'], actor_count=actor_count)
+            ), channels))
+
+        with self._lock:
+            self._stats['intents'] += len(grouped)
+            self._stats['groups'] += len(rows)
+            self._stats['created'] += sum(created.values())
+            self._stats['pushes'] += len(due)
+            self._stats['throttled'] += len(push_ids) - len(due)
+        return deliveries, created
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for name in ('intents', 'groups', 'created', 'pushes', 'throttled'):
+            stats.setdefault(name, 0)
+        stats['rows_saved'] = stats['intents'] - stats['created']
+        return stats
+
+
+notification_aggregator = NotificationAggregator()
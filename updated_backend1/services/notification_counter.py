@@ -0,0 +1,314 @@
+"""
+Notification Counter
+Maintained per-user unread notification counts for the badge.
+
+Instead of COUNT(*) over notifications on every badge refresh, each user
+has a notification_counters row that moves in the same transaction as the
+notifications it counts:
+
+    create      one multi-row INSERT ... ON CONFLICT DO UPDATE
+                unread_count = unread_count + excluded.unread_count
+    read        UPDATE notifications ... WHERE is_read = false, then the
+                counter is decremented by the rows that statement changed;
+                the same single statement covers a list of ids, everything
+                up to a timestamp, or all of a user's notifications
+    unread      the reverse
+    delete      decremented by the unread rows the DELETE returned
+    ack         delivery acknowledgements for many ids in one UPDATE,
+                optionally marking them read in the same transaction
+
+The decrement is floored at zero. New values are read back with RETURNING
+and pushed as ``notification_badge`` to the user's Socket.IO room once the
+transaction commits. Writes that bypass the service (scripts, manual SQL)
+cause drift, which reconcile() corrects. It is run from cron by
+reconcile_notification_counters.py.
+"""
+
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import case, delete, event, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Notification, NotificationCounter
+from models.enums import NotificationStatus
+from models.message import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'notification_badges'
+
+# Ids accepted in one bulk read or delivery acknowledgement
+MAX_BATCH_IDS = 500
+
+
+def parse_timestamp(value):
+    """Naive UTC datetime from an ISO 8601 string (as stored); raises ValueError"""
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class NotificationCounterService:
+    """Unread counters kept in step with notification writes"""
+
+    def __init__(self, reconcile_batch_size=1000):
+        self.reconcile_batch_size = reconcile_batch_size
+
+    def configure(self, config):
+        """Apply NOTIFICATION_COUNTER_* settings from a Flask config"""
+        self.reconcile_batch_size = config.get('NOTIFICATION_COUNTER_RECONCILE_BATCH_SIZE', self.reconcile_batch_size)
+
+    # ------------------------------------------------------------------
+    # Counter updates (flush but do not commit; the caller owns the transaction)
+    # ------------------------------------------------------------------
+
+    def _remember(self, rows):
+        session = db.session()
+        badges = session.info.setdefault(_PENDING_KEY, {})
+        for user_id, unread_count in rows:
+            badges[user_id] = unread_count
+
+    def increment(self, counts):
+        """Add {user_id: n} unread notifications in one statement"""
+        counts = {user_id: n for user_id, n in Counter(counts).items() if n > 0}
+        if not counts:
+            return
+        counters = NotificationCounter.__table__
+        now = datetime.utcnow()
+        # Rows in user order so concurrent increments lock counters in the same order
+        statement = dialect_insert(counters).values([{
+            'id': uuid.uuid4(), 'user_id': user_id, 'unread_count': n, 'created_at': now, 'updated_at': now
+        } for user_id, n in sorted(counts.items(), key=lambda item: str(item[0]))])
+        rows = db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=['user_id'],
+                set_={'unread_count': counters.c.unread_count + statement.excluded.unread_count, 'updated_at': now}
+            ).returning(counters.c.user_id, counters.c.unread_count)
+        ).all()
+        self._remember(rows)
+
+    def decrement(self, user_id, n):
+        """Remove n unread notifications from the user's counter, never going below zero"""
+        if n <= 0:
+            return
+        counters = NotificationCounter.__table__
+        rows = db.session.execute(
+            update(counters)
+            .where(counters.c.user_id == user_id)
+            .values(unread_count=case((counters.c.unread_count > n, counters.c.unread_count - n), else_=0),
+                    updated_at=datetime.utcnow())
+            .returning(counters.c.user_id, counters.c.unread_count)
+        ).all()
+        self._remember(rows)
+
+    # ------------------------------------------------------------------
+    # Read state (commit)
+    # ------------------------------------------------------------------
+
+    def _commit(self):
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _ids(self, notification_ids):
+        """Notification ids from a client (UUIDs or strings) as UUIDs; raises ValueError"""
+        if len(notification_ids) > MAX_BATCH_IDS:
+            raise ValueError(f"At most {MAX_BATCH_IDS} notification ids per request")
+        try:
+            return [value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)) for value in notification_ids]
+        except ValueError:
+            raise ValueError('Invalid notification id')
+
+    def _read(self, user_id, notification_ids=None, before=None):
+        """UPDATE marking the user's unread notifications read and decrement; returns how many changed"""
+        notifications = Notification.__table__
+        statement = update(notifications).where(
+            notifications.c.receiver_id == user_id,
+            notifications.c.is_read == False
+        )
+        if notification_ids is not None:
+            statement = statement.where(notifications.c.id.in_(self._ids(notification_ids)))
+        if before is not None:
+            # Aggregated groups count from their latest actor, not when they opened
+            statement = statement.where(
+                func.coalesce(notifications.c.last_actor_at, notifications.c.created_at) <= before
+            )
+        now = datetime.utcnow()
+        changed = db.session.execute(
+            statement.values(is_read=True, read_at=now, status=NotificationStatus.READ, updated_at=now)
+        ).rowcount
+        self.decrement(user_id, changed)
+        return changed
+
+    def mark_read(self, user_id, notification_ids=None, before=None):
+        """Mark the user's notifications read in one UPDATE; returns how many changed
+
+        notification_ids limits it to those ids (all of them when None) and
+        before to notifications created, or last grouped, up to that time.
+        """
+        if notification_ids is not None and not notification_ids:
+            return 0
+        changed = self._read(user_id, notification_ids, before)
+        self._commit()
+        return changed
+
+    def mark_all_read(self, user_id, before=None):
+        return self.mark_read(user_id, before=before)
+
+    def acknowledge(self, user_id, notification_ids, read=False):
+        """Record delivery of many notifications, and optionally read them; returns the counts changed
+
+        Delivery is one UPDATE over every id; with read the ids are also
+        marked read and the counter decremented in the same transaction.
+        """
+        if not notification_ids:
+            return {'delivered': 0, 'read': 0}
+        notifications = Notification.__table__
+        notification_ids = self._ids(notification_ids)
+        now = datetime.utcnow()
+        read_count = self._read(user_id, notification_ids) if read else 0
+        delivered = db.session.execute(
+            update(notifications)
+            .where(notifications.c.receiver_id == user_id,
+                   notifications.c.id.in_(notification_ids),
+                   notifications.c.delivered_at.is_(None))
+            .values(delivered_at=now,
+                    status=case((notifications.c.status == NotificationStatus.READ, notifications.c.status),
+                                else_=literal(NotificationStatus.DELIVERED, notifications.c.status.type)),
+                    updated_at=now)
+        ).rowcount
+        self._commit()
+        return {'delivered': delivered, 'read': read_count}
+
+    def mark_unread(self, user_id, notification_ids):
+        """Mark read notifications unread again; returns how many changed"""
+        if not notification_ids:
+            return 0
+        notifications = Notification.__table__
+        changed = db.session.execute(
+            update(notifications)
+            .where(notifications.c.receiver_id == user_id,
+                   notifications.c.id.in_(self._ids(notification_ids)),
+                   notifications.c.is_read == True)
+            .values(is_read=False, read_at=None, status=NotificationStatus.DELIVERED, updated_at=datetime.utcnow())
+        ).rowcount
+        self.increment({user_id: changed})
+        self._commit()
+        return changed
+
+    def delete(self, user_id, notification_ids=None):
+        """Delete the user's notifications (all of them when ids is None); returns how many were deleted"""
+        notifications = Notification.__table__
+        statement = delete(notifications).where(notifications.c.receiver_id == user_id)
+        if notification_ids is not None:
+            if not notification_ids:
+                return 0
+            statement = statement.where(notifications.c.id.in_(self._ids(notification_ids)))
+        deleted = db.session.execute(statement.returning(notifications.c.is_read)).scalars().all()
+        self.decrement(user_id, sum(1 for is_read in deleted if is_read is False))
+        self._commit()
+        return len(deleted)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def unread_count(self, user_id):
+        """The user's badge count from the counter row"""
+        count = db.session.query(NotificationCounter.unread_count).filter(
+            NotificationCounter.user_id == user_id
+        ).scalar()
+        if count is None:
+            # No counter yet: the user has never been notified through the service
+            count = Notification.get_unread_count(user_id)
+        return count
+
+    # ------------------------------------------------------------------
+    # Reconciliation
+    # ------------------------------------------------------------------
+
+    def reconcile(self, batch_size=None):
+        """Recount every counter and fix the ones that drifted; returns how many were fixed
+
+        Each batch is one UPDATE that recounts in a correlated subquery, so
+        no count is read and written back across statements.
+        """
+        batch_size = batch_size or self.reconcile_batch_size
+        notifications = Notification.__table__
+        counters = NotificationCounter.__table__
+        fixed = 0
+
+        # Users with unread notifications but no counter row
+        missing = db.session.execute(
+            select(notifications.c.receiver_id, func.count())
+            .where(notifications.c.is_read == False,
+                   ~select(counters.c.id).where(counters.c.user_id == notifications.c.receiver_id).exists())
+            .group_by(notifications.c.receiver_id)
+        ).all()
+        if missing:
+            self.increment(dict(missing))
+            fixed += len(missing)
+            self._commit()
+
+        unread = select(func.count()).where(
+            notifications.c.receiver_id == counters.c.user_id,
+            notifications.c.is_read == False
+        ).scalar_subquery()
+        last_user_id = None
+        while True:
+            query = select(counters.c.user_id).order_by(counters.c.user_id).limit(batch_size)
+            if last_user_id is not None:
+                query = query.where(counters.c.user_id > last_user_id)
+            user_ids = db.session.execute(query).scalars().all()
+            if not user_ids:
+                break
+            last_user_id = user_ids[-1]
+
+            now = datetime.utcnow()
+            rows = db.session.execute(
+                update(counters)
+                .where(counters.c.user_id.in_(user_ids), counters.c.unread_count != unread)
+                .values(unread_count=unread, updated_at=now, reconciled_at=now)
+                .returning(counters.c.user_id, counters.c.unread_count)
+            ).all()
+            self._remember(rows)
+            self._commit()
+            fixed += len(rows)
+
+        if fixed:
+            logger.info(f"Reconciled {fixed} notification counters")
+        return fixed
+
+    # ------------------------------------------------------------------
+    # Badge push
+    # ------------------------------------------------------------------
+
+    def _after_commit(self, session):
+        badges = session.info.pop(_PENDING_KEY, None)
+        if not badges:
+            return
+        from services.socket_backplane import socket_backplane
+
+        for user_id, unread_count in badges.items():
+            try:
+                socket_backplane.emit('notification_badge', {'unread_count': unread_count}, room=f"user_{user_id}")
+            except Exception as e:
+                logger.error(f"Failed to push notification badge to user {user_id}: {e}")
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def register(self):
+        """Push badges once the transactions that changed them commit"""
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+
+notification_counter = NotificationCounterService()
+notification_counter.register()
@@ -0,0 +1,545 @@
+"""
+Notification Dispatch
+Notification delivery off the request path, with batched FCM sends.
+
+A request only enqueues a notification intent and gets its id back:
+
+    notification_id = notification_dispatcher.notify(receiver_id, NotificationType.MESSAGE, title, content, ...)
+
+The id is only guaranteed for ungrouped types: a like, comment or follow
+that folds into an open group (services/notification_aggregation.py) is
+stored under the group row's id instead.
+
+The dispatcher thread then works on batches of intents:
+
+    1. look up the receivers' compiled preferences (services/preference_cache.py)
+       and pick each intent's channels (in_app, push, email); quiet hours
+       hold back push only
+    2. one bulk INSERT into notifications (status pending for push, sent
+       otherwise) and the receivers' unread counters in the same transaction;
+       likes, comments and follows are instead folded into group rows
+       (services/notification_aggregation.py), whose pushes are throttled
+    3. group by channel: Socket.IO emits to user rooms, email hand-off, and
+       push jobs for every registered device token
+
+Push jobs are expanded to one message per device and sent in batches of up
+to NOTIFICATION_PUSH_BATCH_SIZE (FCM's limit is 500 messages per batch
+call). Devices failing with a transient error are retried with exponential
+backoff and jitter up to NOTIFICATION_PUSH_MAX_ATTEMPTS; tokens the provider
+reports as unregistered are deleted. Outcomes are written back with one
+UPDATE per outcome rather than one per notification.
+
+Transports are pluggable: FirebaseTransport for production and
+FakeFCMTransport, which records batches and can inject latency and
+failures, for tests and benchmarks. With NOTIFICATION_DISPATCH_ASYNC off
+intents are processed inline; retries wait for the next flush().
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from sqlalchemy import insert, update
+
+from models import db, DeviceToken, Notification
+from models.enums import NotificationType, NotificationStatus
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 messages in one batch call
+FCM_MAX_BATCH_SIZE = 500
+
+# Provider error codes worth retrying, and those meaning the token is gone
+TRANSIENT_ERRORS = {'UNAVAILABLE', 'INTERNAL', 'RESOURCE_EXHAUSTED', 'QUOTA_EXCEEDED', 'DEADLINE_EXCEEDED', 'UNKNOWN'}
+STALE_TOKEN_ERRORS = {'UNREGISTERED', 'SENDER_ID_MISMATCH'}
+
+RELATED_FIELDS = ('related_post_id', 'related_match_id', 'related_message_id')
+
+
+class PushUnavailableError(Exception):
+    """The push provider is not configured; pushes fail without retrying"""
+
+
+# ----------------------------------------------------------------------
+# Transports
+# ----------------------------------------------------------------------
+
+class FirebaseTransport:
+    """Sends message batches with firebase_admin's send_each"""
+
+    def _app(self):
+        from services.notification_service import notification_service
+
+        if notification_service.fcm_app is None:
+            raise PushUnavailableError('Firebase Admin SDK is not initialized')
+        return notification_service.fcm_app
+
+    def _message(self, message):
+        from firebase_admin import messaging
+
+        priority = 'high' if message['priority'] in ('high', 'urgent') else 'normal'
+        return messaging.Message(
+            notification=messaging.Notification(
+                title=message['title'], body=message['body'], image=message.get('image')
+            ),
+            data=message['data'],
+            token=message['token'],
+            android=messaging.AndroidConfig(
+                priority=priority,
+                notification=messaging.AndroidNotification(sound='default')
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(aps=messaging.Aps(sound='default'))
+            )
+        )
+
+    def _error_code(self, exception):
+        from firebase_admin import messaging
+
+        if isinstance(exception, messaging.UnregisteredError):
+            return 'UNREGISTERED'
+        if isinstance(exception, messaging.SenderIdMismatchError):
+            return 'SENDER_ID_MISMATCH'
+        if isinstance(exception, messaging.QuotaExceededError):
+            return 'QUOTA_EXCEEDED'
+        return getattr(exception, 'code', None) or 'UNKNOWN'
+
+    def send(self, messages):
+        """[(success, error_code)] for each message, in order"""
+        from firebase_admin import messaging
+
+        response = messaging.send_each([self._message(message) for message in messages], app=self._app())
+        return [
+            (result.success, None if result.success else self._error_code(result.exception))
+            for result in response.responses
+        ]
+
+
+class FakeFCMTransport:
+    """In-process stand-in for FCM that records every batch
+
+    Tokens starting with ``invalid`` fail as unregistered; other messages fail
+    with UNAVAILABLE at failure_rate. latency is slept once per batch call.
+    """
+
+    def __init__(self, failure_rate=0.0, latency=0.0, seed=None):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.batches = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def sent(self):
+        with self._lock:
+            return [message for batch in self.batches for message in batch]
+
+    def reset(self):
+        with self._lock:
+            self.batches = []
+
+    def send(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for message in messages:
+            if message['token'].startswith('invalid'):
+                results.append((False, 'UNREGISTERED'))
+            elif self.failure_rate and self._random.random() < self.failure_rate:
+                results.append((False, 'UNAVAILABLE'))
+            else:
+                results.append((True, None))
+        with self._lock:
+            self.batches.append(list(messages))
+        return results
+
+
+TRANSPORTS = {
+    'firebase': FirebaseTransport,
+    'fake': FakeFCMTransport,
+}
+
+
+# ----------------------------------------------------------------------
+# Dispatcher
+# ----------------------------------------------------------------------
+
+class NotificationDispatcher:
+    """Queue notification intents and deliver them in batches per channel"""
+
+    def __init__(self, batch_size=200, push_batch_size=FCM_MAX_BATCH_SIZE, max_attempts=5,
+                 retry_delay=1.0, max_retry_delay=300.0, flush_interval=0.05):
+        self.async_dispatch = True
+        self.batch_size = batch_size
+        self.push_batch_size = push_batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.flush_interval = flush_interval
+        self.transport = FirebaseTransport()
+        self._queue = deque()
+        self._scheduled = []
+        self._schedule_order = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def configure(self, config):
+        """Apply NOTIFICATION_DISPATCH_* and NOTIFICATION_PUSH_* settings from a Flask config"""
+        self.async_dispatch = config.get('NOTIFICATION_DISPATCH_ASYNC', self.async_dispatch)
+        self.batch_size = config.get('NOTIFICATION_DISPATCH_BATCH_SIZE', self.batch_size)
+        self.push_batch_size = min(config.get('NOTIFICATION_PUSH_BATCH_SIZE', self.push_batch_size),
+                                   FCM_MAX_BATCH_SIZE)
+        self.max_attempts = config.get('NOTIFICATION_PUSH_MAX_ATTEMPTS', self.max_attempts)
+        self.retry_delay = config.get('NOTIFICATION_PUSH_RETRY_DELAY', self.retry_delay)
+        transport = config.get('NOTIFICATION_PUSH_TRANSPORT')
+        if transport:
+            if transport not in TRANSPORTS:
+                raise ValueError(f"Unknown NOTIFICATION_PUSH_TRANSPORT '{transport}'")
+            self.transport = TRANSPORTS[transport]()
+
+    # ------------------------------------------------------------------
+    # Intents
+    # ------------------------------------------------------------------
+
+    def intent(self, receiver_id, notification_type, title, content, sender_id=None, priority='normal',
+               action_url=None, image_url=None, data=None, **related):
+        """Build a notification intent; raises ValueError for unknown types or fields"""
+        if not isinstance(notification_type, NotificationType):
+            notification_type = NotificationType(notification_type)
+        unknown = set(related) - set(RELATED_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown notification fields: {', '.join(sorted(unknown))}")
+        return {
+            'id': uuid.uuid4(),
+            'receiver_id': receiver_id,
+            'sender_id': sender_id,
+            'type': notification_type,
+            'title': title,
+            'content': content,
+            'priority': priority,
+            'action_url': action_url,
+            'image_url': image_url,
+            'data': data or {},
+            **{field: related.get(field) for field in RELATED_FIELDS}
+        }
+
+    def notify(self, receiver_id, notification_type, title, content, **kwargs):
+        """Queue one notification; returns its id
+
+        The id is only guaranteed to be stored for ungrouped types; an
+        aggregated like, comment or follow may be stored under the id of an
+        existing group row.
+        """
+        intent = self.intent(receiver_id, notification_type, title, content, **kwargs)
+        self.enqueue([intent])
+        return intent['id']
+
+    def enqueue(self, intents):
+        from flask import has_app_context
+
+        if not self.async_dispatch or not has_app_context():
+            self.process(intents)
+            return
+        with self._lock:
+            self._queue.extend(intents)
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _queue_pushes(self, jobs):
+        from flask import has_app_context
+
+        if not jobs:
+            return
+        if not self.async_dispatch or not has_app_context():
+            self._send_pushes(jobs)
+            return
+        for job in jobs:
+            self._schedule(job, 0)
+        self._ensure_worker()
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _ensure_worker(self):
+        from flask import current_app
+
+        if self._worker is not None and self._worker.is_alive():
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    with app.app_context():
+                        self.flush()
+                except Exception as e:
+                    logger.error(f"Notification dispatcher error: {e}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=run, name='notification-dispatcher', daemon=True)
+                self._worker.start()
+
+    def _take(self):
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _due_pushes(self, force=False):
+        now = time.monotonic()
+        jobs = []
+        with self._lock:
+            while self._scheduled and (force or self._scheduled[0][0] <= now):
+                jobs.append(heapq.heappop(self._scheduled)[2])
+        return jobs
+
+    def pending(self):
+        """(queued intents, scheduled pushes)"""
+        with self._lock:
+            return len(self._queue), len(self._scheduled)
+
+    def flush(self, force_retries=False):
+        """Dispatch queued intents and due pushes; returns the number of intents processed
+
+        force_retries sends scheduled retries without waiting out their backoff.
+        """
+        processed = 0
+        while True:
+            intents = self._take()
+            if not intents:
+                break
+            try:
+                processed += self.process(intents)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to dispatch {len(intents)} notifications: {e}")
+
+        jobs = self._due_pushes(force_retries)
+        if jobs:
+            try:
+                self._send_pushes(jobs)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to send {len(jobs)} scheduled pushes: {e}")
+        return processed
+
+    # ------------------------------------------------------------------
+    # Channels
+    # ------------------------------------------------------------------
+
+    def process(self, intents, defer_pushes=False):
+        """Store a batch of intents and deliver them on their channels
+
+        defer_pushes hands the pushes to the dispatcher worker instead of
+        sending them before returning (audience fan-outs).
+        """
+        from services.notification_aggregation import notification_aggregator
+        from services.notification_counter import notification_counter
+        from services.preference_cache import preference_cache
+
+        preferences = preference_cache.get_many({intent['receiver_id'] for intent in intents})
+
+        now = datetime.utcnow()
+        rows, grouped, by_channel = [], [], {'in_app': [], 'push': [], 'email': []}
+        for intent in intents:
+            channels = preferences[intent['receiver_id']].channels(intent['type'])
+            if not channels:
+                continue
+            key = notification_aggregator.group_key(intent)
+            if key is not None:
+                grouped.append((intent, key, channels))
+                continue
+            pushed = 'push' in channels
+            rows.append({
+                'id': intent['id'],
+                'sender_id': intent['sender_id'],
+                'receiver_id': intent['receiver_id'],
+                'type': intent['type'],
+                'title': intent['title'],
+                'content': intent['content'],
+                'is_read': False,
+                'status': NotificationStatus.PENDING if pushed else NotificationStatus.SENT,
+                'sent_at': None if pushed else now,
+                'push_attempts': 0,
+                'created_at': now,
+                'updated_at': now,
+                **{field: intent[field] for field in RELATED_FIELDS}
+            })
+            for channel in channels:
+                by_channel[channel].append(intent)
+
+        if not rows and not grouped:
+            return 0
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(insert(Notification.__table__), rows[start:start + self.batch_size])
+        deliveries, created = notification_aggregator.store(grouped, now)
+        for intent, channels in deliveries:
+            for channel in channels:
+                by_channel[channel].append(intent)
+        notification_counter.increment(Counter(row['receiver_id'] for row in rows) + created)
+        db.session.commit()
+
+        self._emit(by_channel['in_app'], now)
+        self._email(by_channel['email'])
+        jobs = [{
+            'notification_id': intent['id'],
+            'receiver_id': intent['receiver_id'],
+            'message': self._push_message(
+                intent['id'], intent['type'], intent['title'], intent['content'], intent,
+                priority=intent['priority'], action_url=intent['action_url'],
+                image_url=intent['image_url'], data=intent['data']
+            ),
+            'tokens': None,
+            'attempt': 0
+        } for intent in by_channel['push']]
+        if defer_pushes:
+            self._queue_pushes(jobs)
+        else:
+            self._send_pushes(jobs)
+        return len(rows) + len(deliveries)
+
+    def _emit(self, intents, created_at):
+        from services.socket_backplane import socket_backplane
+
+        for intent in intents:
+            try:
+                socket_backplane.emit('new_notification', {'notification': {
+                    'id': str(intent['id']),
+                    'type': intent['type'].value,
+                    'title': intent['title'],
+                    'content': intent['content'],
+                    'is_read': False,
+                    'action_url': intent['action_url'],
+                    'actor_count': intent.get('actor_count', 1),
+                    'sample_actor_ids': intent.get('sample_actor_ids'),
+                    'created_at': created_at.isoformat(),
+                    **{field: str(intent[field]) if intent[field] else None for field in RELATED_FIELDS}
+                }}, room=f"user_{intent['receiver_id']}")
+            except Exception as e:
+                logger.error(f"Failed to emit notification {intent['id']}: {e}")
+
+    def _email(self, intents):
+        # No mail transport is wired up yet; hand-off is logged like NotificationService did
+        for intent in intents:
+            logger.info(f"Email notification queued for user {intent['receiver_id']}")
+
+    # ------------------------------------------------------------------
+    # Push
+    # ------------------------------------------------------------------
+
+    def _push_message(self, notification_id, notification_type, title, content, related,
+                      priority='normal', action_url=None, image_url=None, data=None):
+        # FCM data values must be strings
+        payload = {key: str(value) for key, value in (data or {}).items() if value is not None}
+        payload.update({'notification_id': str(notification_id), 'type': notification_type.value})
+        for field in RELATED_FIELDS:
+            if related.get(field):
+                payload[field] = str(related[field])
+        if action_url:
+            payload['action_url'] = action_url
+        return {'title': title, 'body': content, 'image': image_url, 'data': payload, 'priority': priority}
+
+    def _backoff(self, attempt):
+        delay = min(self.retry_delay * (2 ** (attempt - 1)), self.max_retry_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _send_pushes(self, jobs):
+        """Send push jobs in provider-sized batches and record the outcomes in bulk"""
+        if not jobs:
+            return
+        unresolved = {job['receiver_id'] for job in jobs if job['tokens'] is None}
+        tokens = DeviceToken.tokens_for(unresolved) if unresolved else {}
+        for job in jobs:
+            if job['tokens'] is None:
+                job['tokens'] = tokens.get(job['receiver_id'], [])
+
+        deliveries = [(job, token) for job in jobs for token in job['tokens']]
+        outcomes = {id(job): {'sent': False, 'retry': [], 'error': None} for job in jobs}
+        stale = set()
+        for start in range(0, len(deliveries), self.push_batch_size):
+            batch = deliveries[start:start + self.push_batch_size]
+            try:
+                results = self.transport.send([dict(job['message'], token=token) for job, token in batch])
+            except PushUnavailableError as e:
+                logger.warning(f"Push notifications unavailable: {e}")
+                results = [(False, 'PUSH_UNAVAILABLE')] * len(batch)
+            except Exception as e:
+                logger.error(f"Push batch of {len(batch)} failed: {e}")
+                results = [(False, 'UNAVAILABLE')] * len(batch)
+
+            for (job, token), (success, error) in zip(batch, results):
+                outcome = outcomes[id(job)]
+                if success:
+                    outcome['sent'] = True
+                    continue
+                outcome['error'] = error
+                if error in STALE_TOKEN_ERRORS:
+                    stale.add(token)
+                elif error in TRANSIENT_ERRORS:
+                    outcome['retry'].append(token)
+
+        sent_ids, failed, attempted_ids = [], {}, []
+        for job in jobs:
+            outcome = outcomes[id(job)]
+            attempt = job['attempt'] + 1
+            if job['tokens']:
+                attempted_ids.append(job['notification_id'])
+            if outcome['retry'] and attempt < self.max_attempts:
+                self._schedule(dict(job, tokens=outcome['retry'], attempt=attempt), self._backoff(attempt))
+            if outcome['sent']:
+                sent_ids.append(job['notification_id'])
+            elif not job['tokens']:
+                failed.setdefault('NO_DEVICE_TOKENS', []).append(job['notification_id'])
+            elif not outcome['retry'] or attempt >= self.max_attempts:
+                failed.setdefault(outcome['error'] or 'UNKNOWN', []).append(job['notification_id'])
+
+        self._record(sent_ids, failed, attempted_ids, stale)
+
+    def _schedule(self, job, delay):
+        due = time.monotonic() + delay
+        with self._lock:
+            heapq.heappush(self._scheduled, (due, next(self._schedule_order), job))
+        self._wakeup.set()
+
+    def _record(self, sent_ids, failed, attempted_ids, stale_tokens):
+        """One UPDATE per outcome, then prune stale tokens; commits"""
+        notifications = Notification.__table__
+        now = datetime.utcnow()
+        if attempted_ids:
+            db.session.execute(
+                update(notifications)
+                .where(notifications.c.id.in_(attempted_ids))
+                .values(push_attempts=notifications.c.push_attempts + 1, updated_at=now)
+            )
+        if sent_ids:
+            # A retry that succeeds after a delivery ack must not move the status back
+            db.session.execute(
+                update(notifications)
+                .where(notifications.c.id.in_(sent_ids),
+                       notifications.c.status.in_([NotificationStatus.PENDING, NotificationStatus.FAILED]))
+                .values(status=NotificationStatus.SENT, sent_at=now, failure_reason=None)
+            )
+        for reason, notification_ids in failed.items():
+            db.session.execute(
+                update(notifications)
+                .where(notifications.c.id.in_(notification_ids),
+                       notifications.c.status == NotificationStatus.PENDING)
+                .values(status=NotificationStatus.FAILED, failure_reason=reason[:100])
+            )
+        if stale_tokens:
+            DeviceToken.prune(stale_tokens)
+            logger.info(f"Pruned {len(stale_tokens)} unregistered device tokens")
+        db.session.commit()
+
+
+notification_dispatcher = NotificationDispatcher()
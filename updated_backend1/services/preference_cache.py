@@ -0,0 +1,255 @@
+"""
+Notification Preference Cache
+Compiled per-user notification preferences behind an in-process LRU.
+
+Sending a notification needs two answers per receiver: which channels the
+type is enabled on, and whether it is quiet hours. Instead of loading (or
+creating) a NotificationPreferences row per receiver and re-reading its
+columns, each row is compiled once into:
+
+    mask    one bit per (channel, notification type), master switches applied
+    quiet   the quiet-hours window as seconds of the day, or None
+
+Fan-outs look up every receiver in one query for the cache misses
+(get_many); users without a row get the column defaults without a row being
+created. Writes to notification_preferences invalidate the user's entry
+once their transaction commits, and the TTL bounds how long a write made
+by another worker process can go unnoticed.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import NotificationPreferences
+from models.enums import NotificationType
+from models.notification import PREFERENCE_TOPICS
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'notification_preference_invalidations'
+
+CHANNELS = ('push', 'in_app', 'email')
+TYPES = tuple(NotificationType)
+
+# Receivers loaded per query on a bulk miss
+LOAD_CHUNK_SIZE = 1000
+
+
+def _bit(notification_type, channel):
+    return 1 << (CHANNELS.index(channel) * len(TYPES) + TYPES.index(notification_type))
+
+
+def _key(user_id):
+    """Ids arrive as UUIDs or strings; rows are keyed by UUID"""
+    if isinstance(user_id, uuid.UUID):
+        return user_id
+    try:
+        return uuid.UUID(str(user_id))
+    except ValueError:
+        return user_id
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class CompiledPreferences:
+    """Channel bitmask and quiet-hours window of one user"""
+
+    __slots__ = ('mask', 'quiet')
+
+    def __init__(self, mask, quiet=None):
+        self.mask = mask
+        self.quiet = quiet
+
+    @classmethod
+    def compile(cls, values):
+        """Compile from a NotificationPreferences row or a dict of its column values"""
+        get = values.get if isinstance(values, dict) else lambda name, default=None: getattr(values, name, default)
+        mask = 0
+        for channel in CHANNELS:
+            if not get(f'{channel}_enabled'):
+                continue
+            for notification_type in TYPES:
+                topic = PREFERENCE_TOPICS.get(notification_type, notification_type.value)
+                if get(f'{channel}_{topic}', True):
+                    mask |= _bit(notification_type, channel)
+
+        quiet = None
+        start, end = get('quiet_hours_start'), get('quiet_hours_end')
+        if get('quiet_hours_enabled') and start and end:
+            quiet = (_seconds(start), _seconds(end))
+        return cls(mask, quiet)
+
+    def allows(self, notification_type, channel):
+        return bool(self.mask & _bit(notification_type, channel))
+
+    def in_quiet_hours(self, now=None):
+        """Same window semantics as NotificationPreferences.is_quiet_hours (server local time)"""
+        if self.quiet is None:
+            return False
+        current = _seconds((now or datetime.now()).time())
+        start, end = self.quiet
+        if start <= end:
+            return start <= current <= end
+        return current >= start or current <= end
+
+    def channels(self, notification_type, now=None):
+        """Channels a notification of this type goes out on right now; quiet hours hold back push"""
+        channels = {channel for channel in CHANNELS if self.allows(notification_type, channel)}
+        if 'push' in channels and self.in_quiet_hours(now):
+            channels.discard('push')
+        return channels
+
+
+def _column_defaults():
+    defaults = {}
+    for column in NotificationPreferences.__table__.columns:
+        if column.default is not None and column.default.is_scalar:
+            defaults[column.name] = column.default.arg
+    return defaults
+
+
+class PreferenceCache:
+    """LRU of compiled notification preferences with bulk loading"""
+
+    def __init__(self, max_entries=50000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._defaults = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0, 'queries': 0}
+
+    def configure(self, config):
+        """Apply NOTIFICATION_PREFERENCE_CACHE_* settings from a Flask config"""
+        self.max_entries = config.get('NOTIFICATION_PREFERENCE_CACHE_SIZE', self.max_entries)
+        self.ttl_seconds = config.get('NOTIFICATION_PREFERENCE_CACHE_TTL', self.ttl_seconds)
+
+    @property
+    def defaults(self):
+        """Compiled preferences of a user who never saved any"""
+        if self._defaults is None:
+            self._defaults = CompiledPreferences.compile(_column_defaults())
+        return self._defaults
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get(self, user_id):
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        """{user_id: CompiledPreferences} for every id, querying only the misses"""
+        keys = {user_id: _key(user_id) for user_id in user_ids}
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for key in set(keys.values()):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+                    self._stats['hits'] += 1
+                    continue
+                if entry is not None:
+                    del self._entries[key]
+                    self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                missing.append(key)
+            generation = self._generation
+
+        if missing:
+            loaded = self._load(missing)
+            found.update(loaded)
+            self._store(loaded, generation)
+        return {user_id: found[key] for user_id, key in keys.items()}
+
+    def _load(self, user_ids):
+        loaded = {}
+        for start in range(0, len(user_ids), LOAD_CHUNK_SIZE):
+            chunk = user_ids[start:start + LOAD_CHUNK_SIZE]
+            rows = NotificationPreferences.query.filter(NotificationPreferences.user_id.in_(chunk)).all()
+            with self._lock:
+                self._stats['queries'] += 1
+            for row in rows:
+                loaded[row.user_id] = CompiledPreferences.compile(row)
+        for user_id in user_ids:
+            loaded.setdefault(user_id, self.defaults)
+        return loaded
+
+    def _store(self, loaded, generation):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            # A write committed while loading may not be in what was read
+            if generation != self._generation:
+                return
+            for user_id, preferences in loaded.items():
+                self._entries[user_id] = (preferences, expires_at)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(_key(user_id), None)
+            self._stats['invalidations'] += len(user_ids)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _capture(self, mapper, connection, target):
+        session = object_session(target)
+        if session is not None and target.user_id is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(target.user_id)
+
+    def _after_commit(self, session):
+        user_ids = session.info.pop(_PENDING_KEY, None)
+        if user_ids:
+            self.invalidate(*user_ids)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def register(self):
+        """Invalidate a user's entry when their preferences row is written"""
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(NotificationPreferences, name, self._capture)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+
+preference_cache = PreferenceCache()
+preference_cache.register()
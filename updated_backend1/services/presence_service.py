@@ -0,0 +1,186 @@
+"""
+Typing and Presence Services
+Coalesced typing indicators and online/away/offline presence for conversation rooms.
+
+Both are built on EventCoalescer, so clients receive at most one
+``typing_update`` and one ``presence_update`` per conversation room per
+flush interval however many events the participants send:
+
+    typing_update    {'conversation_id', 'started': [user_id], 'stopped': [user_id]}
+    presence_update  {'conversation_id', 'changes': {user_id: {'status', 'last_seen'}}}
+
+Typing state expires after TYPING_TTL seconds without a fresh typing_start.
+Online presence expires to offline after PRESENCE_TTL seconds without a
+heartbeat, covering clients whose disconnect never reached the server.
+
+State is kept per process. With several workers each worker tracks the
+sockets connected to it; the emits themselves go through the Socket.IO
+backplane and reach every worker.
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+from services.event_coalescer import EventCoalescer
+from services.socket_backplane import socket_backplane
+
+logger = logging.getLogger(__name__)
+
+ONLINE = 'online'
+AWAY = 'away'
+OFFLINE = 'offline'
+PRESENCE_STATUSES = (ONLINE, AWAY, OFFLINE)
+
+
+def conversation_room(conversation_id):
+    return f"conversation_{conversation_id}"
+
+
+class TypingService:
+    """Debounced typing indicators per (user, conversation)"""
+
+    def __init__(self, interval=0.5, ttl=6.0):
+        self.ttl = ttl
+        self.coalescer = EventCoalescer('typing', self._emit, interval)
+
+    def configure(self, config):
+        """Apply TYPING_* settings from a Flask config"""
+        self.coalescer.interval = config.get('TYPING_FLUSH_INTERVAL', self.coalescer.interval)
+        self.ttl = config.get('TYPING_TTL', self.ttl)
+
+    def start(self, conversation_id, user_id):
+        self.coalescer.set(str(conversation_id), str(user_id), True, ttl=self.ttl)
+
+    def stop(self, conversation_id, user_id):
+        self.coalescer.clear(str(conversation_id), str(user_id))
+
+    def typing_users(self, conversation_id):
+        return sorted(self.coalescer.get(str(conversation_id)))
+
+    def _emit(self, conversation_id, diff):
+        socket_backplane.emit('typing_update', {
+            'conversation_id': conversation_id,
+            'started': [user_id for user_id, typing in diff.items() if typing],
+            'stopped': [user_id for user_id, typing in diff.items() if not typing]
+        }, room=conversation_room(conversation_id))
+
+
+class PresenceService:
+    """Online/away/offline status with batched per-room diffs"""
+
+    def __init__(self, interval=2.0, ttl=90.0, offline_retention=600.0):
+        self.ttl = ttl
+        self.offline_retention = offline_retention
+        self.coalescer = EventCoalescer('presence', self._emit, interval)
+        self._sids = {}         # user_id -> {sid}
+        self._users = {}        # sid -> user_id
+        self._rooms = {}        # user_id -> {conversation_id}
+        self._status = {}       # user_id -> status chosen by the client (online/away)
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Apply PRESENCE_* settings from a Flask config"""
+        self.coalescer.interval = config.get('PRESENCE_FLUSH_INTERVAL', self.coalescer.interval)
+        self.ttl = config.get('PRESENCE_TTL', self.ttl)
+        self.offline_retention = config.get('PRESENCE_OFFLINE_RETENTION', self.offline_retention)
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def connected(self, user_id, sid):
+        user_id = str(user_id)
+        with self._lock:
+            self._sids.setdefault(user_id, set()).add(sid)
+            self._users[sid] = user_id
+            self._status.setdefault(user_id, ONLINE)
+        self._publish(user_id)
+
+    def disconnected(self, sid):
+        """Forget a socket; the user goes offline when their last socket closes"""
+        with self._lock:
+            user_id = self._users.pop(sid, None)
+            if user_id is None:
+                return None
+            sids = self._sids.get(user_id, set())
+            sids.discard(sid)
+            if sids:
+                return user_id
+            self._sids.pop(user_id, None)
+            self._status.pop(user_id, None)
+        self._publish(user_id)
+        with self._lock:
+            self._rooms.pop(user_id, None)
+        return user_id
+
+    def user_for_sid(self, sid):
+        return self._users.get(sid)
+
+    def watch(self, user_id, conversation_id):
+        """Share the user's presence with a conversation room; returns the room's current presence"""
+        user_id, conversation_id = str(user_id), str(conversation_id)
+        with self._lock:
+            self._rooms.setdefault(user_id, set()).add(conversation_id)
+        self._publish(user_id, [conversation_id])
+        return self.coalescer.get(conversation_id)
+
+    def unwatch(self, user_id, conversation_id):
+        with self._lock:
+            self._rooms.get(str(user_id), set()).discard(str(conversation_id))
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    def set_status(self, user_id, status):
+        """Client-chosen status (online or away) for a connected user"""
+        if status not in (ONLINE, AWAY):
+            raise ValueError(f"Invalid presence status: {status}")
+        user_id = str(user_id)
+        with self._lock:
+            if user_id not in self._sids:
+                return
+            self._status[user_id] = status
+        self._publish(user_id)
+
+    def heartbeat(self, user_id):
+        """Keep a connected user's presence from expiring; unchanged status emits nothing"""
+        self._publish(str(user_id))
+
+    def status(self, user_id):
+        with self._lock:
+            return self._status.get(str(user_id), OFFLINE)
+
+    def _publish(self, user_id, rooms=None):
+        with self._lock:
+            status = self._status.get(user_id, OFFLINE)
+            rooms = list(rooms if rooms is not None else self._rooms.get(user_id, ()))
+
+        now = datetime.utcnow().isoformat()
+        if status == OFFLINE:
+            value = {'status': OFFLINE, 'last_seen': now}
+            for room in rooms:
+                # Kept long enough to reach the room, then forgotten
+                self.coalescer.set(room, user_id, value, ttl=self.offline_retention)
+            return
+
+        # last_seen stays out of live values so heartbeats do not produce diffs
+        value = {'status': status, 'last_seen': None}
+        for room in rooms:
+            self.coalescer.set(room, user_id, value, ttl=self.ttl,
+                               expired_value={'status': OFFLINE, 'last_seen': now},
+                               expired_ttl=self.offline_retention)
+
+    def _emit(self, conversation_id, diff):
+        # None marks an offline entry being forgotten; clients already saw it go offline
+        changes = {user_id: value for user_id, value in diff.items() if value is not None}
+        if changes:
+            socket_backplane.emit('presence_update', {
+                'conversation_id': conversation_id,
+                'changes': changes
+            }, room=conversation_room(conversation_id))
+
+
+typing_service = TypingService()
+presence_service = PresenceService()
@@ -0,0 +1,140 @@
+"""
+Reaction Service
+Normalized message reactions with maintained per-message counts.
+
+Each reaction is a MessageReaction row unique on (message, user, emoji), so
+concurrent reactions never overwrite each other and repeating one is a
+no-op. The per-(message, emoji) totals in MessageReactionCount move with
+the reaction in the same transaction through a single atomic statement:
+
+    add     INSERT reaction ON CONFLICT DO NOTHING, then (only if inserted)
+            INSERT count = 1 ON CONFLICT DO UPDATE count = count + 1
+    remove  DELETE reaction, then (only if deleted) UPDATE count = count - 1
+
+A page of messages gets its aggregates in two queries (counts, and the
+viewer's own reactions), and clients are sent deltas rather than the whole
+reaction state:
+
+    {'message_id', 'conversation_id', 'emoji', 'user_id', 'action': 'added'|'removed', 'count'}
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, update
+
+from models import db, MessageReaction, MessageReactionCount
+from models.message import dialect_insert, next_change_seq
+
+logger = logging.getLogger(__name__)
+
+MAX_EMOJI_LENGTH = 32
+
+
+class ReactionService:
+    """Add and remove reactions and load their aggregates in bulk"""
+
+    def _validate(self, emoji):
+        emoji = (emoji or '').strip()
+        if not emoji or len(emoji) > MAX_EMOJI_LENGTH:
+            raise ValueError(f"emoji must be 1-{MAX_EMOJI_LENGTH} characters")
+        return emoji
+
+    def _delta(self, message, user_id, emoji, action, count):
+        return {
+            'message_id': message.id,
+            'conversation_id': message.conversation_id,
+            'emoji': emoji,
+            'user_id': user_id,
+            'action': action,
+            'count': count
+        }
+
+    def add(self, message, user_id, emoji):
+        """Add the user's reaction; returns the delta, or None if it already existed
+
+        Flushes but does not commit; the caller owns the transaction.
+        """
+        emoji = self._validate(emoji)
+        now = datetime.utcnow()
+        inserted = db.session.execute(
+            dialect_insert(MessageReaction.__table__)
+            .values(message_id=message.id, user_id=user_id, emoji=emoji)
+            .on_conflict_do_nothing(index_elements=['message_id', 'user_id', 'emoji'])
+        ).rowcount
+        if not inserted:
+            return None
+
+        counts = MessageReactionCount.__table__
+        change_seq = next_change_seq(db.engine.dialect.name)
+        count = db.session.execute(
+            dialect_insert(counts)
+            .values(message_id=message.id, conversation_id=message.conversation_id, emoji=emoji,
+                    count=1, change_seq=change_seq)
+            .on_conflict_do_update(
+                index_elements=['message_id', 'emoji'],
+                set_={'count': counts.c.count + 1, 'updated_at': now, 'change_seq': change_seq}
+            )
+            .returning(counts.c.count)
+        ).scalar()
+        return self._delta(message, user_id, emoji, 'added', count)
+
+    def remove(self, message, user_id, emoji):
+        """Remove the user's reaction; returns the delta, or None if there was none
+
+        Flushes but does not commit; the caller owns the transaction.
+        """
+        emoji = self._validate(emoji)
+        reactions = MessageReaction.__table__
+        deleted = db.session.execute(
+            delete(reactions).where(
+                reactions.c.message_id == message.id,
+                reactions.c.user_id == user_id,
+                reactions.c.emoji == emoji
+            )
+        ).rowcount
+        if not deleted:
+            return None
+
+        counts = MessageReactionCount.__table__
+        count = db.session.execute(
+            update(counts)
+            .where(counts.c.message_id == message.id, counts.c.emoji == emoji)
+            .values(count=counts.c.count - 1, updated_at=datetime.utcnow(),
+                    change_seq=next_change_seq(db.engine.dialect.name))
+            .returning(counts.c.count)
+        ).scalar()
+        return self._delta(message, user_id, emoji, 'removed', count or 0)
+
+    def reacted(self, message_ids, user_id):
+        """{(message_id, emoji)} the user has reacted with among message_ids"""
+        if not message_ids or user_id is None:
+            return set()
+        return set(db.session.query(MessageReaction.message_id, MessageReaction.emoji).filter(
+            MessageReaction.message_id.in_(message_ids),
+            MessageReaction.user_id == user_id
+        ).all())
+
+    def aggregates(self, message_ids, viewer_id=None):
+        """{message_id: [{'emoji', 'count', 'reacted'}]} for a page of messages, most used first"""
+        if not message_ids:
+            return {}
+        rows = db.session.query(
+            MessageReactionCount.message_id, MessageReactionCount.emoji, MessageReactionCount.count
+        ).filter(
+            MessageReactionCount.message_id.in_(message_ids),
+            MessageReactionCount.count > 0
+        ).order_by(MessageReactionCount.count.desc(), MessageReactionCount.emoji).all()
+        mine = self.reacted(message_ids, viewer_id)
+
+        results = {}
+        for message_id, emoji, count in rows:
+            results.setdefault(message_id, []).append({
+                'emoji': emoji,
+                'count': count,
+                'reacted': (message_id, emoji) in mine
+            })
+        return results
+
+
+reaction_service = ReactionService()
@@ -0,0 +1,483 @@
+"""
+Search Alerts Service
+Percolates newly created matches, jobs and pages against saved search filters.
+
+Instead of re-running every saved filter on every write, each alert-enabled
+SearchFilter is indexed (search_filter_terms) under its most discriminating
+term for the kind of content it watches: a location word, then skill level,
+match/job type, page type, a query word, the months of a bounded date range,
+or ``any`` as a last resort. A new row derives its own terms, fetches only
+the filters indexed under one of them and verifies each candidate against
+the full criteria.
+
+Rows are captured by mapper events and percolated after their transaction
+commits, in batches, by a background worker. Alerts are written as one bulk
+INSERT into notifications per batch and pushed to the receivers' Socket.IO
+rooms.
+"""
+
+import logging
+import threading
+import uuid
+from collections import Counter, defaultdict, deque
+from datetime import date, datetime
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session, object_session
+
+from models import (
+    db, Match, Job, ProfilePage, SearchFilter, SearchFilterTerm,
+    Notification, SearchType, NotificationType, NotificationStatus
+)
+from services.fuzzy_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'search_alert_documents'
+
+# Saved-search type -> (content kind, implied page_type)
+FILTER_KINDS = {
+    SearchType.MATCH: ('match', None),
+    SearchType.JOB: ('job', None),
+    SearchType.PAGE: ('page', None),
+    SearchType.ACADEMY: ('page', 'Academy'),
+    SearchType.VENUE: ('page', 'Pitch'),
+    SearchType.COMMUNITY: ('page', 'Community'),
+}
+
+KIND_LABELS = {'match': 'match', 'job': 'job', 'page': 'page'}
+
+# Exact-match criteria, in order of preference as the index term
+EXACT_FIELDS = ('skill_level', 'match_type', 'job_type', 'page_type')
+
+# A bounded date range spanning more months than this is not worth indexing
+MAX_DATE_TERMS = 6
+
+
+# ----------------------------------------------------------------------
+# Documents and criteria
+# ----------------------------------------------------------------------
+
+def _join(*values):
+    return ' '.join(str(value) for value in values if value)
+
+
+def match_document(match):
+    return {
+        'kind': 'match',
+        'id': match.id,
+        'owner_id': match.creator_id,
+        'title': match.title,
+        'text': _join(match.title, match.description),
+        'location': _join(match.location, match.venue),
+        'match_type': match.match_type,
+        'skill_level': match.skill_level,
+        'date': _parse_date(match.match_date),
+        'entry_fee': match.entry_fee,
+        'equipment_provided': match.equipment_provided,
+    }
+
+
+def job_document(job):
+    return {
+        'kind': 'job',
+        'id': job.job_id,
+        'owner_id': job.user_id,
+        'title': job.title,
+        'text': _join(job.title, job.description, job.skills_required),
+        'location': job.location,
+        'job_type': job.job_type,
+    }
+
+
+def page_document(page):
+    return {
+        'kind': 'page',
+        'id': page.page_id,
+        'owner_id': page.user_id,
+        'title': page.academy_name,
+        'text': _join(page.academy_name, page.tagline, page.description),
+        'location': _join(page.city, page.state, page.address),
+        'page_type': page.page_type,
+    }
+
+
+DOCUMENT_BUILDERS = {Match: match_document, Job: job_document, ProfilePage: page_document}
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value)).date()
+    except ValueError:
+        return None
+
+
+def _lower(value):
+    return str(value).strip().casefold() if value not in (None, '') else None
+
+
+def filter_criteria(search_filter):
+    """Normalized criteria of a saved filter, or None if it watches nothing alertable"""
+    kind, page_type = FILTER_KINDS.get(search_filter.search_type, (None, None))
+    if kind is None:
+        return None
+
+    filters = search_filter.filters or {}
+    return {
+        'kind': kind,
+        'location': _lower(filters.get('location')),
+        'skill_level': _lower(filters.get('skill_level')),
+        'match_type': _lower(filters.get('match_type')),
+        'job_type': _lower(filters.get('job_type')),
+        'page_type': _lower(page_type or filters.get('page_type')),
+        'query': tokenize(filters.get('query') or filters.get('q')),
+        'date_from': _parse_date(filters.get('date_from')),
+        'date_to': _parse_date(filters.get('date_to')),
+        'entry_fee_max': filters.get('entry_fee_max'),
+        'equipment_provided': filters.get('equipment_provided'),
+    }
+
+
+def _months(date_from, date_to):
+    months = []
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        months.append(f'month:{year:04d}-{month:02d}')
+        if len(months) > MAX_DATE_TERMS:
+            return None
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def filter_terms(criteria):
+    """Index terms for a filter: its single most discriminating criterion"""
+    location_tokens = tokenize(criteria['location'])
+    if location_tokens:
+        return [f'location:{max(location_tokens, key=len)}']
+    for field in EXACT_FIELDS:
+        if criteria[field]:
+            return [f'{field}:{criteria[field]}']
+    if criteria['query']:
+        return [f"word:{max(criteria['query'], key=len)}"]
+    if criteria['date_from'] and criteria['date_to']:
+        months = _months(criteria['date_from'], criteria['date_to'])
+        if months:
+            return months
+    return ['any']
+
+
+def document_terms(document):
+    """Every term a filter watching this document could be indexed under"""
+    terms = {'any'}
+    terms.update(f'location:{token}' for token in tokenize(document.get('location')))
+    terms.update(f'word:{token}' for token in tokenize(document.get('text')))
+    for field in EXACT_FIELDS:
+        value = _lower(document.get(field))
+        if value:
+            terms.add(f'{field}:{value}')
+    if document.get('date'):
+        terms.add(f"month:{document['date']:%Y-%m}")
+    return terms
+
+
+def matches(criteria, document):
+    """Full check of a candidate filter against a document"""
+    if criteria['location'] and criteria['location'] not in (document.get('location') or '').casefold():
+        return False
+    for field in EXACT_FIELDS:
+        if criteria[field] and criteria[field] != _lower(document.get(field)):
+            return False
+    if criteria['query']:
+        words = set(tokenize(document.get('text')))
+        if not all(token in words for token in criteria['query']):
+            return False
+    if criteria['date_from'] or criteria['date_to']:
+        document_date = document.get('date')
+        if document_date is None:
+            return False
+        if criteria['date_from'] and document_date < criteria['date_from']:
+            return False
+        if criteria['date_to'] and document_date > criteria['date_to']:
+            return False
+    if criteria['entry_fee_max'] is not None:
+        fee = document.get('entry_fee')
+        if fee is None or fee > float(criteria['entry_fee_max']):
+            return False
+    if criteria['equipment_provided'] is not None:
+        if bool(document.get('equipment_provided')) != bool(criteria['equipment_provided']):
+            return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+
+class SearchAlertService:
+    """Reverse-indexed saved-search alerts"""
+
+    def __init__(self, batch_size=200, flush_interval=2.0, term_chunk_size=500):
+        self.enabled = True
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.term_chunk_size = term_chunk_size
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def configure(self, config):
+        """Apply SEARCH_ALERT_* settings from a Flask config"""
+        self.enabled = config.get('SEARCH_ALERTS_ENABLED', self.enabled)
+        self.batch_size = config.get('SEARCH_ALERT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = config.get('SEARCH_ALERT_FLUSH_INTERVAL', self.flush_interval)
+
+    # ------------------------------------------------------------------
+    # Filter index
+    # ------------------------------------------------------------------
+
+    def _index_rows(self, search_filter):
+        if not search_filter.is_saved or search_filter.alerts_enabled is False:
+            return []
+        criteria = filter_criteria(search_filter)
+        if criteria is None:
+            return []
+        return [
+            {'filter_id': search_filter.id, 'kind': criteria['kind'], 'term': term}
+            for term in filter_terms(criteria)
+        ]
+
+    def _reindex_filter(self, mapper, connection, target):
+        table = SearchFilterTerm.__table__
+        connection.execute(table.delete().where(table.c.filter_id == target.id))
+        rows = self._index_rows(target)
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    def _unindex_filter(self, mapper, connection, target):
+        table = SearchFilterTerm.__table__
+        connection.execute(table.delete().where(table.c.filter_id == target.id))
+
+    def rebuild_index(self):
+        """Re-derive search_filter_terms for every saved filter"""
+        SearchFilterTerm.query.delete()
+        rows = []
+        for search_filter in SearchFilter.query.filter(SearchFilter.is_saved == True).all():
+            rows.extend(self._index_rows(search_filter))
+        for start in range(0, len(rows), 1000):
+            db.session.execute(insert(SearchFilterTerm.__table__), rows[start:start + 1000])
+        db.session.commit()
+        return len({row['filter_id'] for row in rows})
+
+    # ------------------------------------------------------------------
+    # Capture
+    # ------------------------------------------------------------------
+
+    def _capture(self, mapper, connection, target):
+        if not self.enabled:
+            return
+        session = object_session(target)
+        if session is None:
+            return
+        try:
+            document = DOCUMENT_BUILDERS[mapper.class_](target)
+        except Exception as e:
+            logger.warning(f"Search alert capture skipped {mapper.class_.__name__}: {e}")
+            return
+        session.info.setdefault(_PENDING_KEY, []).append(document)
+
+    def _after_commit(self, session):
+        documents = session.info.pop(_PENDING_KEY, None)
+        if documents:
+            self.enqueue(documents)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def register(self):
+        """Install the mapper and session hooks"""
+        for model in DOCUMENT_BUILDERS:
+            event.listen(model, 'after_insert', self._capture)
+        event.listen(SearchFilter, 'after_insert', self._reindex_filter)
+        event.listen(SearchFilter, 'after_update', self._reindex_filter)
+        event.listen(SearchFilter, 'after_delete', self._unindex_filter)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    # ------------------------------------------------------------------
+    # Batching
+    # ------------------------------------------------------------------
+
+    def enqueue(self, documents):
+        with self._lock:
+            self._queue.extend(documents)
+        self._ensure_worker()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        from flask import current_app, has_app_context
+
+        if self._worker is not None and self._worker.is_alive():
+            return
+        if not has_app_context():
+            # Scripts without an app context drain the queue with flush()
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    with app.app_context():
+                        self.flush()
+                except Exception as e:
+                    logger.error(f"Search alert worker error: {e}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=run, name='search-alerts', daemon=True)
+                self._worker.start()
+
+    def _take(self):
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Percolate everything queued so far; returns the number of alerts sent"""
+        sent = 0
+        while True:
+            documents = self._take()
+            if not documents:
+                return sent
+            try:
+                sent += self.process(documents)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Search alert batch of {len(documents)} failed: {e}")
+            finally:
+                db.session.remove()
+
+    # ------------------------------------------------------------------
+    # Percolation
+    # ------------------------------------------------------------------
+
+    def _candidate_terms(self, kind, terms):
+        """{term: {filter_id}} for the index entries matching any of terms"""
+        by_term = defaultdict(set)
+        terms = list(terms)
+        for start in range(0, len(terms), self.term_chunk_size):
+            rows = db.session.query(SearchFilterTerm.filter_id, SearchFilterTerm.term).filter(
+                SearchFilterTerm.kind == kind,
+                SearchFilterTerm.term.in_(terms[start:start + self.term_chunk_size])
+            ).all()
+            for filter_id, term in rows:
+                by_term[term].add(filter_id)
+        return by_term
+
+    def percolate(self, documents):
+        """[(SearchFilter, document)] for every saved filter a document satisfies"""
+        by_kind = defaultdict(list)
+        for document in documents:
+            by_kind[document['kind']].append((document, document_terms(document)))
+
+        hits = []
+        for kind, entries in by_kind.items():
+            by_term = self._candidate_terms(kind, set().union(*(terms for _, terms in entries)))
+            candidate_ids = set().union(*by_term.values()) if by_term else set()
+            if not candidate_ids:
+                continue
+
+            filters = SearchFilter.query.filter(
+                SearchFilter.id.in_(candidate_ids),
+                SearchFilter.is_saved == True,
+                SearchFilter.alerts_enabled != False
+            ).all()
+            criteria = {f.id: (f, filter_criteria(f)) for f in filters}
+
+            for document, terms in entries:
+                filter_ids = set()
+                for term in terms:
+                    filter_ids |= by_term.get(term, set())
+                for filter_id in filter_ids:
+                    search_filter, filter_criterion = criteria.get(filter_id, (None, None))
+                    if search_filter is None or filter_criterion is None:
+                        continue
+                    if search_filter.user_id == document['owner_id']:
+                        continue
+                    if matches(filter_criterion, document):
+                        hits.append((search_filter, document))
+        return hits
+
+    def process(self, documents):
+        hits = self.percolate(documents)
+        if not hits:
+            return 0
+        return self._notify(hits)
+
+    def _notify(self, hits):
+        """Write one notification per hit in bulk and push them over Socket.IO"""
+        from services.notification_counter import notification_counter
+        from services.preference_cache import preference_cache
+
+        receiver_ids = {search_filter.user_id for search_filter, _ in hits}
+        preferences = preference_cache.get_many(receiver_ids)
+
+        now = datetime.utcnow()
+        rows = []
+        for search_filter, document in hits:
+            notification_type = NotificationType.MATCH if document['kind'] == 'match' else NotificationType.SYSTEM
+            if not preferences[search_filter.user_id].allows(notification_type, 'in_app'):
+                continue
+            rows.append({
+                'id': uuid.uuid4(),
+                'sender_id': document['owner_id'],
+                'receiver_id': search_filter.user_id,
+                'type': notification_type,
+                'title': f"New {KIND_LABELS[document['kind']]} for \"{search_filter.filter_name}\"",
+                'content': document['title'] or '',
+                'is_read': False,
+                'status': NotificationStatus.SENT,
+                'sent_at': now,
+                'related_match_id': document['id'] if document['kind'] == 'match' else None,
+                'created_at': now,
+                'updated_at': now,
+            })
+
+        if not rows:
+            return 0
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(insert(Notification.__table__), rows[start:start + self.batch_size])
+        notification_counter.increment(Counter(row['receiver_id'] for row in rows))
+        db.session.commit()
+
+        self._emit(rows)
+        logger.info(f"Sent {len(rows)} search alerts to {len(receiver_ids)} users")
+        return len(rows)
+
+    def _emit(self, rows):
+        from services.socket_backplane import socket_backplane
+
+        for row in rows:
+            try:
+                socket_backplane.emit('new_notification', {'notification': {
+                    'id': str(row['id']),
+                    'type': row['type'].value,
+                    'title': row['title'],
+                    'content': row['content'],
+                    'is_read': False,
+                    'related_match_id': str(row['related_match_id']) if row['related_match_id'] else None,
+                    'created_at': row['created_at'].isoformat(),
+                }}, room=f"user_{row['receiver_id']}")
+            except Exception as e:
+                logger.error(f"Failed to push search alert: {e}")
+
+
+search_alert_service = SearchAlertService()
+search_alert_service.register()
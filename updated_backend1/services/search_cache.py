@@ -0,0 +1,218 @@
+"""
+Search Result Cache
+In-process TTL + LRU cache for search results, keyed by normalized query,
+category, filters and page.
+
+Every entry records the write generation of the tables it was built from.
+Inserts, updates and deletes on those tables are collected by SQLAlchemy
+mapper events and bump the generation once the session commits (a rolled
+back write bumps nothing), so stale entries are dropped on the next read
+instead of waiting for the TTL. The cache is per process; with several
+workers the TTL bounds how long another worker's write can go unnoticed.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# session.info key collecting the tables written in the current transaction
+_PENDING_KEY = 'search_cache_invalidations'
+
+
+def normalize_query(query):
+    """Case-fold and collapse whitespace so equivalent queries share an entry"""
+    return ' '.join((query or '').casefold().split())
+
+
+def _freeze(value):
+    """Turn filter values into a hashable, order-independent form"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted((_freeze(v) for v in value), key=repr))
+    if hasattr(value, 'value'):  # Enum members
+        return value.value
+    return value
+
+
+class SearchCache:
+    """Normalized query-result cache with generation-based invalidation"""
+
+    def __init__(self, max_entries=2048, ttl_seconds=60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0}
+
+    def configure(self, config):
+        """Apply SEARCH_CACHE_* settings from a Flask config"""
+        self.ttl_seconds = config.get('SEARCH_CACHE_TTL', self.ttl_seconds)
+        self.max_entries = config.get('SEARCH_CACHE_MAX_ENTRIES', self.max_entries)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def watch(self, model):
+        """Bump the model's table generation whenever a written row is committed"""
+        table = model.__tablename__
+        if table in self._watched:
+            return
+        if not self._watched:
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+        self._watched.add(table)
+
+        def _capture(mapper, connection, target):
+            session = object_session(target)
+            if session is not None:
+                session.info.setdefault(_PENDING_KEY, set()).add(table)
+
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, _capture)
+
+    def _after_commit(self, session):
+        tables = session.info.pop(_PENDING_KEY, None)
+        if tables:
+            self.invalidate(*tables)
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def invalidate(self, *tables):
+        """Mark cached results built from these tables as stale"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def _snapshot(self, tables):
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def make_key(self, namespace, query, category=None, filters=None, page=1, per_page=None):
+        return (namespace, normalize_query(query), category, _freeze(filters or {}), page, per_page)
+
+    def get(self, key, tables=()):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return _MISSING
+
+            value, expires_at, generations = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return _MISSING
+            if generations != self._snapshot(tables):
+                del self._entries[key]
+                self._stats['stale'] += 1
+                self._stats['misses'] += 1
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, tables=(), generations=None, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if generations is None:
+                generations = self._snapshot(tables)
+            self._entries[key] = (value, time.monotonic() + ttl, generations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_compute(self, key, compute, tables=(), ttl_seconds=None):
+        """Return the cached value for key, computing and storing it on a miss
+
+        Cached values are shared between requests and must be treated as
+        read-only by callers.
+        """
+        value = self.get(key, tables)
+        if value is not _MISSING:
+            return value
+
+        # Snapshot before computing so a concurrent write marks the result stale
+        with self._lock:
+            generations = self._snapshot(tables)
+        value = compute()
+        self.set(key, value, tables, generations=generations, ttl_seconds=ttl_seconds)
+        return value
+
+    def cached(self, namespace, tables):
+        """Decorator for search helpers with a (query, page, per_page) signature
+
+        The wrapped helper receives the normalized query. A helper that
+        raises gets an empty result list for this call only: failures are
+        never stored, so they are not served as "no results" for the TTL.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(query, page=1, per_page=5):
+                normalized = normalize_query(query)
+                key = self.make_key(namespace, normalized, page=page, per_page=per_page)
+                try:
+                    return self.get_or_compute(
+                        key, lambda: func(normalized, page, per_page), tables
+                    )
+                except Exception as e:
+                    logger.warning(f"{namespace} failed; result not cached: {e.__class__.__name__}")
+                    return []
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+def _register_models(cache):
+    from models import User, UserProfile, Match, Post, ProfilePage, Job
+
+    for model in (User, UserProfile, Match, Post, ProfilePage, Job):
+        cache.watch(model)
+
+
+search_cache = SearchCache()
+_register_models(search_cache)
@@ -4,15 +4,19 @@ Handles full-text search, geolocation search, and search analytics
 """
 
 import time
+import heapq
+import itertools
 import logging
 from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy import or_, and_, func, text
+from sqlalchemy import or_, and_, func, text, case, literal, literal_column
 from sqlalchemy.orm import joinedload
 from models import (
     db, User, UserProfile, Match, Post, 
     SearchResult, SearchTrend, SearchSuggestion, SearchFilter, SearchAnalytics,
-    SearchType, MatchType, MatchStatus
+    SearchType, MatchStatus
 )
+from services.search_cache import search_cache, normalize_query
+from services.fuzzy_search import fuzzy_search_service
 from datetime import datetime, timedelta
 import math
 
@@ -49,26 +53,16 @@ class SearchService:
                 filters_applied=filters or {}
             )
             
-            results = []
-            total_count = 0
-            
-            if search_type == SearchType.USER or search_type == SearchType.GLOBAL:
-                user_results = self._search_users(query, filters, page, per_page)
-                results.extend(user_results.get('users', []))
-                total_count += user_results.get('total', 0)
-            
-            if search_type == SearchType.MATCH or search_type == SearchType.GLOBAL:
-                match_results = self._search_matches(query, filters, page, per_page)
-                results.extend(match_results.get('matches', []))
-                total_count += match_results.get('total', 0)
-            
-            if search_type == SearchType.POST or search_type == SearchType.GLOBAL:
-                post_results = self._search_posts(query, filters, page, per_page)
-                results.extend(post_results.get('posts', []))
-                total_count += post_results.get('total', 0)
-            
-            # Sort results by relevance score
-            results = self._rank_results(results, query)
+            cache_key = search_cache.make_key(
+                'service.full_text', query, category=search_type, filters=filters,
+                page=page, per_page=per_page
+            )
+            results, total_count = search_cache.get_or_compute(
+                cache_key,
+                lambda: self._compute_full_text_results(normalize_query(query), search_type,
+                                                        filters, page, per_page),
+                tables=('users', 'user_profiles', 'matches', 'posts')
+            )
             
             # Update search result
             search_duration = (time.time() - start_time) * 1000
@@ -92,21 +86,113 @@ class SearchService:
             logger.error(f"Full text search error: {str(e)}")
             raise e
     
-    def _search_users(self, query: str, filters: Dict[str, Any] = None, 
-                     page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Search users with advanced filtering"""
-        user_query = User.query.join(UserProfile)
-        
-        # Build search conditions
-        search_conditions = or_(
-            User.username.ilike(f'%{query}%'),
-            UserProfile.full_name.ilike(f'%{query}%'),
-            UserProfile.location.ilike(f'%{query}%'),
-            UserProfile.organization.ilike(f'%{query}%'),
-            UserProfile.bio.ilike(f'%{query}%')
+    def _compute_full_text_results(self, query: str, search_type: SearchType,
+                                   filters: Dict[str, Any], page: int,
+                                   per_page: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Run the per-type ranked searches (cached by full_text_search)
+
+        Each type is ranked globally in SQL. A single type is paged with
+        OFFSET/LIMIT; GLOBAL k-way merges the top page * per_page rows of
+        each ranked stream and slices the requested page out of the merge.
+        """
+        streams = []
+        if search_type in (SearchType.USER, SearchType.GLOBAL):
+            streams.append((self._ranked_users(query, filters), self._serialize_user))
+        if search_type in (SearchType.MATCH, SearchType.GLOBAL):
+            streams.append((self._ranked_matches(query, filters), self._serialize_match))
+        if search_type in (SearchType.POST, SearchType.GLOBAL):
+            streams.append((self._ranked_posts(query, filters), self._serialize_post))
+
+        total_count = sum(ranked.order_by(None).count() for ranked, _ in streams)
+        offset = (page - 1) * per_page
+
+        if len(streams) == 1:
+            ranked, serialize = streams[0]
+            rows = ranked.offset(offset).limit(per_page).all()
+            return [serialize(item, score) for item, score in rows], total_count
+
+        def tagged(ranked, serialize):
+            for item, score in ranked.limit(offset + per_page).all():
+                yield float(score or 0.0), item, serialize
+
+        merged = heapq.merge(
+            *(tagged(ranked, serialize) for ranked, serialize in streams),
+            key=lambda row: -row[0]
+        )
+        page_rows = itertools.islice(merged, offset, offset + per_page)
+        return [serialize(item, score) for score, item, serialize in page_rows], total_count
+    
+    # ------------------------------------------------------------------
+    # SQL relevance scoring
+    # ------------------------------------------------------------------
+    
+    # search_weights thresholds for the tsvector weight classes
+    WEIGHT_CLASSES = (('A', 2.5), ('B', 1.5), ('C', 1.0), ('D', 0.0))
+    
+    def _is_postgres(self) -> bool:
+        return db.engine.dialect.name == 'postgresql'
+    
+    def _weight_class(self, field: str) -> str:
+        weight = self.search_weights.get(field, 1.0)
+        for letter, floor in self.WEIGHT_CLASSES:
+            if weight >= floor:
+                return letter
+        return 'D'
+    
+    def _ts_rank_weights(self):
+        """ts_rank weight array {D,C,B,A} derived from search_weights"""
+        top = max(self.search_weights.values())
+        class_weights = {letter: 0.0 for letter, _ in self.WEIGHT_CLASSES}
+        for field, weight in self.search_weights.items():
+            letter = self._weight_class(field)
+            class_weights[letter] = max(class_weights[letter], weight / top)
+        values = ','.join(f"{class_weights[letter]:.4f}" for letter in ('D', 'C', 'B', 'A'))
+        return literal_column(f"'{{{values}}}'::float4[]")
+    
+    def _relevance(self, query: str, fields: List[Tuple[Any, str]],
+                   name_fields: List[Tuple[Any, str]]):
+        """Build (match_condition, relevance_expression) for weighted columns
+
+        ``fields`` are (column, search_weights key) pairs. On PostgreSQL the
+        score is ts_rank over a setweight A-D tsvector plus pg_trgm similarity
+        on ``name_fields``; elsewhere it is a CASE sum of the weights of the
+        columns containing the query. ``name_fields`` also match fuzzily.
+        """
+        pattern = f'%{query}%'
+        condition = fuzzy_search_service.match(
+            [column for column, _ in name_fields], query,
+            or_(*[column.ilike(pattern) for column, _ in fields])
         )
         
-        user_query = user_query.filter(search_conditions)
+        if self._is_postgres():
+            vector = None
+            for column, field in fields:
+                weighted = func.setweight(
+                    func.to_tsvector('english', func.coalesce(column, '')),
+                    self._weight_class(field)
+                )
+                vector = weighted if vector is None else vector.op('||')(weighted)
+            ts_query = func.plainto_tsquery('english', query)
+            relevance = func.ts_rank(self._ts_rank_weights(), vector, ts_query) * max(self.search_weights.values())
+            for column, field in name_fields:
+                relevance = relevance + func.similarity(func.coalesce(column, ''), query) * self.search_weights.get(field, 1.0)
+            return or_(condition, vector.op('@@')(ts_query)), relevance
+        
+        relevance = literal(0.0)
+        for column, field in fields:
+            relevance = relevance + case((column.ilike(pattern), self.search_weights.get(field, 1.0)), else_=0.0)
+        return condition, relevance
+    
+    def _ranked_users(self, query: str, filters: Dict[str, Any] = None):
+        """Users matching query as (User, relevance_score), best first"""
+        condition, relevance = self._relevance(
+            query,
+            [(User.username, 'username'), (UserProfile.full_name, 'full_name'),
+             (UserProfile.location, 'location'), (UserProfile.organization, 'organization'),
+             (UserProfile.bio, 'description')],
+            [(User.username, 'username'), (UserProfile.full_name, 'full_name')]
+        )
+        user_query = User.query.join(UserProfile).filter(condition)
         
         # Apply filters
         if filters:
@@ -122,50 +208,26 @@ class SearchService:
             if 'organization' in filters:
                 user_query = user_query.filter(UserProfile.organization.ilike(f'%{filters["organization"]}%'))
         
-        # Paginate
-        pagination = user_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        users = []
-        for user in pagination.items:
-            user_dict = {
-                'id': user.id,
-                'username': user.username,
-                'profile': user.profile.to_dict() if user.profile else None,
-                'is_verified': user.is_verified,
-                'relevance_score': self._calculate_relevance_score(user, query)
-            }
-            users.append(user_dict)
-        
-        return {
-            'users': users,
-            'total': pagination.total,
-            'page': pagination.page,
-            'pages': pagination.pages
-        }
+        return user_query.add_columns(relevance.label('relevance_score')) \
+            .order_by(relevance.desc(), User.id.asc())
     
-    def _search_matches(self, query: str, filters: Dict[str, Any] = None, 
-                       page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Search matches with advanced filtering"""
-        match_query = Match.query
-        
-        # Build search conditions
-        search_conditions = or_(
-            Match.title.ilike(f'%{query}%'),
-            Match.description.ilike(f'%{query}%'),
-            Match.location.ilike(f'%{query}%'),
-            Match.venue.ilike(f'%{query}%'),
-            Match.rules.ilike(f'%{query}%')
+    def _ranked_matches(self, query: str, filters: Dict[str, Any] = None):
+        """Matches matching query as (Match, relevance_score), best first"""
+        condition, relevance = self._relevance(
+            query,
+            [(Match.title, 'title'), (Match.description, 'description'),
+             (Match.location, 'location'), (Match.venue, 'venue')],
+            [(Match.title, 'title')]
         )
-        
-        match_query = match_query.filter(search_conditions)
+        match_query = Match.query.filter(or_(condition, Match.rules.ilike(f'%{query}%')))
         
         # Apply filters
         if filters:
             if 'match_type' in filters:
-                match_query = match_query.filter(Match.match_type == MatchType(filters['match_type']))
+                match_query = match_query.filter(Match.match_type == filters['match_type'])
             
             if 'skill_level' in filters:
-                match_query = match_query.filter(Match.skill_level == MatchSkillLevel(filters['skill_level']))
+                match_query = match_query.filter(Match.skill_level == filters['skill_level'])
             
             if 'status' in filters:
                 match_query = match_query.filter(Match.status == MatchStatus(filters['status']))
@@ -185,36 +247,17 @@ class SearchService:
             if 'equipment_provided' in filters:
                 match_query = match_query.filter(Match.equipment_provided == filters['equipment_provided'])
         
-        # Paginate
-        pagination = match_query.order_by(Match.match_date.asc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        matches = []
-        for match in pagination.items:
-            match_dict = match.to_dict()
-            match_dict['relevance_score'] = self._calculate_relevance_score(match, query)
-            matches.append(match_dict)
-        
-        return {
-            'matches': matches,
-            'total': pagination.total,
-            'page': pagination.page,
-            'pages': pagination.pages
-        }
+        return match_query.add_columns(relevance.label('relevance_score')) \
+            .order_by(relevance.desc(), Match.match_date.asc(), Match.id.asc())
     
-    def _search_posts(self, query: str, filters: Dict[str, Any] = None, 
-                     page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Search posts with advanced filtering"""
-        post_query = Post.query
-        
-        # Build search conditions
-        search_conditions = or_(
-            Post.content.ilike(f'%{query}%'),
-            Post.title.ilike(f'%{query}%')
+    def _ranked_posts(self, query: str, filters: Dict[str, Any] = None):
+        """Posts matching query as (Post, relevance_score), best first"""
+        condition, relevance = self._relevance(
+            query,
+            [(Post.title, 'title'), (Post.content, 'content')],
+            [(Post.title, 'title')]
         )
-        
-        post_query = post_query.filter(search_conditions)
+        post_query = Post.query.filter(condition)
         
         # Apply filters
         if filters:
@@ -230,96 +273,92 @@ class SearchService:
             if 'date_to' in filters:
                 post_query = post_query.filter(Post.created_at <= filters['date_to'])
         
-        # Paginate
-        pagination = post_query.order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        posts = []
-        for post in pagination.items:
-            post_dict = post.to_dict()
-            post_dict['relevance_score'] = self._calculate_relevance_score(post, query)
-            posts.append(post_dict)
-        
+        return post_query.add_columns(relevance.label('relevance_score')) \
+            .order_by(relevance.desc(), Post.created_at.desc(), Post.id.asc())
+    
+    def _serialize_user(self, user, score) -> Dict[str, Any]:
         return {
-            'posts': posts,
-            'total': pagination.total,
-            'page': pagination.page,
-            'pages': pagination.pages
+            'id': user.id,
+            'username': user.username,
+            'profile': user.profile.to_dict() if user.profile else None,
+            'is_verified': user.is_verified,
+            'result_type': SearchType.USER.value,
+            'relevance_score': float(score or 0.0)
         }
     
-    def _calculate_relevance_score(self, item, query: str) -> float:
-        """Calculate relevance score for search results"""
-        score = 0.0
-        query_lower = query.lower()
-        
-        if hasattr(item, 'title'):
-            if query_lower in item.title.lower():
-                score += self.search_weights.get('title', 1.0)
-        
-        if hasattr(item, 'username'):
-            if query_lower in item.username.lower():
-                score += self.search_weights.get('username', 1.0)
-        
-        if hasattr(item, 'full_name') and item.full_name:
-            if query_lower in item.full_name.lower():
-                score += self.search_weights.get('full_name', 1.0)
-        
-        if hasattr(item, 'content'):
-            if query_lower in item.content.lower():
-                score += self.search_weights.get('content', 1.0)
-        
-        if hasattr(item, 'description') and item.description:
-            if query_lower in item.description.lower():
-                score += self.search_weights.get('description', 1.0)
-        
-        if hasattr(item, 'location') and item.location:
-            if query_lower in item.location.lower():
-                score += self.search_weights.get('location', 1.0)
-        
-        if hasattr(item, 'venue') and item.venue:
-            if query_lower in item.venue.lower():
-                score += self.search_weights.get('venue', 1.0)
-        
-        if hasattr(item, 'organization') and item.organization:
-            if query_lower in item.organization.lower():
-                score += self.search_weights.get('organization', 1.0)
-        
-        return score
+    def _serialize_match(self, match, score) -> Dict[str, Any]:
+        match_dict = match.to_dict()
+        match_dict['result_type'] = SearchType.MATCH.value
+        match_dict['relevance_score'] = float(score or 0.0)
+        return match_dict
     
-    def _rank_results(self, results: List[Dict], query: str) -> List[Dict]:
-        """Rank search results by relevance score"""
-        return sorted(results, key=lambda x: x.get('relevance_score', 0), reverse=True)
+    def _serialize_post(self, post, score) -> Dict[str, Any]:
+        post_dict = post.to_dict()
+        post_dict['result_type'] = SearchType.POST.value
+        post_dict['relevance_score'] = float(score or 0.0)
+        return post_dict
     
+    # Page types reachable through geolocation search
+    GEO_PAGE_TYPES = {
+        SearchType.PAGE: None,
+        SearchType.ACADEMY: 'Academy',
+        SearchType.VENUE: 'Pitch',
+        SearchType.COMMUNITY: 'Community'
+    }
+
     def geolocation_search(self, latitude: float, longitude: float, 
                           radius_km: float = 50, search_type: SearchType = SearchType.MATCH,
-                          filters: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Search by geolocation (simplified implementation)"""
+                          filters: Dict[str, Any] = None, cursor: Optional[str] = None,
+                          limit: int = 20) -> Dict[str, Any]:
+        """Search by geolocation, nearest first with cursor paging"""
+        from services.geo_search import geo_search_service
+
         try:
-            # This is a simplified implementation
-            # In production, you'd use PostGIS or similar for accurate geolocation search
-            
+            filters = filters or {}
+
             if search_type == SearchType.MATCH:
-                matches = Match.query.filter(
-                    Match.status == MatchStatus.UPCOMING
-                ).all()
-                
-                # Filter by location (simplified)
-                nearby_matches = []
-                for match in matches:
-                    if match.location and any(keyword in match.location.lower() 
-                                            for keyword in ['mumbai', 'delhi', 'bangalore', 'chennai']):
-                        nearby_matches.append(match.to_dict())
-                
-                return {
-                    'results': nearby_matches,
-                    'total': len(nearby_matches),
-                    'location': {'latitude': latitude, 'longitude': longitude},
-                    'radius_km': radius_km
-                }
-            
-            return {'results': [], 'total': 0}
-            
+                model = Match
+                query = Match.query.filter(
+                    Match.status == MatchStatus(filters.get('status', MatchStatus.UPCOMING.value))
+                )
+                if filters.get('match_type'):
+                    query = query.filter(Match.match_type == filters['match_type'])
+                if filters.get('skill_level'):
+                    query = query.filter(Match.skill_level == filters['skill_level'])
+            elif search_type in self.GEO_PAGE_TYPES:
+                from models import ProfilePage
+
+                model = ProfilePage
+                query = ProfilePage.query.filter(
+                    ProfilePage.deleted_at.is_(None),
+                    ProfilePage.is_public == True
+                )
+                page_type = self.GEO_PAGE_TYPES[search_type] or filters.get('page_type')
+                if page_type:
+                    query = query.filter(ProfilePage.page_type == page_type)
+            else:
+                return {'results': [], 'total': 0, 'next_cursor': None, 'has_more': False}
+
+            rows, next_cursor = geo_search_service.nearby(
+                model, query, latitude, longitude, radius_km,
+                limit=limit, cursor=cursor
+            )
+
+            results = []
+            for instance, distance in rows:
+                item = instance.to_dict()
+                item['distance_km'] = round(distance, 3)
+                results.append(item)
+
+            return {
+                'results': results,
+                'total': len(results),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'location': {'latitude': latitude, 'longitude': longitude},
+                'radius_km': radius_km
+            }
+
         except Exception as e:
             logger.error(f"Geolocation search error: {str(e)}")
             raise e
@@ -463,8 +502,8 @@ class SearchService:
     
     def save_search_filter(self, user_id: int, filter_name: str, 
                           search_type: SearchType, filters: Dict[str, Any],
-                          is_public: bool = False) -> SearchFilter:
-        """Save a search filter for later use"""
+                          is_public: bool = False, alerts_enabled: bool = True) -> SearchFilter:
+        """Save a search filter for later use (and alerting, see services/search_alerts.py)"""
         try:
             search_filter = SearchFilter(
                 user_id=user_id,
@@ -472,7 +511,8 @@ class SearchService:
                 search_type=search_type,
                 filters=filters,
                 is_saved=True,
-                is_public=is_public
+                is_public=is_public,
+                alerts_enabled=alerts_enabled
             )
             search_filter.save()
             return search_filter
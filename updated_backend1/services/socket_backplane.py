@@ -0,0 +1,158 @@
+"""
+Socket.IO Backplane
+Message-queue configuration so room emits reach clients on every worker.
+
+Without a message queue, ``socketio.emit(..., room=...)`` only reaches
+clients connected to the emitting process. With SOCKETIO_MESSAGE_QUEUE set,
+every server publishes emits to the queue and every server delivers them to
+its own clients, so any web worker, or any background job holding a
+write-only emitter, can reach any room.
+
+Supported SOCKETIO_MESSAGE_QUEUE values:
+    redis://host:6379/0   Redis pub/sub (production)
+    kafka://, zmq+tcp://  the other python-socketio managers
+    amqp://...            anything else is handed to kombu
+    local://              in-process broker; lets several SocketIO servers in
+                          one process (tests, benchmarks) share rooms
+    (unset)               no backplane, single-worker behaviour
+"""
+
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'flask-socketio'
+
+
+class LocalBroker:
+    """In-process pub/sub standing in for Redis"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers[channel].append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers[channel]:
+                self._subscribers[channel].remove(subscriber)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers[channel])
+        for subscriber in subscribers:
+            subscriber.put(message)
+        return len(subscribers)
+
+
+local_broker = LocalBroker()
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """python-socketio client manager backed by a LocalBroker"""
+
+    name = 'local'
+
+    def __init__(self, channel=DEFAULT_CHANNEL, write_only=False, logger=None, json=None, broker=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.broker = broker or local_broker
+        self._subscription = None if write_only else self.broker.subscribe(channel)
+
+    def _publish(self, data):
+        # JSON-encode like RedisManager so payloads that would fail on Redis fail here too
+        self.broker.publish(self.channel, self.json.dumps(data))
+
+    def _listen(self):
+        while True:
+            yield self._subscription.get()
+
+
+def create_manager(url, channel=DEFAULT_CHANNEL, write_only=False, json=None):
+    """python-socketio client manager for a message queue URL
+
+    Server-side managers take the server's JSON module when attached; pass
+    ``json`` for write-only managers that never are.
+    """
+    if not url:
+        return None
+    options = {'channel': channel, 'write_only': write_only, 'json': json}
+    if url.startswith('local://'):
+        return LocalPubSubManager(**options)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return socketio.RedisManager(url, **options)
+    if url.startswith('kafka://'):
+        return socketio.KafkaManager(url, **options)
+    if url.startswith('zmq'):
+        return socketio.ZmqManager(url, **options)
+    return socketio.KombuManager(url, **options)
+
+
+def server_options(config):
+    """Keyword arguments for SocketIO.init_app from SOCKETIO_* settings"""
+    from flask import json
+
+    # flask.json handles the UUIDs and datetimes our payloads carry
+    options = {'json': json}
+    async_mode = config.get('SOCKETIO_ASYNC_MODE')
+    if async_mode:
+        options['async_mode'] = async_mode
+
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    manager = create_manager(url, config.get('SOCKETIO_CHANNEL') or DEFAULT_CHANNEL)
+    if manager is not None:
+        options['client_manager'] = manager
+        logger.info(f"Socket.IO backplane: {url.split('@')[-1]}")
+    return options
+
+
+class SocketBackplane:
+    """Emit to Socket.IO rooms from web workers and background jobs alike"""
+
+    def __init__(self):
+        self.url = None
+        self.channel = DEFAULT_CHANNEL
+        self._emitter = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Apply SOCKETIO_* settings from a Flask config"""
+        self.url = config.get('SOCKETIO_MESSAGE_QUEUE')
+        self.channel = config.get('SOCKETIO_CHANNEL') or DEFAULT_CHANNEL
+        self._emitter = None
+
+    def _write_only_emitter(self):
+        if self._emitter is None and self.url:
+            with self._lock:
+                if self._emitter is None:
+                    # flask.json handles the UUIDs and datetimes our payloads carry
+                    from flask import json
+                    self._emitter = create_manager(self.url, self.channel, write_only=True, json=json)
+        return self._emitter
+
+    def emit(self, event, data, room=None, namespace='/', skip_sid=None):
+        """Emit through this process's server if it runs one, else straight to the queue"""
+        from socketio_server import socketio as server
+
+        if server.server is not None:
+            server.emit(event, data, room=room, namespace=namespace, skip_sid=skip_sid)
+            return True
+
+        emitter = self._write_only_emitter()
+        if emitter is None:
+            logger.warning(f"Dropped '{event}' emit: no Socket.IO server or message queue in this process")
+            return False
+        emitter.emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid)
+        return True
+
+
+socket_backplane = SocketBackplane()
@@ -0,0 +1,186 @@
+"""
+Socket Sessions
+Per-connection identity and conversation access cache for Socket.IO handlers.
+
+The JWT is verified once, when the socket connects. The verified user id,
+the token's expiry and the ids of every conversation the user belongs to
+(one query) are kept against the socket's sid, so later events skip both
+JWT verification and participant lookups.
+
+Invalidation:
+    token expiry       events after ``exp`` are rejected and the socket is
+                       disconnected; the client reconnects with a fresh token
+    membership change  ConversationParticipant / Conversation writes in this
+                       process drop the affected users' cached sets
+    other workers      cached sets are reloaded after SOCKET_ACL_TTL seconds;
+                       a conversation missing from the set is always checked
+                       against the database, so new memberships apply at once
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+from sqlalchemy import event, inspect
+
+logger = logging.getLogger(__name__)
+
+
+class SocketSessionExpired(Exception):
+    """Raised when an event arrives after the connection's token expired"""
+    pass
+
+
+def _coerce_user_id(identity):
+    """JWT identities arrive as strings; user ids are UUID columns"""
+    try:
+        return uuid.UUID(str(identity))
+    except ValueError:
+        return identity
+
+
+@dataclass
+class SocketSession:
+    sid: str
+    user_id: object
+    expires_at: Optional[float] = None
+    conversations: Optional[Set[str]] = None
+    loaded_at: float = 0.0
+    connected_at: float = field(default_factory=time.time)
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+
+class SocketSessionStore:
+    """Verified identity and conversation ACL per Socket.IO connection"""
+
+    def __init__(self, acl_ttl=60.0):
+        self.acl_ttl = acl_ttl
+        self._sessions = {}     # sid -> SocketSession
+        self._by_user = {}      # user_id -> {sid}
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def configure(self, config):
+        """Apply SOCKET_ACL_* settings from a Flask config"""
+        self.acl_ttl = config.get('SOCKET_ACL_TTL', self.acl_ttl)
+
+    # ------------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------------
+
+    def open(self, sid, user_id, expires_at=None):
+        """Record a verified connection and load its conversation ACL"""
+        session = SocketSession(sid=sid, user_id=_coerce_user_id(user_id), expires_at=expires_at)
+        self._load(session)
+        with self._lock:
+            self._sessions[sid] = session
+            self._by_user.setdefault(str(session.user_id), set()).add(sid)
+        return session
+
+    def close(self, sid):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+            if session is not None:
+                sids = self._by_user.get(str(session.user_id), set())
+                sids.discard(sid)
+                if not sids:
+                    self._by_user.pop(str(session.user_id), None)
+        return session
+
+    def get(self, sid):
+        """The live session for sid; raises SocketSessionExpired past token expiry"""
+        session = self._sessions.get(sid)
+        if session is not None and session.expired:
+            self.close(sid)
+            raise SocketSessionExpired('Session token expired')
+        return session
+
+    # ------------------------------------------------------------------
+    # Conversation ACL
+    # ------------------------------------------------------------------
+
+    def _load(self, session):
+        from models import db, Conversation
+        from services.inbox_service import inbox_service
+
+        rows = db.session.query(Conversation.id).filter(inbox_service.membership(session.user_id)).all()
+        session.conversations = {str(conversation_id) for conversation_id, in rows}
+        session.loaded_at = time.monotonic()
+
+    def _is_member(self, user_id, conversation_id):
+        from models import db, Conversation
+        from services.inbox_service import inbox_service
+
+        return db.session.query(Conversation.id).filter(
+            Conversation.id == conversation_id,
+            inbox_service.membership(user_id)
+        ).first() is not None
+
+    def can_access(self, session, conversation_id):
+        """Whether the session's user belongs to the conversation, from cache when possible"""
+        if session.conversations is None or time.monotonic() - session.loaded_at > self.acl_ttl:
+            self._load(session)
+
+        key = str(conversation_id)
+        if key in session.conversations:
+            return True
+        # Memberships created since the set was loaded (possibly on another worker)
+        if self._is_member(session.user_id, conversation_id):
+            session.conversations.add(key)
+            return True
+        return False
+
+    def invalidate_users(self, user_ids):
+        """Drop cached conversation sets so they reload on next use"""
+        with self._lock:
+            for user_id in user_ids:
+                for sid in self._by_user.get(str(user_id), ()):
+                    self._sessions[sid].conversations = None
+
+    def invalidate_conversation(self, conversation_id):
+        """Drop the conversation from every cached set, forcing a database check"""
+        key = str(conversation_id)
+        with self._lock:
+            for session in self._sessions.values():
+                if session.conversations is not None:
+                    session.conversations.discard(key)
+
+    # ------------------------------------------------------------------
+    # Membership hooks
+    # ------------------------------------------------------------------
+
+    def _participant_changed(self, mapper, connection, target):
+        self.invalidate_users([target.user_id])
+        self.invalidate_conversation(target.conversation_id)
+
+    def _conversation_changed(self, mapper, connection, target):
+        self.invalidate_users([target.user1_id, target.user2_id])
+        self.invalidate_conversation(target.id)
+
+    def _conversation_updated(self, mapper, connection, target):
+        # Every new message updates the conversation row; only the members matter here
+        state = inspect(target)
+        if any(state.attrs[name].history.has_changes() for name in ('user1_id', 'user2_id')):
+            self._conversation_changed(mapper, connection, target)
+
+    def register(self):
+        """Invalidate cached ACLs when conversation membership changes in this process"""
+        if self._registered:
+            return
+        from models import Conversation, ConversationParticipant
+
+        for hook in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(ConversationParticipant, hook, self._participant_changed)
+        event.listen(Conversation, 'after_insert', self._conversation_changed)
+        event.listen(Conversation, 'after_update', self._conversation_updated)
+        event.listen(Conversation, 'after_delete', self._conversation_changed)
+        self._registered = True
+
+
+socket_sessions = SocketSessionStore()
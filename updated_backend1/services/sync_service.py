@@ -0,0 +1,173 @@
+"""
+Sync Service
+Delta sync for messaging clients coming back online.
+
+Conversations, messages, read states and reaction counts carry a change_seq
+drawn from one monotonically increasing sequence and stamped on every insert
+and update. A client keeps the opaque token returned by the last sync and
+asks for everything after it:
+
+    GET /api/messaging/sync?since=<token>
+
+Each kind of row is read from its (conversation_id, change_seq) index with
+``change_seq > since``, so a reconnect costs what changed rather than the
+size of the inbox. Without a token the client gets its full state, paged.
+Reaction counts are kept at zero rather than deleted, so removals sync too.
+
+Sequence values are taken before their transaction commits, so a slow
+transaction can become visible after a later one. The returned token
+therefore never moves past rows changed within SYNC_SAFETY_LAG seconds;
+those rows are sent again on the next sync and clients apply every change
+as an idempotent upsert keyed by id.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from models import db, Conversation, ConversationReadState, Message, MessageReactionCount
+from services.inbox_service import inbox_service
+from services.message_history import message_history_service
+from services.reaction_service import reaction_service
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def sync_token(seq):
+    return encode_cursor({'seq': seq})
+
+
+def _token_seq(token):
+    if not token:
+        return 0
+    payload = decode_cursor(token)
+    try:
+        return int(payload['seq'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursorError('Invalid sync token') from e
+
+
+class SyncService:
+    """Changes to a user's conversations since a sync token"""
+
+    DEFAULT_LIMIT = 200
+    MAX_LIMIT = 500
+
+    def __init__(self, safety_lag=5.0):
+        self.safety_lag = safety_lag
+
+    def configure(self, config):
+        """Apply SYNC_* settings from a Flask config"""
+        self.safety_lag = config.get('SYNC_SAFETY_LAG', self.safety_lag)
+
+    def _member_conversations(self, user_id):
+        return db.session.query(Conversation.id).filter(inbox_service.membership(user_id))
+
+    def _changed(self, model, query, since, limit):
+        return query.filter(model.change_seq > since).order_by(model.change_seq.asc()).limit(limit + 1).all()
+
+    def sync(self, user_id, since=None, limit=None):
+        """Changes after the token, oldest first; raises InvalidCursorError for bad tokens"""
+        limit = max(1, min(limit or self.DEFAULT_LIMIT, self.MAX_LIMIT))
+        since_seq = _token_seq(since)
+        member_ids = self._member_conversations(user_id)
+
+        # Each query returns its own first limit + 1 changes, so the first
+        # limit of the merged list are the first limit changes overall
+        changes = [
+            ('conversation', row) for row in self._changed(
+                Conversation, Conversation.query.filter(inbox_service.membership(user_id)), since_seq, limit)
+        ] + [
+            ('message', row) for row in self._changed(
+                Message, Message.query.filter(Message.conversation_id.in_(member_ids)), since_seq, limit)
+        ] + [
+            ('read_state', row) for row in self._changed(
+                ConversationReadState,
+                ConversationReadState.query.filter(ConversationReadState.conversation_id.in_(member_ids)),
+                since_seq, limit)
+        ] + [
+            ('reaction', row) for row in self._changed(
+                MessageReactionCount,
+                MessageReactionCount.query.filter(MessageReactionCount.conversation_id.in_(member_ids)),
+                since_seq, limit)
+        ]
+        changes.sort(key=lambda change: change[1].change_seq)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Advance only over changes old enough that no earlier sequence value can still commit
+        settled_before = datetime.utcnow() - timedelta(seconds=self.safety_lag)
+        next_seq = since_seq
+        settled = True
+        for _, row in changes:
+            if row.updated_at is None or row.updated_at > settled_before:
+                settled = False
+                break
+            next_seq = row.change_seq
+
+        grouped = {'conversation': [], 'message': [], 'read_state': [], 'reaction': []}
+        for kind, row in changes:
+            grouped[kind].append(row)
+
+        return {
+            'conversations': [self._conversation(conversation) for conversation in grouped['conversation']],
+            'messages': self._messages(grouped['message'], user_id),
+            'read_states': [self._read_state(state, user_id) for state in grouped['read_state']],
+            'reactions': self._reactions(grouped['reaction'], user_id),
+            'next_token': sync_token(next_seq),
+            # A page cut short by unsettled changes is fetched again on the next sync
+            'has_more': has_more and settled,
+            'limit': limit
+        }
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+
+    def _conversation(self, conversation):
+        return {
+            'id': conversation.id,
+            'user1_id': conversation.user1_id,
+            'user2_id': conversation.user2_id,
+            'last_message_at': conversation.last_message_at.isoformat() if conversation.last_message_at else None,
+            'last_message_content': conversation.last_message_content,
+            'last_message_sender_id': conversation.last_message_sender_id,
+            'created_at': conversation.created_at.isoformat() if conversation.created_at else None,
+            'updated_at': conversation.updated_at.isoformat() if conversation.updated_at else None
+        }
+
+    def _messages(self, messages, user_id):
+        by_conversation = {}
+        for message in messages:
+            by_conversation.setdefault(message.conversation_id, []).append(message)
+        results = []
+        for conversation_id, batch in by_conversation.items():
+            results.extend(message_history_service.serialize(batch, conversation_id, user_id))
+        return results
+
+    def _reactions(self, counts, user_id):
+        mine = reaction_service.reacted({count.message_id for count in counts}, user_id)
+        return [{
+            'message_id': count.message_id,
+            'conversation_id': count.conversation_id,
+            'emoji': count.emoji,
+            # Zero means the last reaction with this emoji was removed
+            'count': count.count,
+            'reacted': (count.message_id, count.emoji) in mine
+        } for count in counts]
+
+    def _read_state(self, state, user_id):
+        data = {
+            'conversation_id': state.conversation_id,
+            'user_id': state.user_id,
+            'last_read_message_id': state.last_read_message_id,
+            'read_up_to': state.last_read_message_at.isoformat() if state.last_read_message_at else None
+        }
+        # Other participants' counters are private; their watermarks drive receipts
+        if state.user_id == user_id:
+            data['unread_count'] = state.unread_count
+            data['last_read_at'] = state.last_read_at.isoformat() if state.last_read_at else None
+        return data
+
+
+sync_service = SyncService()
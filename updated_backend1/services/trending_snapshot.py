@@ -0,0 +1,380 @@
+"""
+Trending Snapshot Service
+Builds the discovery-tab trending lists with set-based aggregate queries and
+stores them as a versioned snapshot that /api/search/trending serves as-is.
+
+A snapshot older than ``max_age_seconds`` is rebuilt in a background thread
+while the previous version keeps being served; refresh_trending_snapshot.py
+rebuilds it from cron.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
+
+from models import (
+    db, User, UserProfile, Match, MatchParticipant, Post, ProfilePage,
+    PageFollower, Job, TrendingSnapshot
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _truncate(text, length):
+    text = text or ''
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _initials(name, fallback='??'):
+    return (name or fallback)[:2].upper()
+
+
+def _page_location(page):
+    return f"{page.city}, {page.state}" if page.city else page.address
+
+
+class TrendingSnapshotService:
+    """Builds and serves versioned trending snapshots"""
+
+    CATEGORIES = (
+        'users', 'matches', 'posts', 'locations', 'academies',
+        'jobs', 'coaches', 'communities', 'venues'
+    )
+
+    def __init__(self, max_age_seconds=300, top_n=50, keep_versions=5, check_interval=15):
+        self.max_age_seconds = max_age_seconds
+        self.top_n = top_n
+        self.keep_versions = keep_versions
+        self.check_interval = check_interval
+        self._current = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def configure(self, config):
+        """Apply TRENDING_SNAPSHOT_* settings from a Flask config"""
+        self.max_age_seconds = config.get('TRENDING_SNAPSHOT_MAX_AGE', self.max_age_seconds)
+        self.top_n = config.get('TRENDING_SNAPSHOT_TOP_N', self.top_n)
+
+    # ------------------------------------------------------------------
+    # Aggregate queries
+    # ------------------------------------------------------------------
+
+    def _post_counts(self):
+        return db.session.query(
+            Post.user_id.label('user_id'),
+            func.count(Post.id).label('post_count')
+        ).group_by(Post.user_id).subquery()
+
+    def _people(self, organization_filter=None):
+        """(User, UserProfile, post_count) rows, most active first"""
+        post_counts = self._post_counts()
+        post_count = func.coalesce(post_counts.c.post_count, 0)
+
+        query = db.session.query(User, UserProfile, post_count.label('post_count')) \
+            .join(UserProfile, UserProfile.user_id == User.id) \
+            .outerjoin(post_counts, post_counts.c.user_id == User.id) \
+            .filter(User.is_active == True)
+        if organization_filter is not None:
+            query = query.filter(organization_filter)
+
+        return query.order_by(desc(post_count), desc(User.created_at)).limit(self.top_n).all()
+
+    def _build_users(self):
+        return [{
+            'id': str(user.id),
+            'name': profile.full_name or user.username,
+            'initials': _initials(profile.full_name or user.username),
+            'followers': f"{post_count} posts",
+            'count': post_count,
+            'type': 'Player',
+            'verified': user.is_verified,
+            'gradient': 'from-blue-500 to-purple-600',
+            'category': 'user',
+            'description': profile.organization or 'Cricket Player',
+            'location': profile.location,
+            'isConnected': False
+        } for user, profile, post_count in self._people()]
+
+    def _build_coaches(self):
+        organization = UserProfile.organization
+        rows = self._people(
+            organization.ilike('%coach%') | organization.ilike('%trainer%') | organization.ilike('%instructor%')
+        )
+        return [{
+            'id': str(user.id),
+            'name': profile.full_name or user.username,
+            'initials': 'CH',
+            'followers': f"{post_count} posts",
+            'count': post_count,
+            'type': 'Coach',
+            'verified': user.is_verified,
+            'gradient': 'from-yellow-500 to-orange-600',
+            'category': 'coach',
+            'description': f"Cricket coach at {profile.organization or 'Independent'}",
+            'location': profile.location,
+            'isConnected': False
+        } for user, profile, post_count in rows]
+
+    def _build_matches(self):
+        joined_counts = db.session.query(
+            MatchParticipant.match_id.label('match_id'),
+            func.count(MatchParticipant.id).label('joined')
+        ).group_by(MatchParticipant.match_id).subquery()
+        joined = func.coalesce(joined_counts.c.joined, 0)
+
+        rows = db.session.query(Match, joined.label('joined')) \
+            .outerjoin(joined_counts, joined_counts.c.match_id == Match.id) \
+            .order_by(desc(joined), desc(Match.created_at)) \
+            .limit(self.top_n).all()
+
+        return [{
+            'id': str(match.id),
+            'name': match.title,
+            'initials': _initials(match.title),
+            'followers': f"{max((match.players_needed or 0) - joined, 0)} players needed",
+            'count': joined,
+            'type': match.match_type or 'Match',
+            'verified': True,
+            'gradient': 'from-green-500 to-teal-600',
+            'category': 'match',
+            'description': match.description,
+            'location': match.location,
+            'isJoined': False
+        } for match, joined in rows]
+
+    def _build_posts(self):
+        posts = Post.query.order_by(desc(Post.likes_count), desc(Post.created_at)).limit(self.top_n).all()
+        return [{
+            'id': str(post.id),
+            'name': _truncate(post.content, 50),
+            'initials': 'PO',
+            'followers': f"{post.likes_count or 0} likes",
+            'count': post.likes_count or 0,
+            'type': 'Post',
+            'verified': True,
+            'gradient': 'from-orange-500 to-red-600',
+            'category': 'post',
+            'description': post.content,
+            'location': None,
+            'isConnected': False
+        } for post in posts]
+
+    def _build_locations(self):
+        match_count = func.count(Match.id)
+        rows = db.session.query(Match.location, match_count.label('count')) \
+            .filter(Match.location.isnot(None), Match.location != '') \
+            .group_by(Match.location) \
+            .order_by(desc(match_count), Match.location) \
+            .limit(self.top_n).all()
+
+        return [{
+            'id': f"loc_{location.casefold().replace(' ', '_')}",
+            'name': location,
+            'initials': _initials(location),
+            'followers': f"{count} matches",
+            'count': count,
+            'type': 'Location',
+            'verified': True,
+            'gradient': 'from-green-500 to-teal-600',
+            'category': 'location',
+            'description': f"Popular cricket location with {count} matches",
+            'location': location,
+            'isJoined': False
+        } for location, count in rows]
+
+    def _pages(self, page_type, *order_by):
+        return ProfilePage.query.filter(
+            ProfilePage.page_type == page_type,
+            ProfilePage.deleted_at.is_(None),
+            ProfilePage.is_public == True
+        ).order_by(*order_by).limit(self.top_n).all()
+
+    def _build_academies(self):
+        academies = self._pages('Academy', desc(ProfilePage.total_students), desc(ProfilePage.created_at))
+        return [{
+            'id': str(academy.page_id),
+            'name': academy.academy_name,
+            'initials': _initials(academy.academy_name),
+            'followers': f"{academy.total_students or 0} students",
+            'count': academy.total_students or 0,
+            'type': 'Academy',
+            'verified': academy.is_verified,
+            'gradient': 'from-orange-500 to-red-600',
+            'category': 'academy',
+            'description': academy.description or academy.tagline,
+            'location': _page_location(academy),
+            'isJoined': False
+        } for academy in academies]
+
+    def _build_venues(self):
+        venues = self._pages('Pitch', desc(ProfilePage.capacity), desc(ProfilePage.created_at))
+        return [{
+            'id': str(venue.page_id),
+            'name': venue.academy_name,
+            'initials': _initials(venue.academy_name),
+            'followers': f"{venue.capacity or 0} capacity",
+            'count': venue.capacity or 0,
+            'type': 'Venue',
+            'verified': venue.is_verified,
+            'gradient': 'from-green-500 to-emerald-600',
+            'category': 'venue',
+            'description': venue.description or venue.tagline,
+            'location': _page_location(venue),
+            'isJoined': False
+        } for venue in venues]
+
+    def _build_communities(self):
+        member_counts = db.session.query(
+            PageFollower.page_id.label('page_id'),
+            func.count(PageFollower.id).label('members')
+        ).filter(PageFollower.status == 'active').group_by(PageFollower.page_id).subquery()
+        members = func.coalesce(member_counts.c.members, 0)
+
+        rows = db.session.query(ProfilePage, members.label('members')) \
+            .outerjoin(member_counts, member_counts.c.page_id == ProfilePage.page_id) \
+            .filter(
+                ProfilePage.page_type == 'Community',
+                ProfilePage.deleted_at.is_(None),
+                ProfilePage.is_public == True
+            ) \
+            .order_by(desc(members), desc(ProfilePage.created_at)) \
+            .limit(self.top_n).all()
+
+        return [{
+            'id': str(community.page_id),
+            'name': community.academy_name,
+            'initials': _initials(community.academy_name),
+            'followers': f"{count} members",
+            'count': count,
+            'type': 'Community',
+            'verified': community.is_verified,
+            'gradient': 'from-teal-500 to-green-600',
+            'category': 'community',
+            'description': community.description or community.tagline,
+            'location': _page_location(community),
+            'isJoined': False
+        } for community, count in rows]
+
+    def _build_jobs(self):
+        jobs = Job.query.filter(Job.is_active == True) \
+            .order_by(desc(Job.applications_count), desc(Job.created_at)) \
+            .limit(self.top_n).all()
+        return [{
+            'id': str(job.job_id),
+            'name': job.title,
+            'initials': _initials(job.title),
+            'followers': f"{job.applications_count or 0} applications",
+            'count': job.applications_count or 0,
+            'type': 'Job',
+            'verified': job.is_featured,
+            'gradient': 'from-purple-500 to-indigo-600',
+            'category': 'job',
+            'description': _truncate(job.description, 100),
+            'location': job.location,
+            'isApplied': False
+        } for job in jobs]
+
+    # ------------------------------------------------------------------
+    # Build / serve
+    # ------------------------------------------------------------------
+
+    def build(self):
+        """Compute every category and store it as a new snapshot version"""
+        start_time = time.time()
+        payload = {}
+        for category in self.CATEGORIES:
+            try:
+                payload[category] = getattr(self, f'_build_{category}')()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Trending snapshot {category} error: {e}")
+                payload[category] = []
+
+        latest = TrendingSnapshot.get_latest_version() or 0
+        snapshot = TrendingSnapshot(
+            version=latest + 1,
+            built_at=datetime.utcnow(),
+            build_duration=(time.time() - start_time) * 1000,
+            payload=payload
+        )
+        try:
+            snapshot.save()
+        except IntegrityError:
+            # Another worker published this version first; serve theirs
+            db.session.rollback()
+            logger.info(f"Trending snapshot v{latest + 1} already built elsewhere")
+            return TrendingSnapshot.get_latest()
+
+        TrendingSnapshot.prune(keep=self.keep_versions)
+        logger.info(f"Built trending snapshot v{snapshot.version} in {snapshot.build_duration:.0f}ms")
+        return snapshot
+
+    def _remember(self, snapshot):
+        self._current = {
+            'version': snapshot.version,
+            'built_at': snapshot.built_at,
+            'payload': snapshot.payload
+        }
+        self._checked_at = time.monotonic()
+        return self._current
+
+    def _refresh_in_background(self, app):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with app.app_context():
+                    self._remember(self.build())
+            except Exception as e:
+                logger.error(f"Trending snapshot refresh error: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='trending-snapshot-refresh', daemon=True).start()
+
+    def get_snapshot(self):
+        """Return the current snapshot, building or refreshing it as needed"""
+        from flask import current_app
+
+        current = self._current
+        if current is None or time.monotonic() - self._checked_at >= self.check_interval:
+            # Pick up versions published by other workers or the cron script
+            latest_version = TrendingSnapshot.get_latest_version()
+            if latest_version is None:
+                current = self._remember(self.build())
+            elif current is None or latest_version != current['version']:
+                current = self._remember(TrendingSnapshot.get_latest())
+            else:
+                self._checked_at = time.monotonic()
+
+        age = (datetime.utcnow() - current['built_at']).total_seconds()
+        if age >= self.max_age_seconds:
+            self._refresh_in_background(current_app._get_current_object())
+
+        return current
+
+    def get_trending(self, categories, page=1, per_page=5):
+        """Slice the requested categories out of the current snapshot"""
+        snapshot = self.get_snapshot()
+        offset = (page - 1) * per_page
+
+        results = []
+        for category in categories:
+            results.extend(snapshot['payload'].get(category, [])[offset:offset + per_page])
+
+        return results, {
+            'version': snapshot['version'],
+            'built_at': snapshot['built_at'].isoformat(),
+            'age_seconds': round((datetime.utcnow() - snapshot['built_at']).total_seconds(), 1)
+        }
+
+
+trending_snapshot_service = TrendingSnapshotService()
@@ -2,56 +2,82 @@
 Socket.IO server for real-time messaging
 """
 
-from flask import Flask
+from flask import Flask, g, request
 from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
-from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
 from functools import wraps
 import logging
-from datetime import datetime
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from services.presence_service import presence_service, typing_service
+from services.socket_sessions import SocketSessionExpired, socket_sessions
+
 # Initialize Socket.IO
 socketio = SocketIO(cors_allowed_origins="*", logger=True, engineio_logger=True)
 
 def socket_jwt_required(f):
-    """Decorator for Socket.IO JWT authentication"""
+    """Decorator for Socket.IO JWT authentication
+    
+    The JWT is verified once per connection; later events reuse the verified
+    socket session (services/socket_sessions.py) until the token expires.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            verify_jwt_in_request()
-            return f(*args, **kwargs)
+            session = socket_sessions.get(request.sid)
+            if session is None:
+                verify_jwt_in_request()
+                session = socket_sessions.open(request.sid, get_jwt_identity(), get_jwt().get('exp'))
+        except SocketSessionExpired:
+            emit('error', {'message': 'Token expired, reconnect with a fresh token', 'code': 'token_expired'})
+            disconnect()
+            return False
         except Exception as e:
             logger.error(f"JWT verification failed: {str(e)}")
             emit('error', {'message': 'Authentication required'})
             disconnect()
             return False
+        g.socket_session = session
+        return f(*args, **kwargs)
     return decorated_function
 
+def current_socket_user():
+    """User id of the socket session verified by socket_jwt_required"""
+    return g.socket_session.user_id
+
+def can_access_conversation(conversation_id):
+    """Conversation membership from the socket session's cached ACL"""
+    return socket_sessions.can_access(g.socket_session, conversation_id)
+
 @socketio.on('connect')
 @socket_jwt_required
-def on_connect():
+def on_connect(auth=None):
     """Handle client connection"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     logger.info(f"User {user_id} connected")
     
     # Join user to their personal room for notifications
     join_room(f"user_{user_id}")
+    presence_service.connected(user_id, request.sid)
     emit('connected', {'message': 'Connected successfully', 'user_id': user_id})
 
 @socketio.on('disconnect')
 def on_disconnect():
     """Handle client disconnection"""
-    user_id = get_jwt_identity()
+    # The JWT is not re-sent on disconnect; the presence service knows whose socket this was
+    user_id = presence_service.disconnected(request.sid)
+    socket_sessions.close(request.sid)
     logger.info(f"User {user_id} disconnected")
 
 @socketio.on('join_conversation')
 @socket_jwt_required
 def on_join_conversation(data):
     """Join a conversation room"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     
     if not conversation_id:
@@ -59,10 +85,7 @@ def on_join_conversation(data):
         return
     
     # Verify user is participant in conversation
-    from models import Conversation
-    conversation = Conversation.query.get(conversation_id)
-    
-    if not conversation or not conversation.is_participant(user_id):
+    if not can_access_conversation(conversation_id):
         emit('error', {'message': 'Not authorized to join this conversation'})
         return
     
@@ -70,20 +93,26 @@ def on_join_conversation(data):
     join_room(f"conversation_{conversation_id}")
     logger.info(f"User {user_id} joined conversation {conversation_id}")
     
+    # The joiner gets the room's current presence and typing state once;
+    # after that only coalesced diffs
     emit('joined_conversation', {
         'conversation_id': conversation_id,
-        'message': 'Joined conversation successfully'
+        'message': 'Joined conversation successfully',
+        'presence': presence_service.watch(user_id, conversation_id),
+        'typing': typing_service.typing_users(conversation_id)
     })
 
 @socketio.on('leave_conversation')
 @socket_jwt_required
 def on_leave_conversation(data):
     """Leave a conversation room"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     
     if conversation_id:
         leave_room(f"conversation_{conversation_id}")
+        presence_service.unwatch(user_id, conversation_id)
+        typing_service.stop(conversation_id, user_id)
         logger.info(f"User {user_id} left conversation {conversation_id}")
         
         emit('left_conversation', {
@@ -95,10 +124,9 @@ def on_leave_conversation(data):
 @socket_jwt_required
 def on_send_message(data):
     """Handle sending a message"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     content = data.get('content')
-    message_type = data.get('message_type', 'text')
     reply_to_message_id = data.get('reply_to_message_id')
     
     if not conversation_id or not content:
@@ -106,37 +134,27 @@ def on_send_message(data):
         return
     
     try:
-        from models import Conversation, Message, MessageType
+        from services.message_dispatcher import message_dispatcher
         
         # Verify user is participant in conversation
-        conversation = Conversation.query.get(conversation_id)
-        if not conversation or not conversation.is_participant(user_id):
+        if not can_access_conversation(conversation_id):
             emit('error', {'message': 'Not authorized to send message to this conversation'})
             return
         
-        # Create message
-        message = Message.create_message(
-            conversation_id=conversation_id,
-            sender_id=user_id,
-            content=content,
-            message_type=MessageType(message_type) if message_type in [e.value for e in MessageType] else MessageType.TEXT,
-            reply_to_message_id=reply_to_message_id
+        # One transaction; broadcast, unread counters and notifications follow asynchronously
+        ack = message_dispatcher.send(
+            conversation_id,
+            user_id,
+            content,
+            reply_to_message_id=reply_to_message_id,
+            client_id=data.get('client_id')
         )
-        
-        # Broadcast message to all participants in the conversation
-        socketio.emit('new_message', {
-            'message': message.to_dict(),
-            'conversation_id': conversation_id
-        }, room=f"conversation_{conversation_id}")
+        typing_service.stop(conversation_id, user_id)
         
         # Send confirmation to sender
-        emit('message_sent', {
-            'message_id': message.id,
-            'conversation_id': conversation_id,
-            'status': 'sent'
-        })
+        emit('message_sent', ack)
         
-        logger.info(f"Message {message.id} sent by user {user_id} in conversation {conversation_id}")
+        logger.info(f"Message {ack['message_id']} sent by user {user_id} in conversation {conversation_id}")
         
     except Exception as e:
         logger.error(f"Error sending message: {str(e)}")
@@ -146,37 +164,45 @@ def on_send_message(data):
 @socket_jwt_required
 def on_typing_start(data):
     """Handle typing start event"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     
-    if conversation_id:
-        # Broadcast typing indicator to other participants
-        socketio.emit('user_typing', {
-            'user_id': user_id,
-            'conversation_id': conversation_id,
-            'is_typing': True
-        }, room=f"conversation_{conversation_id}", include_self=False)
+    if conversation_id and can_access_conversation(conversation_id):
+        # Coalesced: repeats only refresh the TTL, the room gets one typing_update per interval
+        typing_service.start(conversation_id, user_id)
 
 @socketio.on('typing_stop')
 @socket_jwt_required
 def on_typing_stop(data):
     """Handle typing stop event"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     
     if conversation_id:
-        # Broadcast typing stop to other participants
-        socketio.emit('user_typing', {
-            'user_id': user_id,
-            'conversation_id': conversation_id,
-            'is_typing': False
-        }, room=f"conversation_{conversation_id}", include_self=False)
+        typing_service.stop(conversation_id, user_id)
+
+@socketio.on('set_presence')
+@socket_jwt_required
+def on_set_presence(data):
+    """Set the user's presence to online or away"""
+    user_id = current_socket_user()
+    
+    try:
+        presence_service.set_status(user_id, data.get('status'))
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+
+@socketio.on('presence_heartbeat')
+@socket_jwt_required
+def on_presence_heartbeat(data=None):
+    """Keep the user's presence from expiring to offline"""
+    presence_service.heartbeat(current_socket_user())
 
 @socketio.on('mark_as_read')
 @socket_jwt_required
 def on_mark_as_read(data):
     """Handle marking messages as read"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     conversation_id = data.get('conversation_id')
     message_ids = data.get('message_ids', [])
     
@@ -185,167 +211,161 @@ def on_mark_as_read(data):
         return
     
     try:
-        from models import Message
+        from models import db
+        from services.inbox_service import inbox_service
+        
+        if not can_access_conversation(conversation_id):
+            emit('error', {'message': 'Not authorized to read this conversation'})
+            return
         
-        # Mark messages as read
-        messages = Message.query.filter(
-            Message.id.in_(message_ids),
-            Message.conversation_id == conversation_id,
-            Message.receiver_id == user_id
-        ).all()
+        # Read state is a watermark: reading the newest of the given messages
+        # (or the whole conversation when none are given) reads everything before it
+        up_to = data.get('message_id')
+        try:
+            # Ids arrive as strings; the columns are UUIDs
+            conversation_uuid = uuid.UUID(str(conversation_id))
+            read_ids = [uuid.UUID(str(message_id)) for message_id in ([up_to] if up_to else message_ids)]
+        except ValueError:
+            emit('error', {'message': 'Invalid conversation or message ID'})
+            return
+        latest = inbox_service.latest_message(conversation_uuid, read_ids)
+        if read_ids and latest is None:
+            emit('error', {'message': 'Message not found in this conversation'})
+            return
         
-        for message in messages:
-            message.mark_as_read(user_id)
+        receipt = inbox_service.mark_read(conversation_uuid, user_id, latest)
+        db.session.commit()
         
-        # Broadcast read receipt to other participants
-        socketio.emit('messages_read', {
-            'user_id': user_id,
-            'conversation_id': conversation_id,
-            'message_ids': message_ids,
-            'read_at': datetime.utcnow().isoformat()
-        }, room=f"conversation_{conversation_id}", include_self=False)
+        if receipt:
+            # Receivers only need the watermark to update every earlier message
+            socketio.emit('messages_read', receipt, room=f"conversation_{conversation_id}", include_self=False)
         
-        emit('messages_marked_read', {
+        emit('messages_marked_read', receipt or {
             'conversation_id': conversation_id,
-            'message_ids': message_ids
+            'user_id': user_id
         })
         
     except Exception as e:
         logger.error(f"Error marking messages as read: {str(e)}")
         emit('error', {'message': 'Failed to mark messages as read'})
 
-@socketio.on('add_reaction')
-@socket_jwt_required
-def on_add_reaction(data):
-    """Handle adding reaction to message"""
-    user_id = get_jwt_identity()
+def _react(data, action):
+    """Shared add/remove reaction handler; the room receives the delta only"""
+    user_id = current_socket_user()
     message_id = data.get('message_id')
     emoji = data.get('emoji')
+    past = 'added' if action == 'add' else 'removed'
     
     if not message_id or not emoji:
         emit('error', {'message': 'Message ID and emoji are required'})
         return
     
     try:
-        from models import Message
+        from models import db, Message
+        from services.reaction_service import reaction_service
         
-        message = Message.query.get(message_id)
+        try:
+            message = Message.query.get(uuid.UUID(str(message_id)))
+        except ValueError:
+            message = None
         if not message:
             emit('error', {'message': 'Message not found'})
             return
         
         # Verify user is participant in conversation
-        if not message.conversation.is_participant(user_id):
+        if not can_access_conversation(message.conversation_id):
             emit('error', {'message': 'Not authorized to react to this message'})
             return
         
-        # Add reaction
-        success = message.add_reaction(emoji, user_id)
+        # Unique per (message, user, emoji): repeats are no-ops and broadcast nothing
+        delta = getattr(reaction_service, action)(message, user_id, emoji)
+        db.session.commit()
         
-        if success:
-            # Broadcast reaction to all participants
-            socketio.emit('reaction_added', {
-                'message_id': message_id,
-                'emoji': emoji,
-                'user_id': user_id,
-                'reactions': message.reactions
-            }, room=f"conversation_{message.conversation_id}")
-            
-            emit('reaction_added', {
-                'message_id': message_id,
-                'emoji': emoji,
-                'status': 'success'
-            })
-        else:
-            emit('error', {'message': 'Failed to add reaction'})
-            
+        if delta:
+            socketio.emit(f'reaction_{past}', delta, room=f"conversation_{message.conversation_id}")
+        
+        emit(f'reaction_{past}', {
+            'message_id': message_id,
+            'emoji': emoji,
+            'status': 'success',
+            'count': delta['count'] if delta else None
+        })
+        
+    except ValueError as e:
+        emit('error', {'message': str(e)})
     except Exception as e:
-        logger.error(f"Error adding reaction: {str(e)}")
-        emit('error', {'message': 'Failed to add reaction'})
+        logger.error(f"Error updating reaction: {str(e)}")
+        emit('error', {'message': f'Failed to {action} reaction'})
+
+@socketio.on('add_reaction')
+@socket_jwt_required
+def on_add_reaction(data):
+    """Handle adding reaction to message"""
+    _react(data, 'add')
 
 @socketio.on('remove_reaction')
 @socket_jwt_required
 def on_remove_reaction(data):
     """Handle removing reaction from message"""
-    user_id = get_jwt_identity()
-    message_id = data.get('message_id')
-    emoji = data.get('emoji')
-    
-    if not message_id or not emoji:
-        emit('error', {'message': 'Message ID and emoji are required'})
-        return
-    
-    try:
-        from models import Message
-        
-        message = Message.query.get(message_id)
-        if not message:
-            emit('error', {'message': 'Message not found'})
-            return
-        
-        # Verify user is participant in conversation
-        if not message.conversation.is_participant(user_id):
-            emit('error', {'message': 'Not authorized to react to this message'})
-            return
-        
-        # Remove reaction
-        success = message.remove_reaction(emoji, user_id)
-        
-        if success:
-            # Broadcast reaction removal to all participants
-            socketio.emit('reaction_removed', {
-                'message_id': message_id,
-                'emoji': emoji,
-                'user_id': user_id,
-                'reactions': message.reactions
-            }, room=f"conversation_{message.conversation_id}")
-            
-            emit('reaction_removed', {
-                'message_id': message_id,
-                'emoji': emoji,
-                'status': 'success'
-            })
-        else:
-            emit('error', {'message': 'Failed to remove reaction'})
-            
-    except Exception as e:
-        logger.error(f"Error removing reaction: {str(e)}")
-        emit('error', {'message': 'Failed to remove reaction'})
+    _react(data, 'remove')
 
 @socketio.on('error')
 def on_error(error):
     """Handle Socket.IO errors"""
     logger.error(f"Socket.IO error: {error}")
 
+def _acknowledge(user_id, notification_ids, read=False):
+    """Delivery acknowledgement of many notifications in one UPDATE; the badge update follows the commit"""
+    from services.notification_service import notification_service
+    
+    counts = notification_service.mark_notifications_delivered(user_id, notification_ids, read=read)
+    if counts is None:
+        emit('error', {'message': 'Failed to acknowledge notifications'})
+        return
+    emit('notifications_acknowledged', counts)
+    logger.info(f"{counts['delivered']} notifications acknowledged as delivered by user {user_id}")
+
 @socketio.on('notification_delivered')
 @socket_jwt_required
 def on_notification_delivered(data):
     """Handle notification delivery confirmation"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     notification_id = data.get('notification_id')
     
     if notification_id:
-        try:
-            from services.notification_service import notification_service
-            notification_service.mark_notification_delivered(notification_id)
-            logger.info(f"Notification {notification_id} marked as delivered for user {user_id}")
-        except Exception as e:
-            logger.error(f"Failed to mark notification as delivered: {str(e)}")
+        _acknowledge(user_id, [notification_id])
+
+@socketio.on('notifications_delivered')
+@socket_jwt_required
+def on_notifications_delivered(data):
+    """Handle a batched delivery confirmation: {'notification_ids': [...], 'read': bool}"""
+    user_id = current_socket_user()
+    notification_ids = data.get('notification_ids') or []
+    
+    if not isinstance(notification_ids, list) or not notification_ids:
+        emit('error', {'message': 'notification_ids is required'})
+        return
+    
+    _acknowledge(user_id, notification_ids, read=bool(data.get('read')))
 
 @socketio.on('notification_read')
 @socket_jwt_required
 def on_notification_read(data):
-    """Handle notification read confirmation"""
-    user_id = get_jwt_identity()
-    notification_id = data.get('notification_id')
+    """Handle notification read confirmation for one id, a list of ids or everything up to 'before'"""
+    user_id = current_socket_user()
+    notification_ids = data.get('notification_ids')
+    if not isinstance(notification_ids, list):
+        notification_ids = None
+    if data.get('notification_id'):
+        notification_ids = [data['notification_id']]
     
-    if notification_id:
+    if notification_ids or data.get('before'):
         try:
-            from models import Notification
-            notification = Notification.query.get(notification_id)
-            if notification and notification.receiver_id == user_id:
-                notification.mark_as_read()
-                logger.info(f"Notification {notification_id} marked as read by user {user_id}")
+            from services.notification_counter import notification_counter, parse_timestamp
+            before = parse_timestamp(data['before']) if data.get('before') else None
+            # Scoped to the user's own notifications; the badge update follows the commit
+            changed = notification_counter.mark_read(user_id, notification_ids, before=before)
+            logger.info(f"{changed} notifications marked as read by user {user_id}")
         except Exception as e:
             logger.error(f"Failed to mark notification as read: {str(e)}")
 
@@ -353,7 +373,7 @@ def on_notification_read(data):
 @socket_jwt_required
 def on_join_match_room(data):
     """Join a match room for real-time updates"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     match_id = data.get('match_id')
     
     if not match_id:
@@ -385,7 +405,7 @@ def on_join_match_room(data):
 @socket_jwt_required
 def on_leave_match_room(data):
     """Leave a match room"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     match_id = data.get('match_id')
     
     if match_id:
@@ -401,7 +421,7 @@ def on_leave_match_room(data):
 @socket_jwt_required
 def on_match_join(data):
     """Handle match join event"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     match_id = data.get('match_id')
     
     if not match_id:
@@ -445,7 +465,7 @@ def on_match_join(data):
 @socket_jwt_required
 def on_match_leave(data):
     """Handle match leave event"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     match_id = data.get('match_id')
     
     if not match_id:
@@ -489,7 +509,7 @@ def on_match_leave(data):
 @socket_jwt_required
 def on_match_update(data):
     """Handle match update event (creator only)"""
-    user_id = get_jwt_identity()
+    user_id = current_socket_user()
     match_id = data.get('match_id')
     update_type = data.get('update_type')  # 'start', 'end', 'cancel', 'postpone'
     
@@ -544,6 +564,12 @@ def on_match_update(data):
         emit('error', {'message': 'Failed to update match'})
 
 def init_socketio(app):
-    """Initialize Socket.IO with Flask app"""
-    socketio.init_app(app)
+    """Initialize Socket.IO with Flask app (and the SOCKETIO_MESSAGE_QUEUE backplane, if set)"""
+    from services.socket_backplane import server_options, socket_backplane
+    socketio.init_app(app, **server_options(app.config))
+    socket_backplane.configure(app.config)
+    typing_service.configure(app.config)
+    presence_service.configure(app.config)
+    socket_sessions.configure(app.config)
+    socket_sessions.register()
     return socketio
@@ -0,0 +1,122 @@
+"""
+Geospatial helpers for radius search
+Haversine distance, bounding boxes and a grid-bucket index used when
+earthdistance/PostGIS is not available (SQLite in tests)
+"""
+
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing the search circle
+
+    The box is widened to the full longitude range near the poles and when the
+    circle crosses the antimeridian, so it never excludes a true match.
+    """
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(-90.0, latitude - d_lat)
+    max_lat = min(90.0, latitude + d_lat)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+
+    d_lng = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    min_lng = longitude - d_lng
+    max_lng = longitude + d_lng
+    if d_lng >= 180.0 or min_lng < -180.0 or max_lng > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def is_valid_coordinate(latitude, longitude):
+    """Check that a latitude/longitude pair is within range"""
+    if latitude is None or longitude is None:
+        return False
+    return -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+
+
+class GridIndex:
+    """Grid-bucket spatial index
+
+    Points are bucketed into cells of ``cell_degrees`` x ``cell_degrees``.
+    A radius query only visits the cells covered by the bounding box and
+    computes exact haversine distances for the points in those cells.
+    """
+
+    def __init__(self, cell_degrees=0.25):
+        self.cell_degrees = cell_degrees
+        self._cells = defaultdict(dict)
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _cell(self, latitude, longitude):
+        return (int(math.floor(latitude / self.cell_degrees)),
+                int(math.floor(longitude / self.cell_degrees)))
+
+    def add(self, key, latitude, longitude):
+        """Insert or move a point"""
+        self.remove(key)
+        if not is_valid_coordinate(latitude, longitude):
+            return
+        cell = self._cell(latitude, longitude)
+        self._cells[cell][key] = (latitude, longitude)
+        self._points[key] = cell
+
+    def remove(self, key):
+        """Remove a point if present"""
+        cell = self._points.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def nearby(self, latitude, longitude, radius_km):
+        """Return [(distance_km, key)] within radius, nearest first"""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        lat_lo, lng_lo = self._cell(min_lat, min_lng)
+        lat_hi, lng_hi = self._cell(max_lat, max_lng)
+
+        results = []
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lng_cell in range(lng_lo, lng_hi + 1):
+                bucket = self._cells.get((lat_cell, lng_cell))
+                if not bucket:
+                    continue
+                for key, (lat, lng) in bucket.items():
+                    if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                        continue
+                    distance = haversine_km(latitude, longitude, lat, lng)
+                    if distance <= radius_km:
+                        results.append((distance, key))
+
+        results.sort(key=lambda item: (item[0], str(item[1])))
+        return results
@@ -0,0 +1,62 @@
+"""
+Pagination helpers for cursor-paged endpoints
+"""
+
+import base64
+import binascii
+import json
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+    pass
+
+
+def encode_cursor(payload):
+    """Encode a cursor payload (dict) as an opaque URL-safe token"""
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor token back into its payload, or None if no cursor was sent"""
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+    if not isinstance(payload, dict):
+        raise InvalidCursorError('Invalid cursor')
+    return payload
+
+
+def estimate_count(query, exact_threshold=1000):
+    """Return (total, is_estimate) for a SQLAlchemy query
+
+    On PostgreSQL the planner's row estimate from EXPLAIN is used instead of
+    an exact COUNT(*). Small estimates (below ``exact_threshold``) are counted
+    exactly, since the count is cheap there and planner estimates are least
+    reliable. Other databases always count exactly.
+    """
+    count_query = query.order_by(None).limit(None).offset(None)
+    session = count_query.session
+    bind = session.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        return count_query.count(), False
+
+    compiled = count_query.statement.compile(dialect=bind.dialect)
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+    if estimate < exact_threshold:
+        return count_query.count(), False
+    return estimate, True